@@ -0,0 +1,285 @@
+"""Read-only JSON API for headless front ends (``/api/v1``).
+
+    GET /api/v1/projects            ?fields=id,title&limit=20&cursor=...
+    GET /api/v1/projects/<id>       ?fields=...
+    GET /api/v1/posts               published posts, newest first
+    GET /api/v1/posts/<slug>
+    GET /api/v1/profile             site settings, experiences and tools
+
+Lists use keyset pagination (``next_cursor`` / ``prev_cursor``; a cursor
+that does not decode to the list's sort key is a 400) and leave
+out large text fields unless asked for with ``fields``. Columns no
+requested field needs are not loaded.
+
+Every response carries a strong ETag derived from the newest
+``updated_at`` of the entities it shows plus their purge stamps (which
+also change on deletes and on edits to tables without ``updated_at``).
+That validator is checked before any rows are loaded, so a revalidation
+costs one indexed query and is answered with 304. Bodies are encoded
+with orjson when it is installed and compressed by ``compression``.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from flask import Blueprint, abort, current_app, jsonify, request, url_for
+from sqlalchemy import func, select
+from sqlalchemy.orm import defer, selectinload
+
+import compression
+from extensions import db, response_cache
+from models import SiteSettings, Project, BlogPost, Experience, Tool, PROJECT_LINK_COLUMNS, POST_LINK_COLUMNS
+from pagination import Key, decode_cursor, keyset_paginate
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library encoder is used instead
+    orjson = None
+
+API_VERSION = 1
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+PROJECT_KEYS = [Key(Project.created_at, descending=True), Key(Project.id, descending=True)]
+POST_KEYS = [Key(BlogPost.created_at, descending=True), Key(BlogPost.id, descending=True)]
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+# ===================== SERIALIZATION =====================
+
+def _image(image):
+    return {
+        'url': image.image_path,
+        'alt_text': image.alt_text,
+        'variants': image.variants or [],
+    }
+
+
+# field -> (value getter, columns it needs that are deferred otherwise)
+PROJECT_FIELDS = {
+    'id': (lambda p: p.id, ()),
+    'title': (lambda p: p.title, ()),
+    'category': (lambda p: p.category, ()),
+    'excerpt': (lambda p: p.excerpt, ()),
+    'description': (lambda p: p.description, (Project.description,)),
+    'description_html': (lambda p: p.description_html, (Project.description_html,)),
+    'live_link': (lambda p: p.live_link, ()),
+    'repo_link': (lambda p: p.repo_link, ()),
+    'start_date': (lambda p: p.start_date, ()),
+    'end_date': (lambda p: p.end_date, ()),
+    'created_at': (lambda p: p.created_at, ()),
+    'updated_at': (lambda p: p.updated_at, ()),
+    'url': (lambda p: url_for('project_detail', project_id=p.id), ()),
+    'images': (lambda p: [_image(i) for i in sorted(p.images, key=lambda i: i.order or 0)], ()),
+    'posts': (lambda p: [{'slug': post.slug, 'title': post.title} for post in p.blog_posts if post.published], ()),
+}
+PROJECT_LIST_FIELDS = ('id', 'title', 'category', 'excerpt', 'live_link', 'repo_link', 'start_date',
+                       'end_date', 'created_at', 'updated_at', 'url', 'images')
+
+POST_FIELDS = {
+    'id': (lambda p: p.id, ()),
+    'slug': (lambda p: p.slug, ()),
+    'title': (lambda p: p.title, ()),
+    'excerpt': (lambda p: p.excerpt, ()),
+    'reading_time': (lambda p: p.reading_time, ()),
+    'content': (lambda p: p.content, (BlogPost.content,)),
+    'content_html': (lambda p: p.content_html, (BlogPost.content_html,)),
+    'created_at': (lambda p: p.created_at, ()),
+    'updated_at': (lambda p: p.updated_at, ()),
+    'url': (lambda p: url_for('blog_post', slug=p.slug), ()),
+    'project': (lambda p: {'id': p.related_project.id, 'title': p.related_project.title}
+                if p.related_project else None, ()),
+}
+POST_LIST_FIELDS = ('id', 'slug', 'title', 'excerpt', 'reading_time', 'created_at', 'updated_at', 'url', 'project')
+
+EXPERIENCE_FIELDS = ('id', 'title', 'company', 'location', 'role', 'start_date', 'end_date', 'ongoing',
+                     'description', 'certificate_image_path', 'order')
+TOOL_FIELDS = ('id', 'name', 'category', 'details', 'proficiency', 'order')
+
+
+def _default(value):
+    """Dates for the standard library encoder (orjson handles them itself)"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def selected_fields(available, defaults):
+    """Fields named in ?fields=, or `defaults`; 400 for unknown ones"""
+    requested = request.args.get('fields')
+    if not requested:
+        return list(defaults)
+    fields = [field.strip() for field in requested.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        abort(400, description=f'Unknown fields: {", ".join(unknown)}')
+    return fields
+
+
+def loader_options(spec, fields, heavy_columns):
+    """Defer the large columns no selected field needs"""
+    needed = {column for field in fields for column in spec[field][1]}
+    return [defer(column) for column in heavy_columns if column not in needed]
+
+
+def serialize(obj, spec, fields):
+    return {field: spec[field][0](obj) for field in fields}
+
+
+def _limit():
+    return max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+
+
+# ===================== CONDITIONAL REQUESTS =====================
+
+UPDATED_AT = {
+    'project': Project.updated_at,
+    'post': BlogPost.updated_at,
+    'settings': SiteSettings.updated_at,
+}
+
+
+def etag_for(*entities):
+    """Strong validator for a response showing `entities`, without loading rows"""
+    columns = [UPDATED_AT[e] for e in entities if e in UPDATED_AT]
+    newest = []
+    if columns:
+        newest = db.session.execute(select(*(select(func.max(c)).scalar_subquery() for c in columns))).one()
+    args = sorted(request.args.items(multi=True))
+    key = repr((API_VERSION, request.path, args, [str(v) for v in newest], response_cache.tokens(*entities)))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def respond(data, etag):
+    """JSON response with ETag, or 304 when the client's copy is current.
+
+    Compressed bodies get their own strong ETag from ``compression``, so
+    the 304 repeats the variant the client named.
+    """
+    matched = compression.matching_etag(etag)
+    if matched:
+        response = current_app.response_class(status=304)
+        response.set_etag(matched)
+    else:
+        response = current_app.response_class(dumps(data), mimetype='application/json')
+        response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(*entities):
+    """Decorator: answer 304 before running the view if nothing changed,
+    otherwise serialize the data the view returns"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = etag_for(*entities)
+            if compression.matching_etag(etag):
+                return respond(None, etag)
+            return respond(view(*args, **kwargs), etag)
+        return wrapper
+    return decorator
+
+
+def cursor_page(query, keys, spec, fields):
+    cursor = request.args.get('cursor')
+    if cursor and decode_cursor(cursor, keys) is None:
+        abort(400, description='Invalid cursor')
+    page = keyset_paginate(query, keys, _limit(), cursor)
+    return {
+        'data': [serialize(item, spec, fields) for item in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    }
+
+
+# ===================== ROUTES =====================
+
+@api.after_request
+def allow_cross_origin(response):
+    origin = current_app.config.get('API_CORS_ORIGIN')
+    if origin:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Expose-Headers'] = 'ETag'
+    return response
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+    return jsonify({'error': error.description}), error.code
+
+
+def project_options(fields):
+    options = loader_options(PROJECT_FIELDS, fields, (Project.description, Project.description_html))
+    if 'images' in fields:
+        options.append(selectinload(Project.images))
+    if 'posts' in fields:
+        options.append(selectinload(Project.blog_posts).options(POST_LINK_COLUMNS))
+    return options
+
+
+def post_options(fields):
+    options = loader_options(POST_FIELDS, fields, (BlogPost.content, BlogPost.content_html))
+    if 'project' in fields:
+        options.append(selectinload(BlogPost.related_project).options(PROJECT_LINK_COLUMNS))
+    return options
+
+
+@api.route('/projects')
+@conditional('project', 'post')
+def projects():
+    fields = selected_fields(PROJECT_FIELDS, PROJECT_LIST_FIELDS)
+    return cursor_page(Project.query.options(*project_options(fields)), PROJECT_KEYS, PROJECT_FIELDS, fields)
+
+
+@api.route('/projects/<int:project_id>')
+@conditional('project', 'post')
+def project(project_id):
+    fields = selected_fields(PROJECT_FIELDS, PROJECT_FIELDS)
+    project = Project.query.options(*project_options(fields)).filter_by(id=project_id).first_or_404()
+    return {'data': serialize(project, PROJECT_FIELDS, fields)}
+
+
+@api.route('/posts')
+@conditional('post', 'project')
+def posts():
+    fields = selected_fields(POST_FIELDS, POST_LIST_FIELDS)
+    query = BlogPost.query.options(*post_options(fields)).filter_by(published=True)
+    return cursor_page(query, POST_KEYS, POST_FIELDS, fields)
+
+
+@api.route('/posts/<slug>')
+@conditional('post', 'project')
+def post(slug):
+    fields = selected_fields(POST_FIELDS, POST_FIELDS)
+    post = BlogPost.query.options(*post_options(fields)).filter_by(slug=slug, published=True).first_or_404()
+    return {'data': serialize(post, POST_FIELDS, fields)}
+
+
+@api.route('/profile')
+@conditional('settings', 'experience', 'tool')
+def profile():
+    settings = SiteSettings.query.first() or SiteSettings()
+    experiences = Experience.query.order_by(Experience.order.asc(), Experience.start_date.desc().nulls_last()).all()
+    tools = Tool.query.order_by(Tool.order.asc(), Tool.name.asc()).all()
+    return {'data': {
+        'site_title': settings.site_title,
+        'owner_name': settings.owner_name,
+        'hero_text': settings.hero_text,
+        'bio': settings.bio,
+        'contact_email': settings.contact_email,
+        'resume_url': settings.resume_url,
+        'social_links': dict(settings.social_links or {}),
+        'experiences': [{field: getattr(e, field) for field in EXPERIENCE_FIELDS} for e in experiences],
+        'tools': [{field: getattr(t, field) for field in TOOL_FIELDS} for t in tools],
+    }}
@@ -1,6 +1,8 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from werkzeug.utils import secure_filename
+import click
+from sqlalchemy.orm import selectinload, joinedload
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 from datetime import datetime, date
 from functools import wraps
@@ -9,59 +11,261 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-from extensions import db, login_manager
+from extensions import (
+    db, db_router, login_manager, user_cache, login_throttle, settings_cache, response_cache, fragment_cache,
+    feed_cache, response_compression, image_pipeline, job_queue, dashboard_stats, static_assets, asset_bundles, instrumentation
+)
 from config import config_by_name
-from models import User, SiteSettings, Project, ProjectImage, BlogPost, Experience, Tool
+from models import (
+    User, SiteSettings, Project, ProjectImage, BlogPost, Experience, Tool,
+    PROJECT_LIST_DEFERRED, POST_LIST_DEFERRED, PROJECT_LINK_COLUMNS, POST_LINK_COLUMNS
+)
+from migrations import run_migrations
+from exporter import export_site
+from api import api
+import bulk
+import bundles
+from uploads import store_upload
+import search as search_index
+import stats
+import server
+from database import configure_engines
+from templating import init_templates, preload_templates
+from cache import Deferred
+from pagination import Key, keyset_paginate
+
+# Sort keys used by keyset pagination (CURSOR_PAGINATION); each ends with a
+# unique column and is backed by a composite index declared in models.py
+PROJECT_KEYS = [Key(Project.created_at), Key(Project.id)]
+PROJECT_ADMIN_KEYS = [Key(Project.created_at, descending=True), Key(Project.id, descending=True)]
+POST_KEYS = [Key(BlogPost.created_at, descending=True), Key(BlogPost.id, descending=True)]
+EXPERIENCE_KEYS = [Key(Experience.start_date, descending=True, nulls_last=True), Key(Experience.id, descending=True)]
+TOOL_KEYS = [Key(Tool.order), Key(Tool.name), Key(Tool.id)]
 
 
 def create_app(config_name='development'):
     """Application Factory"""
     app = Flask(__name__)
     app.config.from_object(config_by_name[config_name])
+    if app.config['PROXY_FIX_X_FOR']:
+        # Take the client address from X-Forwarded-For set by that many proxies
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    init_templates(app)
     
     # Initialize extensions
     db.init_app(app)
+    configure_engines(app)
+    db_router.init_app(app)
+    instrumentation.init_app(app)
     login_manager.init_app(app)
+    user_cache.init_app(app)
+    login_throttle.init_app(app)
+    settings_cache.init_app(app)
+    response_cache.init_app(app)
+    fragment_cache.init_app(app)
+    feed_cache.init_app(app)
+    response_compression.init_app(app)
+    image_pipeline.init_app(app)
+    job_queue.init_app(app)
+    dashboard_stats.init_app(app)
+    static_assets.init_app(app)
+    asset_bundles.init_app(app)
     login_manager.login_view = 'admin_login'
+    app.register_blueprint(api)
     
     # Ensure upload folder exists
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, int(user_id))
+        return user_cache.load(int(user_id))
+    
+    def init_database():
+        """Create tables, apply migrations and seed required rows"""
+        db.create_all()
+        run_migrations()
+        # Ensure admin user exists
+        if not db.session.query(User).first():
+            admin_username = os.getenv('ADMIN_USERNAME', 'admin')
+            admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')
+            admin = User(username=admin_username)
+            admin.set_password(admin_password)
+            db.session.add(admin)
+            db.session.commit()
+        # Ensure settings exist
+        SiteSettings.get_settings()
+    
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create tables, run pending migrations and seed the admin user."""
+        init_database()
+        print('Database initialized.')
+    
+    @app.cli.command('set-password')
+    @click.argument('username')
+    @click.password_option()
+    def set_password_command(username, password):
+        """Change an admin user's password."""
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'No user named {username!r}')
+        user.set_password(password)
+        db.session.commit()
+        user_cache.invalidate()
+        print(f'Password changed for {username}.')
+    
+    @app.cli.command('export')
+    @click.option('--output', '-o', default=None, help='Output folder (defaults to EXPORT_FOLDER).')
+    @click.option('--full', is_flag=True, help='Re-render every page instead of only changed ones.')
+    def export_command(output, full):
+        """Pre-render the public site into a static HTML tree."""
+        output = output or app.config['EXPORT_FOLDER']
+        stats = export_site(app, output, full=full)
+        print(f"Exported to {output}: {stats['rendered']} rendered, {stats['skipped']} unchanged, "
+              f"{stats['removed']} removed, {stats['static']} static files copied.")
+    
+    @app.cli.command('build-derivatives')
+    @click.option('--all', 'rebuild_all', is_flag=True, help='Also rebuild images that already have derivatives.')
+    def build_derivatives_command(rebuild_all):
+        """Generate responsive image derivatives for existing uploads."""
+        if not image_pipeline.available(app):
+            raise click.ClickException('No derivative format is available (Pillow is missing or lacks AVIF/WebP).')
+        images = ProjectImage.query.all()
+        image_ids = [image.id for image in images if rebuild_all or not image.variants]
+        db.session.remove()  # each image is processed in its own session
+        for image_id in image_ids:
+            image_pipeline.process(app, image_id)
+        print(f'Processed {len(image_ids)} of {len(images)} images.')
+    
+    @app.cli.command('reindex-search')
+    def reindex_search_command():
+        """Rebuild the full-text search index from the database."""
+        if not search_index.fts_available():
+            print('Full-text index not available (requires SQLite with FTS5).')
+            return
+        search_index.rebuild()
+        db.session.commit()
+        print('Search index rebuilt.')
+    
+    @app.cli.command('import-content')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    def import_content_command(path):
+        """Import projects, posts, experiences and tools from NDJSON/JSON or a zip archive."""
+        try:
+            records, archive, base_dir = bulk.open_import(path)
+            counts = bulk.import_content(app, records, archive, base_dir)
+        except bulk.BulkImportError as e:
+            raise click.ClickException(f'{e} (nothing imported)')
+        print('Imported ' + ', '.join(f'{count} {kind}s' for kind, count in counts.items()) + '.')
+    
+    @app.cli.command('export-content')
+    @click.option('--output', '-o', default='-', help='File to write (default: stdout); a .zip also includes images.')
+    def export_content_command(output):
+        """Export all content as NDJSON, or as a zip archive with the uploaded images."""
+        if output.endswith('.zip'):
+            count = bulk.export_archive(app, output)
+            print(f'Exported {count} records to {output}.')
+            return
+        with click.open_file(output, 'w', encoding='utf-8') as out:
+            for line in bulk.export_ndjson():
+                out.write(line)
+    
+    @app.cli.command('run-jobs')
+    def run_jobs_command():
+        """Run all due background jobs (for JOB_WORKERS = 0, or to drain the queue)."""
+        succeeded, failed = job_queue.run_pending(app)
+        print(f'Ran {succeeded + failed} jobs, {failed} failed.')
     
-    @app.before_request
-    def before_request():
-        """Initialize database and create tables if needed"""
+    @app.cli.command('recount-stats')
+    def recount_stats_command():
+        """Rebuild the dashboard counters from the tables and the upload folder."""
+        stats.recount(db.session.connection(), app.config['UPLOAD_FOLDER'])
+        db.session.commit()
+        print('Dashboard counters rebuilt.')
+    
+    @app.cli.command('render-content')
+    def render_content_command():
+        """Re-render stored post and project HTML (after changing content.py)."""
+        projects = Project.query.all()
+        for project in projects:
+            project.set_description(project.description)
+        posts = BlogPost.query.all()
+        for post in posts:
+            post.set_content(post.content)
+        db.session.commit()
+        response_cache.purge('project')
+        response_cache.purge('post')
+        print(f'Rendered {len(projects)} projects and {len(posts)} posts.')
+    
+    @app.cli.command('build-static')
+    def build_static_command():
+        """Write precompressed .gz/.br copies of the static assets."""
+        written = static_assets.build(app)
+        print(f'Wrote {written} compressed files.')
+    
+    @app.cli.command('build-assets')
+    @click.option('--offline', is_flag=True, help='Only use files already in assets/vendor.')
+    @click.option('--refresh', is_flag=True, help='Download the vendored files again.')
+    def build_assets_command(offline, refresh):
+        """Vendor Bootstrap and fonts, then write minified per-layout bundles."""
+        try:
+            if not offline:
+                print(f'Downloaded {bundles.vendor(app, refresh=refresh)} vendor files.')
+            sizes = bundles.build(app)
+        except bundles.AssetBuildError as e:
+            raise click.ClickException(str(e))
+        static_assets.scan(app)
+        static_assets.build(app)
+        asset_bundles.load(app)
+        for name, files in sizes.items():
+            print(f'{name}: ' + ', '.join(f'{filename} {size / 1024:.1f} KiB' for filename, size in files.items()))
+    
+    @app.cli.command('sync-replicas')
+    def sync_replicas_command():
+        """Copy the SQLite database over the SQLite read replicas."""
+        try:
+            written = db_router.sync(app)
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        for path in written:
+            print(f'Copied to {path}')
+        if not written:
+            print('No SQLite replicas configured (DATABASE_REPLICA_URLS).')
+    
+    @app.cli.command('serve', with_appcontext=False)
+    @click.option('--bind', '-b', default=None, help='Address to listen on (defaults to SERVER_BIND).')
+    @click.option('--workers', '-w', type=int, default=None, help='Worker processes (defaults to WEB_CONCURRENCY or one per CPU).')
+    @click.option('--threads', '-t', type=int, default=None, help='Threads per worker (defaults to SERVER_THREADS).')
+    def serve_command(bind, workers, threads):
+        """Run the app under a production WSGI server."""
+        try:
+            server.run(
+                app,
+                bind=bind or app.config['SERVER_BIND'],
+                workers=workers or app.config['SERVER_WORKERS'] or server.default_workers(),
+                threads=threads or app.config['SERVER_THREADS'],
+                timeout=app.config['SERVER_TIMEOUT'],
+            )
+        except RuntimeError as e:
+            raise click.ClickException(str(e))
+    
+    # One-time startup initialization instead of a per-request hook
+    if app.config['AUTO_INIT_DB']:
         with app.app_context():
-            db.create_all()
-            # Ensure admin user exists
-            if not db.session.query(User).first():
-                admin_username = os.getenv('ADMIN_USERNAME', 'admin')
-                admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')
-                admin = User(username=admin_username)
-                admin.set_password(admin_password)
-                db.session.add(admin)
-                db.session.commit()
-            # Ensure settings exist
-            SiteSettings.get_settings()
-            # -- Lightweight schema migration for added fields (SQLite)
-            try:
-                # Check if certificate_image_path column exists in experience table
-                inspector = db.inspect(db.engine)
-                cols = [c['name'] for c in inspector.get_columns('experience')]
-                if 'certificate_image_path' not in cols:
-                    # SQLite supports ADD COLUMN
-                    db.engine.execute('ALTER TABLE experience ADD COLUMN certificate_image_path VARCHAR(255)')
-            except Exception:
-                # If any error occurs, skip migration (table may not exist yet)
-                pass
+            init_database()
     
     def allowed_file(filename):
         """Check if file is allowed"""
         return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
     
+    def paginate(query, keys, per_page):
+        """Offset pagination, or keyset pagination over `keys` when
+        CURSOR_PAGINATION is on and no explicit ?page= is requested"""
+        if app.config['CURSOR_PAGINATION'] and 'page' not in request.args:
+            return keyset_paginate(query, keys, per_page, request.args.get('cursor'))
+        page = request.args.get('page', 1, type=int)
+        return query.paginate(page=page, per_page=per_page)
+    
     def admin_required(f):
         """Decorator to require admin login"""
         @wraps(f)
@@ -75,43 +279,93 @@ def create_app(config_name='development'):
     # ===================== PUBLIC ROUTES =====================
     
     @app.route('/')
+    @db_router.replica_reads
+    @response_cache.cached('settings', 'project', 'experience', 'tool')
     def index():
         """Homepage"""
         from datetime import datetime
-        settings = SiteSettings.get_settings()
-        featured_projects = Project.query.limit(6).all()
-        experiences = Experience.query.order_by(Experience.order.asc(), Experience.start_date.desc().nulls_last()).all()
-        tools = Tool.query.order_by(Tool.order.asc(), Tool.name.asc()).all()
+        settings = settings_cache.get()
+        # Deferred: only queried when the {% cache %} fragment that shows them is stale
+        featured_projects = Deferred(lambda: Project.query.options(
+            selectinload(Project.images), *PROJECT_LIST_DEFERRED
+        ).limit(6).all())
+        experiences = Deferred(lambda: Experience.query.order_by(
+            Experience.order.asc(), Experience.start_date.desc().nulls_last()
+        ).all())
+        tools = Deferred(lambda: Tool.query.order_by(Tool.order.asc(), Tool.name.asc()).all())
         return render_template('index.html', settings=settings, projects=featured_projects, experiences=experiences, tools=tools, current_year=datetime.now().year)
     
     @app.route('/projects')
+    @db_router.replica_reads
+    @response_cache.cached('project', args=('page', 'cursor'))
     def projects():
         """Projects Grid View"""
-        page = request.args.get('page', 1, type=int)
-        projects = Project.query.paginate(page=page, per_page=12)
+        projects = paginate(Project.query.options(selectinload(Project.images), *PROJECT_LIST_DEFERRED),
+                            PROJECT_KEYS, app.config['PROJECTS_PER_PAGE'])
         return render_template('projects.html', projects=projects)
     
     @app.route('/project/<int:project_id>')
+    @db_router.replica_reads
+    @response_cache.cached('project', 'post')
     def project_detail(project_id):
         """Single Project Detail with Image Carousel"""
-        project = Project.query.get_or_404(project_id)
+        project = Project.query.options(
+            selectinload(Project.images), selectinload(Project.blog_posts).options(POST_LINK_COLUMNS)
+        ).filter_by(id=project_id).first_or_404()
         return render_template('project_detail.html', project=project)
     
     @app.route('/blog')
+    @db_router.replica_reads
+    @response_cache.cached('post', 'project', args=('page', 'cursor'))
     def blog():
         """Blog Feed"""
-        page = request.args.get('page', 1, type=int)
-        posts = BlogPost.query.filter_by(published=True).order_by(
+        posts = paginate(BlogPost.query.options(
+            joinedload(BlogPost.related_project).options(PROJECT_LINK_COLUMNS), *POST_LIST_DEFERRED
+        ).filter_by(published=True).order_by(
             BlogPost.created_at.desc()
-        ).paginate(page=page, per_page=10)
+        ), POST_KEYS, app.config['POSTS_PER_PAGE'])
         return render_template('blog.html', posts=posts)
     
     @app.route('/blog/<slug>')
+    @db_router.replica_reads
+    @response_cache.cached('post', 'project')
     def blog_post(slug):
         """Single Blog Post"""
-        post = BlogPost.query.filter_by(slug=slug).first_or_404()
+        post = BlogPost.query.options(
+            joinedload(BlogPost.related_project).options(PROJECT_LINK_COLUMNS)
+        ).filter_by(slug=slug).first_or_404()
         return render_template('post.html', post=post)
     
+    @app.route('/search')
+    @response_cache.cached('project', 'post', args=('q', 'page'))
+    def search():
+        """Full-text search over projects and published posts"""
+        query = request.args.get('q', '').strip()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+        # Fetch one extra row to know whether there is a next page
+        results = search_index.search(query, limit=per_page + 1, offset=(page - 1) * per_page)
+        return render_template('search.html', query=query, results=results[:per_page],
+                               page=page, has_next=len(results) > per_page)
+    
+    @app.route('/sitemap.xml')
+    @db_router.replica_reads
+    def sitemap():
+        """Sitemap of the public pages, projects and published posts"""
+        return feed_cache.sitemap()
+    
+    @app.route('/feed.xml')
+    @db_router.replica_reads
+    def atom_feed():
+        """Atom feed of the newest posts and projects"""
+        return feed_cache.atom()
+    
+    @app.route('/rss.xml')
+    @db_router.replica_reads
+    def rss_feed():
+        """RSS 2.0 feed of the newest posts and projects"""
+        return feed_cache.rss()
+    
     # ===================== ADMIN ROUTES =====================
     
     @app.route('/admin/login', methods=['GET', 'POST'])
@@ -121,14 +375,22 @@ def create_app(config_name='development'):
             return redirect(url_for('admin_dashboard'))
         
         if request.method == 'POST':
+            # Refuse before hashing anything once the client is out of attempts
+            retry_after = login_throttle.check(request.remote_addr)
+            if retry_after:
+                flash(f'Too many login attempts. Try again in {int(retry_after) + 1} seconds.', 'danger')
+                return render_template('admin/login.html'), 429, {'Retry-After': str(int(retry_after) + 1)}
+            
             username = request.form.get('username')
             password = request.form.get('password')
             user = User.query.filter_by(username=username).first()
             
             if user and user.check_password(password):
+                login_throttle.reset(request.remote_addr)
                 login_user(user, remember=request.form.get('remember'))
                 return redirect(url_for('admin_dashboard'))
             else:
+                login_throttle.failed(request.remote_addr)
                 flash('Invalid username or password.', 'danger')
         
         return render_template('admin/login.html')
@@ -138,6 +400,7 @@ def create_app(config_name='development'):
     def admin_logout():
         """Admin Logout"""
         logout_user()
+        user_cache.invalidate()
         flash('You have been logged out.', 'info')
         return redirect(url_for('index'))
     
@@ -146,18 +409,9 @@ def create_app(config_name='development'):
     @admin_required
     def admin_dashboard():
         """Admin Dashboard Overview"""
-        total_projects = Project.query.count()
-        total_posts = BlogPost.query.count()
-        total_images = ProjectImage.query.count()
-        total_experiences = Experience.query.count()
-        total_tools = Tool.query.count()
-        
         context = {
-            'total_projects': total_projects,
-            'total_posts': total_posts,
-            'total_images': total_images,
-            'total_experiences': total_experiences,
-            'total_tools': total_tools,
+            'stats': dashboard_stats.get(),
+            'jobs': job_queue.stats(),
         }
         return render_template('admin/dashboard.html', **context)
     
@@ -185,6 +439,8 @@ def create_app(config_name='development'):
             settings.social_links = social_links
             
             db.session.commit()
+            settings_cache.invalidate()
+            response_cache.purge('settings')
             flash('Settings updated successfully!', 'success')
             return redirect(url_for('admin_settings'))
         
@@ -196,19 +452,44 @@ def create_app(config_name='development'):
     @admin_required
     def admin_projects():
         """List all projects"""
-        page = request.args.get('page', 1, type=int)
-        projects = Project.query.order_by(Project.created_at.desc()).paginate(
-            page=page, per_page=10
-        )
+        projects = paginate(Project.query.options(selectinload(Project.images), *PROJECT_LIST_DEFERRED).order_by(
+                                Project.created_at.desc()),
+                            PROJECT_ADMIN_KEYS, 10)
         return render_template('admin/projects_list.html', projects=projects)
 
+    # ================= BULK IMPORT / EXPORT =================
+    
+    @app.route('/admin/export')
+    @admin_required
+    def admin_export():
+        """Stream all content as NDJSON"""
+        filename = f'portfolio-{date.today().isoformat()}.ndjson'
+        return Response(stream_with_context(bulk.export_ndjson()), mimetype='application/x-ndjson',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    
+    @app.route('/admin/import', methods=['POST'])
+    @admin_required
+    def admin_import():
+        """Import an NDJSON/JSON file or a zip archive with images"""
+        file = request.files.get('file')
+        if not file or not file.filename:
+            flash('Choose a file to import.', 'warning')
+            return redirect(url_for('admin_dashboard'))
+        try:
+            records, archive = bulk.open_upload(file)
+            counts = bulk.import_content(app, records, archive)
+        except bulk.BulkImportError as e:
+            flash(f'Import failed, nothing was imported: {e}', 'danger')
+            return redirect(url_for('admin_dashboard'))
+        flash('Imported ' + ', '.join(f'{count} {kind}s' for kind, count in counts.items()) + '.', 'success')
+        return redirect(url_for('admin_dashboard'))
+    
     # ================= EXPERIENCE MANAGEMENT =================
 
     @app.route('/admin/experiences')
     @admin_required
     def admin_experiences():
-        page = request.args.get('page', 1, type=int)
-        experiences = Experience.query.order_by(Experience.start_date.desc().nulls_last()).paginate(page=page, per_page=10)
+        experiences = paginate(Experience.query.order_by(Experience.start_date.desc().nulls_last()), EXPERIENCE_KEYS, 10)
         return render_template('admin/experiences_list.html', experiences=experiences)
 
     @app.route('/admin/experience/new', methods=['GET', 'POST'])
@@ -249,14 +530,13 @@ def create_app(config_name='development'):
             # Handle certificate upload
             certificate = request.files.get('certificate')
             if certificate and allowed_file(certificate.filename):
-                filename = secure_filename(certificate.filename)
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                filename = timestamp + filename
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                certificate.save(filepath)
-                experience.certificate_image_path = f'/static/uploads/{filename}'
+                if experience.certificate_image_path:
+                    job_queue.enqueue('uploads.release', files=[[experience.certificate_image_path, None]])
+                experience.certificate_image_path = store_upload(certificate, app.config['UPLOAD_FOLDER'])
+                job_queue.enqueue('stats.storage')
 
             db.session.commit()
+            response_cache.purge('experience')
             flash(f'Experience {"created" if not experience_id else "updated"} successfully!', 'success')
             return redirect(url_for('admin_experiences'))
 
@@ -266,18 +546,12 @@ def create_app(config_name='development'):
     @admin_required
     def admin_experience_delete(experience_id):
         experience = Experience.query.get_or_404(experience_id)
-        # Delete certificate file from filesystem if present
+        # Delete certificate file once no other row uses it
         if experience.certificate_image_path:
-            image_path = experience.certificate_image_path.lstrip('/')
-            filepath = os.path.join(app.root_path, image_path)
-            try:
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-            except Exception:
-                pass
-
+            job_queue.enqueue('uploads.release', files=[[experience.certificate_image_path, None]])
         db.session.delete(experience)
         db.session.commit()
+        response_cache.purge('experience')
         flash('Experience deleted successfully!', 'success')
         return redirect(url_for('admin_experiences'))
 
@@ -286,8 +560,7 @@ def create_app(config_name='development'):
     @app.route('/admin/tools')
     @admin_required
     def admin_tools():
-        page = request.args.get('page', 1, type=int)
-        tools = Tool.query.order_by(Tool.order.asc(), Tool.name.asc()).paginate(page=page, per_page=20)
+        tools = paginate(Tool.query.order_by(Tool.order.asc(), Tool.name.asc()), TOOL_KEYS, 20)
         return render_template('admin/tools_list.html', tools=tools)
 
     @app.route('/admin/tool/new', methods=['GET', 'POST'])
@@ -311,6 +584,7 @@ def create_app(config_name='development'):
             if not tool.id:
                 db.session.add(tool)
             db.session.commit()
+            response_cache.purge('tool')
             flash(f'Tool {"created" if not tool_id else "updated"} successfully!', 'success')
             return redirect(url_for('admin_tools'))
 
@@ -322,6 +596,7 @@ def create_app(config_name='development'):
         tool = Tool.query.get_or_404(tool_id)
         db.session.delete(tool)
         db.session.commit()
+        response_cache.purge('tool')
         flash('Tool deleted successfully!', 'success')
         return redirect(url_for('admin_tools'))
     
@@ -339,7 +614,7 @@ def create_app(config_name='development'):
                 project = Project()
             
             project.title = request.form.get('title')
-            project.description = request.form.get('description')
+            project.set_description(request.form.get('description'))
             project.category = request.form.get('category')
             project.live_link = request.form.get('live_link')
             project.repo_link = request.form.get('repo_link')
@@ -358,24 +633,24 @@ def create_app(config_name='development'):
                 db.session.flush()
             
             # Handle multiple image uploads
+            new_images = []
             uploaded_files = request.files.getlist('images')
             for idx, file in enumerate(uploaded_files):
                 if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_')
-                    filename = timestamp + filename
-                    
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(filepath)
-                    
                     image = ProjectImage(
                         project_id=project.id,
-                        image_path=f'/static/uploads/{filename}',
+                        image_path=store_upload(file, app.config['UPLOAD_FOLDER']),
                         order=idx
                     )
                     db.session.add(image)
+                    new_images.append(image)
             
+            db.session.flush()
+            job_queue.enqueue('search.index', kind='project', item_id=project.id)
+            if new_images:
+                job_queue.enqueue('images.derivatives', image_ids=[image.id for image in new_images])
             db.session.commit()
+            response_cache.purge('project')
             flash(f'Project {"created" if not project_id else "updated"} successfully!', 'success')
             return redirect(url_for('admin_projects'))
         
@@ -386,16 +661,14 @@ def create_app(config_name='development'):
     def admin_project_delete(project_id):
         """Delete Project"""
         project = Project.query.get_or_404(project_id)
-        
-        # Delete associated images from filesystem
-        for image in project.images:
-            image_path = image.image_path.lstrip('/')
-            filepath = os.path.join(app.root_path, image_path)
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        
+        # Delete associated images from filesystem unless shared with other rows
+        files = [[image.image_path, image.variants] for image in project.images]
+        if files:
+            job_queue.enqueue('uploads.release', files=files)
+        job_queue.enqueue('search.index', kind='project', item_id=project.id)
         db.session.delete(project)
         db.session.commit()
+        response_cache.purge('project', 'post')
         flash('Project deleted successfully!', 'success')
         return redirect(url_for('admin_projects'))
     
@@ -409,14 +682,11 @@ def create_app(config_name='development'):
         if image.project_id != project_id:
             return jsonify({'error': 'Unauthorized'}), 403
         
-        # Delete from filesystem
-        image_path = image.image_path.lstrip('/')
-        filepath = os.path.join(app.root_path, image_path)
-        if os.path.exists(filepath):
-            os.remove(filepath)
-        
+        # Delete from filesystem unless shared with other rows
+        job_queue.enqueue('uploads.release', files=[[image.image_path, image.variants]])
         db.session.delete(image)
         db.session.commit()
+        response_cache.purge('project')
         
         return jsonify({'status': 'success'})
     
@@ -426,10 +696,10 @@ def create_app(config_name='development'):
     @admin_required
     def admin_posts():
         """List all blog posts"""
-        page = request.args.get('page', 1, type=int)
-        posts = BlogPost.query.order_by(BlogPost.created_at.desc()).paginate(
-            page=page, per_page=10
-        )
+        posts = paginate(BlogPost.query.options(
+            joinedload(BlogPost.related_project).options(PROJECT_LINK_COLUMNS), *POST_LIST_DEFERRED
+        ).order_by(BlogPost.created_at.desc()),
+                         POST_KEYS, 10)
         return render_template('admin/posts_list.html', posts=posts)
     
     @app.route('/admin/post/new', methods=['GET', 'POST'])
@@ -441,14 +711,15 @@ def create_app(config_name='development'):
         if post_id:
             post = BlogPost.query.get_or_404(post_id)
         
-        projects = Project.query.all()
+        # Only needed for the related-project dropdown
+        projects = Project.query.options(PROJECT_LINK_COLUMNS).all()
         
         if request.method == 'POST':
             if not post:
                 post = BlogPost()
             
             post.title = request.form.get('title')
-            post.content = request.form.get('content')
+            post.set_content(request.form.get('content'))
             post.published = request.form.get('published') == 'on'
             
             project_id = request.form.get('project_id')
@@ -456,18 +727,15 @@ def create_app(config_name='development'):
             
             # Generate slug if new post
             if not post.slug:
-                slug = post.generate_slug()
-                counter = 1
-                original_slug = slug
-                while BlogPost.query.filter_by(slug=slug).first():
-                    slug = f"{original_slug}-{counter}"
-                    counter += 1
-                post.slug = slug
+                post.slug = BlogPost.unique_slugs([post.generate_slug()])[0]
             
             if not post.id:
                 db.session.add(post)
+                db.session.flush()
             
+            job_queue.enqueue('search.index', kind='post', item_id=post.id)
             db.session.commit()
+            response_cache.purge('post')
             flash(f'Post {"created" if not post_id else "updated"} successfully!', 'success')
             return redirect(url_for('admin_posts'))
         
@@ -478,8 +746,10 @@ def create_app(config_name='development'):
     def admin_post_delete(post_id):
         """Delete Blog Post"""
         post = BlogPost.query.get_or_404(post_id)
+        job_queue.enqueue('search.index', kind='post', item_id=post.id)
         db.session.delete(post)
         db.session.commit()
+        response_cache.purge('post')
         flash('Post deleted successfully!', 'success')
         return redirect(url_for('admin_posts'))
     
@@ -494,6 +764,9 @@ def create_app(config_name='development'):
         db.session.rollback()
         return render_template('500.html'), 500
     
+    if app.config['TEMPLATE_BYTECODE_CACHE']:
+        preload_templates(app)
+    
     return app
 
 
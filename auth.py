@@ -0,0 +1,225 @@
+"""Admin identity caching and login throttling.
+
+``UserCache`` answers Flask-Login's ``user_loader`` from memory, so admin
+pages do not query the ``user`` table on every request. Entries expire
+after ``USER_CACHE_TTL`` seconds and are dropped in every worker through a
+``FileStamp`` when a password changes or an admin logs out.
+
+``LoginThrottle`` limits how often passwords are checked. Each attempt
+takes a token from the client's bucket (by remote address; set
+``PROXY_FIX_X_FOR`` behind a reverse proxy); when it is empty the attempt
+is refused with 429 before the password hash is computed, so one client's
+guesses cannot tie up the worker threads serving the public site. Failed
+attempts also drain a bucket shared by all clients, which only logs a
+warning when it runs dry: refusing there would let anyone lock the admin
+out. Buckets live in process memory or, with
+``LOGIN_RATE_LIMIT_STORAGE = 'sqlite'``, in a small SQLite file that all
+workers on the host share.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app
+from flask_login import UserMixin
+
+from cache import FileStamp
+
+logger = logging.getLogger(__name__)
+
+# Buckets untouched this long are full again and can be forgotten
+BUCKET_IDLE_SECONDS = 3600
+MAX_MEMORY_BUCKETS = 10000
+# Seconds between warnings about the global bucket, per worker
+GLOBAL_WARNING_INTERVAL = 60
+
+
+# ===================== USER CACHE =====================
+
+class CachedUser(UserMixin):
+    """Logged-in admin, detached from any database session"""
+
+    def __init__(self, id, username):
+        self.id = id
+        self.username = username
+
+
+class _UserCacheState:
+    def __init__(self, stamp, ttl):
+        self.stamp = stamp
+        self.ttl = ttl
+        self.users = {}  # user id -> (CachedUser, stamp version, expiry)
+        self.lock = threading.Lock()
+
+
+class UserCache:
+    """Per-process cache of admin identities for the user loader"""
+
+    def init_app(self, app):
+        os.makedirs(app.instance_path, exist_ok=True)
+        stamp = FileStamp(os.path.join(app.instance_path, 'users.stamp'))
+        app.extensions['user_cache'] = _UserCacheState(stamp, app.config['USER_CACHE_TTL'])
+
+    def _state(self):
+        return current_app.extensions['user_cache']
+
+    def load(self, user_id):
+        """Return the user with `user_id` (None if it does not exist)"""
+        from extensions import db
+        from models import User
+
+        state = self._state()
+        version = state.stamp.read()
+        entry = state.users.get(user_id)
+        if entry is not None and entry[1] == version and entry[2] > time.monotonic():
+            return entry[0]
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            state.users.pop(user_id, None)
+            return None
+        cached = CachedUser(user.id, user.username)
+        if state.ttl > 0:
+            with state.lock:
+                state.users[user_id] = (cached, version, time.monotonic() + state.ttl)
+        return cached
+
+    def invalidate(self):
+        """Forget every cached user here and in every other worker"""
+        state = self._state()
+        with state.lock:
+            state.users.clear()
+            state.stamp.touch()
+
+
+# ===================== LOGIN THROTTLE =====================
+
+def _take(stored, capacity, rate, now):
+    """Refill a bucket and take one token.
+
+    Returns (tokens left, seconds until a token is available); the wait is
+    0 when the token was granted.
+    """
+    if stored is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, stored[0] + (now - stored[1]) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBuckets:
+    """Token buckets for a single process"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, wait = _take(self._buckets.get(key), capacity, rate, now)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > MAX_MEMORY_BUCKETS:
+                idle = now - BUCKET_IDLE_SECONDS
+                self._buckets = {k: v for k, v in self._buckets.items() if v[1] >= idle}
+            return wait
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class SQLiteBuckets:
+    """Token buckets in a SQLite file shared by every worker on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS bucket '
+                         '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+    def take(self, key, capacity, rate, now):
+        conn = self._connect()
+        try:
+            # Take the write lock up front so concurrent workers cannot both
+            # read the same token count
+            conn.execute('BEGIN IMMEDIATE')
+            stored = conn.execute('SELECT tokens, updated FROM bucket WHERE key = ?', (key,)).fetchone()
+            tokens, wait = _take(stored, capacity, rate, now)
+            conn.execute('INSERT OR REPLACE INTO bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                         (key, tokens, now))
+            conn.execute('DELETE FROM bucket WHERE updated < ?', (now - BUCKET_IDLE_SECONDS,))
+            conn.execute('COMMIT')
+            return wait
+        finally:
+            conn.close()
+
+    def reset(self, key):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM bucket WHERE key = ?', (key,))
+        finally:
+            conn.close()
+
+
+class LoginThrottle:
+    """Token-bucket limit on login attempts per client, and an alert on
+    failed attempts overall.
+
+    Storage is selected with ``LOGIN_RATE_LIMIT_STORAGE``: ``memory`` (per
+    worker), ``sqlite`` (shared, in ``LOGIN_RATE_LIMIT_DB``) or ``null`` to
+    disable throttling.
+    """
+
+    def init_app(self, app):
+        storage = app.config['LOGIN_RATE_LIMIT_STORAGE']
+        if storage == 'memory':
+            buckets = MemoryBuckets()
+        elif storage == 'sqlite':
+            path = app.config['LOGIN_RATE_LIMIT_DB'] or os.path.join(app.instance_path, 'login_throttle.db')
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            buckets = SQLiteBuckets(path)
+        elif storage == 'null':
+            buckets = None
+        else:
+            raise ValueError(f'Unknown LOGIN_RATE_LIMIT_STORAGE: {storage!r}')
+        app.extensions['login_throttle'] = buckets
+        self._warned = 0
+
+    def check(self, client):
+        """Take a token for a login attempt from `client`.
+
+        Returns 0 if the attempt may go ahead, otherwise the number of
+        seconds until it may be retried.
+        """
+        buckets = current_app.extensions['login_throttle']
+        if buckets is None:
+            return 0
+        config = current_app.config
+        return buckets.take(f'client:{client}', config['LOGIN_ATTEMPTS_BURST'],
+                            config['LOGIN_ATTEMPTS_PER_MINUTE'] / 60, time.time())
+
+    def failed(self, client):
+        """Count a wrong password; warn if failures across all clients
+        exceed ``LOGIN_ATTEMPTS_GLOBAL_PER_MINUTE``."""
+        buckets = current_app.extensions['login_throttle']
+        if buckets is None:
+            return
+        rate = current_app.config['LOGIN_ATTEMPTS_GLOBAL_PER_MINUTE']
+        now = time.time()
+        if buckets.take('global', rate, rate / 60, now) and now - self._warned >= GLOBAL_WARNING_INTERVAL:
+            self._warned = now
+            logger.warning('More than %g failed logins per minute across all clients (latest from %s)',
+                           rate, client)
+
+    def reset(self, client):
+        """Refill `client`'s bucket after a successful login"""
+        buckets = current_app.extensions['login_throttle']
+        if buckets is not None:
+            buckets.reset(f'client:{client}')
@@ -0,0 +1,63 @@
+"""Throughput of the JSON API next to the HTML pages showing the same data.
+
+Usage::
+
+    python benchmarks/api.py [--rows 200] [--seconds 2]
+
+Each pair is requested through the test client for ``--seconds`` and the
+requests per second and body size are reported. For the API the table also
+shows a gzipped response and a revalidation with ``If-None-Match``, which
+should be answered with 304 after a single query.
+"""
+import argparse
+import time
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, bulk_seed
+
+PAIRS = [
+    ('/projects', '/api/v1/projects'),
+    ('/project/1', '/api/v1/projects/1'),
+    ('/blog', '/api/v1/posts'),
+    ('/blog/post-0', '/api/v1/posts/post-0'),
+    ('/', '/api/v1/profile'),
+]
+
+
+def throughput(client, path, seconds, headers=None):
+    """(requests per second, status, body bytes) for `path`"""
+    response = client.get(path, headers=headers)  # warm up
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        client.get(path, headers=headers)
+        count += 1
+    return count / (time.perf_counter() - start), response.status_code, len(response.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200, help='projects and posts to create')
+    parser.add_argument('--seconds', type=float, default=2.0, help='time spent on each measurement')
+    args = parser.parse_args()
+
+    app = make_app()
+    bulk_seed(app, args.rows, profile_rows=20)
+    client = app.test_client()
+
+    print(f'{args.rows} projects/posts, {args.seconds:.0f}s per measurement\n')
+    print(f'{"route":<24} {"req/s":>8} {"bytes":>8}   {"gzip req/s":>10} {"bytes":>7}   {"304 req/s":>9}')
+    for html, api in PAIRS:
+        rate, status, size = throughput(client, html, args.seconds)
+        print(f'{html:<24} {rate:>8.0f} {size:>8}')
+
+        rate, status, size = throughput(client, api, args.seconds)
+        gzip_rate, _, gzip_size = throughput(client, api, args.seconds, {'Accept-Encoding': 'gzip'})
+        etag = client.get(api).headers['ETag']
+        revalidate_rate, not_modified, _ = throughput(client, api, args.seconds, {'If-None-Match': etag})
+        assert not_modified == 304, f'{api} answered {not_modified} to a matching If-None-Match'
+        print(f'{api:<24} {rate:>8.0f} {size:>8}   {gzip_rate:>10.0f} {gzip_size:>7}   {revalidate_rate:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
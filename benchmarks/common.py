@@ -0,0 +1,204 @@
+"""Shared helpers for the benchmark scripts.
+
+The scripts in this folder are meant to be run directly, e.g.
+``python benchmarks/query_counts.py``. They build the app with the
+``testing`` config (in-memory SQLite) so nothing touches ``portfolio.db``;
+the ones that start a server use a temporary SQLite file instead.
+"""
+import os
+import statistics
+import sys
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy import event, insert
+
+from app import create_app
+from extensions import db
+from models import Project, ProjectImage, BlogPost, Experience, Tool
+import content
+import search
+import stats
+
+
+def make_app(config_name='testing', **overrides):
+    """Create an app instance for benchmarking."""
+    app = create_app(config_name)
+    app.config.update(overrides)
+    return app
+
+
+class QueryCounter:
+    """Counts SQL statements executed on an engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before_execute)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(app):
+    """Context manager yielding a QueryCounter bound to the app's engine."""
+    with app.app_context():
+        engine = db.engine
+    with QueryCounter(engine) as counter:
+        yield counter
+
+
+def seed(app, projects=10, images_per_project=3, posts=10, experiences=5, tools=10):
+    """Populate the database with synthetic portfolio content."""
+    with app.app_context():
+        start = datetime(2020, 1, 1)
+        project_rows = []
+        for i in range(projects):
+            project = Project(
+                title=f'Project {i}',
+                category=['Web App', 'ML', 'CLI'][i % 3],
+                live_link='https://example.com',
+                repo_link='https://github.com/example/repo',
+                start_date=date(2020, 1, 1),
+                created_at=start + timedelta(minutes=i),
+            )
+            project.set_description(f'Description for project {i}. ' * 20)
+            project_rows.append(project)
+        db.session.add_all(project_rows)
+        db.session.flush()
+
+        for project in project_rows:
+            for j in range(images_per_project):
+                db.session.add(ProjectImage(
+                    project_id=project.id,
+                    image_path=f'/static/uploads/project_{project.id}_{j}.png',
+                    order=j,
+                ))
+
+        for i in range(posts):
+            related = project_rows[i % len(project_rows)].id if project_rows else None
+            post = BlogPost(
+                title=f'Post {i}',
+                slug=f'post-{i}',
+                project_id=related,
+                published=True,
+                created_at=start + timedelta(minutes=i),
+            )
+            post.set_content(f'<p>Body of post {i}.</p>' * 50)
+            db.session.add(post)
+
+        for i in range(experiences):
+            db.session.add(Experience(
+                title=f'Experience {i}',
+                company=f'Company {i}',
+                role='Engineer',
+                start_date=date(2018 + i % 5, 1, 1),
+                description='Did things.',
+                order=i,
+            ))
+
+        for i in range(tools):
+            db.session.add(Tool(name=f'Tool {i}', category='Language', order=i))
+
+        db.session.commit()
+
+
+def bulk_seed(app, rows, images_per_project=2, profile_rows=None, batch_size=5000):
+    """Insert `rows` projects and posts with Core bulk inserts.
+
+    ``seed()`` goes through the ORM one object at a time, which is too slow
+    for 100k rows. Experiences and tools are capped at `profile_rows`
+    (default: `rows`) since the homepage lists all of them.
+    """
+    profile_rows = rows if profile_rows is None else profile_rows
+    start = datetime(2020, 1, 1)
+    # Rendering Markdown per row would dominate seeding, so render each
+    # text once with a placeholder for the row number
+    description = '<p>Description for project N_ROW, built with Python and Flask.</p>' * 4
+    project_rendered = content.render(description, Project.EXCERPT_LENGTH)
+    body = '<p>Body of post N_ROW about caching, SQL and templates.</p>' * 8
+    post_rendered = content.render(body, BlogPost.EXCERPT_LENGTH)
+
+    def insert_batches(model, make_row, count):
+        for offset in range(0, count, batch_size):
+            db.session.execute(insert(model), [make_row(i) for i in range(offset, min(count, offset + batch_size))])
+
+    with app.app_context():
+        insert_batches(Project, lambda i: {
+            'id': i + 1,
+            'title': f'Project {i}',
+            'description': description.replace('N_ROW', str(i)),
+            'description_html': project_rendered.html.replace('N_ROW', str(i)),
+            'excerpt': project_rendered.excerpt.replace('N_ROW', str(i)),
+            'category': ['Web App', 'ML', 'CLI'][i % 3],
+            'live_link': 'https://example.com',
+            'repo_link': 'https://github.com/example/repo',
+            'start_date': date(2020, 1, 1),
+            'created_at': start + timedelta(minutes=i),
+        }, rows)
+        insert_batches(ProjectImage, lambda i: {
+            'project_id': i // images_per_project + 1,
+            'image_path': f'/static/uploads/project_{i // images_per_project + 1}_{i % images_per_project}.png',
+            'order': i % images_per_project,
+        }, rows * images_per_project)
+        insert_batches(BlogPost, lambda i: {
+            'title': f'Post {i}',
+            'slug': f'post-{i}',
+            'content': body.replace('N_ROW', str(i)),
+            'content_html': post_rendered.html.replace('N_ROW', str(i)),
+            'excerpt': post_rendered.excerpt.replace('N_ROW', str(i)),
+            'reading_time': post_rendered.reading_time,
+            'project_id': i % rows + 1 if rows else None,
+            'published': True,
+            'created_at': start + timedelta(minutes=i),
+        }, rows)
+        insert_batches(Experience, lambda i: {
+            'title': f'Experience {i}',
+            'company': f'Company {i}',
+            'role': 'Engineer',
+            'start_date': date(2018 + i % 5, 1, 1),
+            'description': 'Did things.',
+            'order': i,
+        }, profile_rows)
+        insert_batches(Tool, lambda i: {'name': f'Tool {i}', 'category': 'Language', 'order': i}, profile_rows)
+        if search.fts_available():
+            search.rebuild()
+        # Core inserts bypass the ORM hooks that keep the counters current
+        stats.recount(db.session.connection())
+        db.session.commit()
+
+
+def summarize(latencies):
+    """Latency percentiles (ms) for a list of samples"""
+    if not latencies:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'mean_ms': None}
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [latencies[0]] * 99
+    return {
+        'p50_ms': round(cuts[49], 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'mean_ms': round(statistics.fmean(latencies), 3),
+    }
+
+
+def login(client, app):
+    """Log the test client in as the seeded admin user."""
+    return client.post('/admin/login', data={
+        'username': os.getenv('ADMIN_USERNAME', 'admin'),
+        'password': os.getenv('ADMIN_PASSWORD', 'admin123'),
+    })
@@ -0,0 +1,69 @@
+"""Bytes on the wire and cost of minifying and compressing dynamic pages.
+
+Usage::
+
+    python benchmarks/compression.py [--rows 50] [--seconds 1] [path ...]
+
+For each page the body is fetched as rendered (``MINIFY_HTML`` and
+``COMPRESS_RESPONSES`` off), minified, and minified and compressed, and
+the size of each is reported. Requests per second are measured with
+compression on for a page rendered every time (response cache off) and
+for one served from the response cache, which compresses a page version
+only once.
+"""
+import argparse
+import time
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, bulk_seed
+
+import compression
+from extensions import response_cache
+
+PATHS = ['/', '/projects', '/blog', '/blog/post-0']
+
+
+def rate(client, path, seconds, headers):
+    client.get(path, headers=headers)  # warm up
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        client.get(path, headers=headers)
+        count += 1
+    return count / (time.perf_counter() - start)
+
+
+def client_for(rows, cache_type='null', **overrides):
+    app = make_app(RESPONSE_CACHE_TYPE=cache_type, **overrides)
+    # The cache backend was created before the override was applied
+    response_cache.init_app(app)
+    bulk_seed(app, rows)
+    return app.test_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50, help='projects and posts to create')
+    parser.add_argument('--seconds', type=float, default=1.0, help='time spent on each measurement')
+    parser.add_argument('paths', nargs='*', default=PATHS)
+    args = parser.parse_args()
+
+    encoding = 'br' if compression.brotli is not None else 'gzip'
+    headers = {'Accept-Encoding': encoding}
+    plain = client_for(args.rows, MINIFY_HTML=False, COMPRESS_RESPONSES=False)
+    uncached = client_for(args.rows)
+    cached = client_for(args.rows, 'memory')
+
+    print(f'{args.rows} projects/posts, {encoding}, {args.seconds:g}s per measurement\n')
+    print(f'{"page":<16} {"raw":>8} {"minified":>9} {encoding:>8}   {"uncached req/s":>14} {"cached req/s":>12}')
+    for path in args.paths:
+        raw = len(plain.get(path).data)
+        minified = len(uncached.get(path).data)
+        compressed = uncached.get(path, headers=headers)
+        assert compressed.headers.get('Content-Encoding') == encoding, f'{path} was not compressed'
+        print(f'{path:<16} {raw:>8} {minified:>9} {len(compressed.data):>8}   '
+              f'{rate(uncached, path, args.seconds, headers):>14.0f} {rate(cached, path, args.seconds, headers):>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Time the static export and check that its links resolve.
+
+Usage::
+
+    python benchmarks/export.py [--rows 50]
+    python benchmarks/export.py --check     # fail on links the tree cannot serve
+
+The site is exported twice into a temporary folder, once from scratch and
+once with nothing changed (every page skipped by its signature), with
+``CURSOR_PAGINATION`` off and on. With ``--check`` every local ``href`` and
+``src`` in the exported HTML must name a file in the tree, the way a static
+server without query-string support resolves it; ``/admin`` is proxied to
+the app and not exported, and the seeded rows name uploads that do not
+exist.
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, bulk_seed
+
+from exporter import export_site
+
+LINK_RE = re.compile(r'(?:href|src)="(/[^"]*)"')
+SKIPPED_PREFIXES = ('/admin', '/static/uploads/')
+# Linked from the layout; proxied to the app, like /admin
+NOT_EXPORTED = {'/search'}
+
+
+def resolve(output_dir, link):
+    """File a static server would answer `link` with, or None.
+
+    Query strings are ignored by the server, so a page link that relies on
+    one (``?page=``, ``?cursor=``) is dead; static files only carry the
+    ``?v=`` fingerprint.
+    """
+    path, _, query = link.split('#', 1)[0].partition('?')
+    if query and not path.startswith('/static/'):
+        return None
+    path = path.lstrip('/')
+    candidates = [os.path.join(output_dir, path), os.path.join(output_dir, path, 'index.html')]
+    return next((c for c in candidates if os.path.isfile(c)), None)
+
+
+def dead_links(output_dir):
+    """{link: first page containing it} for links that do not resolve"""
+    dead = {}
+    for dirpath, dirnames, filenames in os.walk(output_dir):
+        dirnames[:] = [d for d in dirnames if d != 'static']
+        for name in filenames:
+            if not name.endswith('.html'):
+                continue
+            page = os.path.join(dirpath, name)
+            with open(page, encoding='utf-8') as f:
+                html = f.read()
+            for link in LINK_RE.findall(html):
+                if link.startswith('//') or link.startswith(SKIPPED_PREFIXES) \
+                        or link.split('?', 1)[0] in NOT_EXPORTED:
+                    continue
+                if resolve(output_dir, link) is None:
+                    dead.setdefault(link, os.path.relpath(page, output_dir))
+    return dead
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50, help='projects and posts to create')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero if an exported link is dead.')
+    args = parser.parse_args()
+
+    failures = []
+    print(f'{"cursor pagination":<18} {"full export":>12} {"unchanged":>10} {"pages":>6} {"dead links":>11}')
+    for cursor_pagination in (False, True):
+        app = make_app(CURSOR_PAGINATION=cursor_pagination)
+        bulk_seed(app, args.rows)
+        output_dir = tempfile.mkdtemp(prefix='portfolio-export-')
+        try:
+            start = time.perf_counter()
+            stats = export_site(app, output_dir)
+            full = time.perf_counter() - start
+            start = time.perf_counter()
+            export_site(app, output_dir)
+            unchanged = time.perf_counter() - start
+            dead = dead_links(output_dir)
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        print(f'{str(cursor_pagination):<18} {full * 1000:>10.0f}ms {unchanged * 1000:>8.0f}ms '
+              f"{stats['rendered']:>6} {len(dead):>11}")
+        failures += [f'{link} (in {page}, CURSOR_PAGINATION={cursor_pagination})' for link, page in dead.items()]
+
+    if args.check and failures:
+        print('\nDead links:\n  ' + '\n  '.join(failures[:20]), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""Throughput of `flask serve` as the number of worker processes grows.
+
+Seeds a temporary SQLite database, then for each worker count starts
+``flask --app wsgi serve`` and hammers the public pages with keep-alive
+connections from several client processes for a fixed time. The response
+cache is disabled by default so every request renders a page.
+
+Usage::
+
+    python benchmarks/load_test.py [--workers 1,2,4] [--threads 4] [--duration 10]
+                                   [--connections 16] [--cache memory]
+
+The load generator runs on the same machine and competes for the same
+cores, so absolute numbers are pessimistic; compare the rows.
+"""
+import argparse
+import os
+import tempfile
+
+# The server processes read their database from the environment, so it has
+# to be set before the app (and config) are imported
+DB_DIR = tempfile.mkdtemp(prefix='portfolio-load-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DB_DIR, 'load.db')}"
+
+import common  # noqa: E402,F401  (puts the project root on sys.path)
+from common import make_app, seed, summarize  # noqa: E402
+from loadgen import free_port, start_server, stop_server, run_load  # noqa: E402
+
+PATHS = ['/', '/projects', '/blog', '/blog/post-0', '/project/1']
+
+
+def measure(workers, args):
+    port = free_port()
+    server = start_server(port, workers, args.threads, dict(os.environ, RESPONSE_CACHE_TYPE=args.cache))
+    try:
+        run_load(port, PATHS, args.connections, 1, args.client_processes)  # warm up
+        latencies, errors = run_load(port, PATHS, args.connections, args.duration, args.client_processes)
+    finally:
+        stop_server(server)
+    return dict(summarize(latencies), rps=len(latencies) / args.duration, errors=errors)
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    default_workers = sorted({n for n in (1, 2, 4, 8, 16) if n <= cpus} | {cpus})
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default=','.join(map(str, default_workers)),
+                        help='Comma-separated worker counts to compare.')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--client-processes', type=int, default=max(1, cpus // 2))
+    parser.add_argument('--cache', default='null', help='RESPONSE_CACHE_TYPE for the server.')
+    parser.add_argument('--projects', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=50)
+    args = parser.parse_args()
+
+    seed(make_app('production'), projects=args.projects, posts=args.posts)
+    print(f'{cpus} CPUs, {args.threads} threads/worker, {args.connections} connections, '
+          f'cache={args.cache}, {args.duration:g}s per run\n')
+
+    print(f'{"workers":>7} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>7} {"speedup":>8}')
+    baseline = None
+    for workers in [int(n) for n in args.workers.split(',')]:
+        result = measure(workers, args)
+        baseline = baseline or result['rps']
+        print(f"{workers:>7} {result['rps']:>9.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+              f"{result['p99_ms']:>8.1f} {result['errors']:>7} {result['rps'] / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""HTTP load generation against a locally started `flask serve`.
+
+Shared by ``load_test.py`` and ``suite.py``. Clients are threads with
+keep-alive connections, spread over several processes so the generator
+is not limited by a single interpreter lock.
+"""
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from common import ROOT
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not start on port {port}')
+
+
+def start_server(port, workers, threads, env=None):
+    """Start ``flask --app wsgi serve`` and wait until it accepts connections"""
+    command = [sys.executable, '-m', 'flask', '--app', 'wsgi', 'serve',
+               '--bind', f'127.0.0.1:{port}', '--workers', str(workers), '--threads', str(threads)]
+    server = subprocess.Popen(command, cwd=ROOT, env=env or os.environ.copy(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        server.kill()
+        raise
+    return server
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+
+def process_tree_rss(pid):
+    """Current and peak resident memory (MiB) of `pid` plus its children.
+
+    Returns ``(rss, peak)`` summed over the processes, or ``None`` where
+    /proc is not available.
+    """
+    if not os.path.isdir('/proc'):
+        return None
+    pids = [pid]
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after it
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            pids.append(int(entry))
+
+    rss = peak = 0
+    for process in pids:
+        try:
+            with open(f'/proc/{process}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('VmHWM:'):
+                        peak += int(line.split()[1])
+        except OSError:
+            continue
+    return rss / 1024, peak / 1024
+
+
+def client_process(port, paths, connections, duration):
+    """Run `connections` keep-alive clients for `duration` seconds"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        local, failed, i = [], 0, offset
+        while time.monotonic() < deadline:
+            path = paths[i % len(paths)]
+            i += 1
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                continue
+            local.append((time.perf_counter() - start) * 1000)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(connections)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, sum(errors)
+
+
+def run_load(port, paths, connections, duration, processes):
+    """Return (latencies in ms, error count) for a timed run"""
+    processes = max(1, min(processes, connections))
+    per_process = [connections // processes + (1 if n < connections % processes else 0) for n in range(processes)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        results = list(pool.map(client_process, [port] * processes, [paths] * processes,
+                                per_process, [duration] * processes))
+    latencies = [ms for result in results for ms in result[0]]
+    errors = sum(result[1] for result in results)
+    return latencies, errors
@@ -0,0 +1,98 @@
+"""Measure Python memory allocated per request with very large posts.
+
+Usage::
+
+    python benchmarks/memory.py                # 300 KB bodies
+    python benchmarks/memory.py --body-kb 800
+    python benchmarks/memory.py --check        # fail if a list page loads bodies
+
+Every post and project gets a Markdown source and rendered HTML of
+``--body-kb`` each. For each route the peak of ``tracemalloc`` during one
+request is reported. List pages only show excerpts, so their peak should
+stay well below the size of a single body no matter how large bodies get;
+detail pages necessarily hold one.
+
+A second table loads one page of posts straight through the ORM with and
+without ``POST_LIST_DEFERRED`` to show what the deferral saves.
+"""
+import argparse
+import sys
+import tracemalloc
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, seed, login
+from sqlalchemy import update
+
+from extensions import db
+from models import BlogPost, Project, POST_LIST_DEFERRED
+
+LIST_ROUTES = ['/', '/projects', '/blog', '/admin/projects', '/admin/posts', '/admin/post/new']
+DETAIL_ROUTES = ['/project/1', '/blog/post-0']
+ADMIN_ROUTES = {'/admin/projects', '/admin/posts', '/admin/post/new'}
+
+
+def inflate(app, body_kb):
+    """Replace every post and project body with `body_kb` KB of text"""
+    paragraph = '<p>' + 'lorem ipsum dolor sit amet ' * 36 + '</p>\n'
+    body = paragraph * max(1, body_kb * 1024 // len(paragraph))
+    with app.app_context():
+        db.session.execute(update(BlogPost).values(content=body, content_html=body))
+        db.session.execute(update(Project).values(description=body, description_html=body))
+        db.session.commit()
+    return len(body)
+
+
+def peak_kib(fn):
+    """Peak traced allocation (KiB) while calling `fn`"""
+    fn()  # warm up: template compilation, statement caches, etc.
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=30, help='posts and projects to create')
+    parser.add_argument('--body-kb', type=int, default=300, help='size of each body (source and HTML)')
+    parser.add_argument('--check', action='store_true', help='fail if a list page peaks above one body')
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    seed(app, projects=args.rows, posts=args.rows, experiences=5, tools=10)
+    body_kib = inflate(app, args.body_kb) / 1024
+
+    results = {}
+    for path in LIST_ROUTES + DETAIL_ROUTES:
+        if path in ADMIN_ROUTES:
+            login(client, app)
+        results[path] = peak_kib(lambda: client.get(path))
+
+    print(f'{args.rows} posts/projects, bodies of {body_kib:.0f} KiB (source + HTML each)\n')
+    print(f'{"route":<20} {"peak KiB":>10}')
+    failures = []
+    for path, peak in results.items():
+        print(f'{path:<20} {peak:>10.0f}')
+        if path in LIST_ROUTES and peak > body_kib:
+            failures.append(f'{path} peaked at {peak:.0f} KiB, more than one body ({body_kib:.0f} KiB)')
+
+    per_page = app.config['POSTS_PER_PAGE']
+
+    def load_page(*options):
+        with app.app_context():
+            BlogPost.query.options(*options).order_by(BlogPost.created_at.desc()).limit(per_page).all()
+
+    eager = peak_kib(load_page)
+    deferred = peak_kib(lambda: load_page(*POST_LIST_DEFERRED))
+    print(f'\nORM load of {per_page} posts: {eager:.0f} KiB all columns, {deferred:.0f} KiB deferred')
+
+    if args.check and failures:
+        print('\n'.join(['', 'FAILED:'] + failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
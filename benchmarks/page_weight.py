@@ -0,0 +1,117 @@
+"""Requests and bytes a first visit to a page costs, CDN versus bundled assets.
+
+Usage::
+
+    flask build-assets                          # once, to have bundles to compare
+    python benchmarks/page_weight.py [path ...]
+
+The page is rendered with ``ASSET_BUNDLES`` off (Bootstrap and fonts from
+the CDNs, separate local files) and on (the bundles in ``static/dist``).
+Every stylesheet, script, preload and font a browser would fetch on a
+first visit is requested: local ones through the test client with gzip,
+third-party ones over the network. Offline, third-party requests are
+still counted but their bytes are reported as unknown.
+"""
+import gzip
+import re
+import sys
+import urllib.request
+from urllib.parse import urljoin, urlsplit
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, seed
+
+import bundles
+from extensions import asset_bundles
+
+TAG_RE = re.compile(r'<(link|script)\b([^>]*)>', re.I)
+ATTR_RE = re.compile(r'([\w-]+)="([^"]*)"')
+CSS_URL_RE = re.compile(r'url\(([^)]+)\)')
+
+
+def fetch(client, url):
+    """(body bytes or None if unreachable, transferred size or None)"""
+    if url.startswith('/'):
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+        if response.status_code != 200:
+            return None, None
+        body = response.data
+        if response.headers.get('Content-Encoding') == 'gzip':
+            return gzip.decompress(body), len(body)
+        return body, len(body)
+    request = urllib.request.Request(url, headers={'User-Agent': bundles.FONTS_USER_AGENT})
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            body = response.read()
+    except OSError:
+        return None, None
+    # CDNs compress text in transit; estimate that with gzip
+    return body, len(body) if url.endswith('.woff2') else len(gzip.compress(body))
+
+
+def page_weight(client, path):
+    page = client.get(path, headers={'Accept-Encoding': 'gzip, br'})
+    html = page.get_data(as_text=True)
+    html = re.sub(r'<noscript>.*?</noscript>', '', html, flags=re.S)
+    head = html[:html.find('</head>')]
+
+    result = {'requests': 1, 'bytes': len(gzip.compress(page.data)), 'unknown': 0,
+              'origins': set(), 'blocking': 0}
+    pending = []
+    for tag, attrs in TAG_RE.findall(html):
+        attrs = dict(ATTR_RE.findall(attrs))
+        url = attrs.get('src') if tag.lower() == 'script' else attrs.get('href')
+        rel = attrs.get('rel', '')
+        if not url or (tag.lower() == 'link' and rel not in ('stylesheet', 'preload')):
+            continue
+        if tag.lower() == 'link' and rel == 'stylesheet' and f'href="{url}"' in head:
+            result['blocking'] += 1
+        pending.append(url.replace('&amp;', '&'))
+
+    seen = set()
+    while pending:
+        url = pending.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        result['requests'] += 1
+        if not url.startswith('/'):
+            result['origins'].add(urlsplit(url).netloc)
+        body, size = fetch(client, url)
+        if body is None:
+            result['unknown'] += 1
+            continue
+        result['bytes'] += size
+        if urlsplit(url).netloc == 'fonts.googleapis.com':
+            # A browser only downloads the subsets the page's text needs
+            css = '\n'.join(bundles.select_font_faces(body.decode('utf-8')))
+        elif urlsplit(url).path.endswith('.css'):
+            css = body.decode('utf-8')
+        else:
+            continue
+        pending += [urljoin(url, u.strip('\'"')) for u in CSS_URL_RE.findall(css)
+                    if not u.strip('\'"').startswith('data:')]
+    return result
+
+
+def main():
+    paths = sys.argv[1:] or ['/']
+    print(f'{"page":<12} {"assets":<8} {"requests":>8} {"3rd-party hosts":>15} '
+          f'{"blocking CSS":>12} {"KiB":>8} {"unknown":>8}')
+    for enabled in (False, True):
+        app = make_app(ASSET_BUNDLES=enabled)
+        # The manifest was loaded before the override was applied
+        asset_bundles.load(app)
+        if enabled and not app.extensions['asset_bundles']:
+            print('(no bundles built; run `flask build-assets` first)')
+            break
+        seed(app)
+        client = app.test_client()
+        for path in paths:
+            r = page_weight(client, path)
+            print(f'{path:<12} {"bundled" if enabled else "CDN":<8} {r["requests"]:>8} {len(r["origins"]):>15} '
+                  f'{r["blocking"]:>12} {r["bytes"] / 1024:>8.1f} {r["unknown"]:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""Report the number of SQL statements issued per request for each route.
+
+Usage::
+
+    python benchmarks/query_counts.py            # print counts
+    python benchmarks/query_counts.py --check    # fail if a budget is exceeded
+
+With ``--check`` every route is measured at several content sizes and must
+stay within its entry in ``QUERY_BUDGETS`` at all of them, so an N+1 pattern
+(one lazy load per project/post) shows up as a failure. Routes listed in
+``EXPECTED_STATUS`` (forged API cursors, which must be refused with 400)
+are checked for that status instead of 200.
+"""
+import argparse
+import base64
+import json
+import sys
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, seed, count_queries, login
+
+
+def forged_cursor(values):
+    """A cursor that decodes as JSON but does not fit the sort key"""
+    return 'n.' + base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+
+BAD_PROJECT_CURSOR = f'/api/v1/projects?cursor={forged_cursor([[1], [2]])}'
+BAD_POST_CURSOR = f'/api/v1/posts?cursor={forged_cursor([{"x": 1}, 2])}'
+
+# Maximum statements per request, independent of how many rows exist.
+# The logged-in user comes from the user cache, so admin routes make no
+# identity query; the dashboard has one for its counters and three for the
+# background job panel.
+QUERY_BUDGETS = {
+    '/': 4,
+    '/projects': 3,
+    '/project/1': 3,
+    '/blog': 2,
+    '/blog/post-0': 1,
+    '/static/css/style.css': 0,
+    # API: one query for the ETag, then the rows and one per eager-loaded relation
+    '/api/v1/projects': 3,
+    '/api/v1/projects/1': 4,
+    '/api/v1/posts': 3,
+    '/api/v1/posts/post-0': 3,
+    '/api/v1/profile': 4,
+    # Forged cursors are refused after the ETag query
+    BAD_PROJECT_CURSOR: 1,
+    BAD_POST_CURSOR: 1,
+    # Sitemap and feeds: one query to revalidate the stored document
+    '/sitemap.xml': 1,
+    '/feed.xml': 1,
+    '/rss.xml': 1,
+    '/admin/dashboard': 4,
+    '/admin/projects': 3,
+    '/admin/posts': 2,
+    '/admin/experiences': 2,
+    '/admin/tools': 2,
+    '/admin/settings': 1,
+}
+
+PUBLIC_ROUTES = ['/', '/projects', '/project/1', '/blog', '/blog/post-0', '/static/css/style.css',
+                 '/api/v1/projects', '/api/v1/projects/1', '/api/v1/posts', '/api/v1/posts/post-0',
+                 '/api/v1/profile', '/sitemap.xml', '/feed.xml', '/rss.xml', BAD_PROJECT_CURSOR, BAD_POST_CURSOR]
+# Routes expected to answer with something other than 200
+EXPECTED_STATUS = {BAD_PROJECT_CURSOR: 400, BAD_POST_CURSOR: 400}
+ADMIN_ROUTES = ['/admin/dashboard', '/admin/projects', '/admin/posts',
+                '/admin/experiences', '/admin/tools', '/admin/settings']
+
+SCALES = [1, 10, 50]
+
+
+def measure(app, client, path):
+    # Warm up once so one-off work (first connection, etc.) is not counted
+    client.get(path)
+    with count_queries(app) as counter:
+        response = client.get(path)
+    return response.status_code, counter.count
+
+
+def measure_all(rows):
+    """Return {path: (status, count)} for a database seeded with `rows` of each entity"""
+    app = make_app()
+    client = app.test_client()
+    seed(app, projects=rows, posts=rows, experiences=rows, tools=rows)
+
+    results = {}
+    for path in PUBLIC_ROUTES:
+        results[path] = measure(app, client, path)
+    login(client, app)
+    for path in ADMIN_ROUTES:
+        results[path] = measure(app, client, path)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='assert QUERY_BUDGETS at every scale')
+    args = parser.parse_args()
+
+    scales = SCALES if args.check else [10]
+    runs = {rows: measure_all(rows) for rows in scales}
+
+    header = ' '.join(f'{f"n={rows}":>7}' for rows in scales)
+    print(f'{"route":<24} {"budget":>6} {header}')
+    failures = []
+    for path, budget in QUERY_BUDGETS.items():
+        counts = []
+        for rows in scales:
+            status, count = runs[rows][path]
+            if status != EXPECTED_STATUS.get(path, 200):
+                failures.append(f'{path} returned {status} with n={rows}')
+            if count > budget:
+                failures.append(f'{path} issued {count} queries with n={rows} (budget {budget})')
+            counts.append(f'{count:>7}')
+        print(f'{path:<24} {budget:>6} {" ".join(counts)}')
+
+    if args.check and failures:
+        print('\n'.join(['', 'FAILED:'] + failures))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Check which commits move public reads from the replicas to the primary.
+
+Usage::
+
+    python benchmarks/replicas.py            # print where reads go
+    python benchmarks/replicas.py --check    # fail if a scenario routes wrongly
+
+A SQLite primary and one replica are created in a temporary folder. After
+each scenario commits, the script asks the router where a public page's
+reads would go. Job queue maintenance, which every process runs once a
+minute, and statements that change no rows must leave reads on the replica;
+only a real content change may send every worker to the primary for
+``REPLICA_STICKY_SECONDS``.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix='portfolio-replicas-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'primary.db')}"
+os.environ['DATABASE_REPLICA_URLS'] = f"sqlite:///{os.path.join(WORKDIR, 'replica.db')}"
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, seed
+from sqlalchemy import update
+
+from extensions import db, db_router, job_queue
+from models import Project
+
+
+def idle_maintenance(app):
+    job_queue.maintain(app)
+
+
+def enqueue_job(app):
+    job_queue.enqueue('stats.storage')
+    db.session.commit()
+
+
+def update_nothing(app):
+    db.session.execute(update(Project).where(Project.id == -1).values(title='Nobody'))
+    db.session.commit()
+
+
+def unchanged_flush(app):
+    project = db.session.get(Project, 1)
+    project.title = project.title
+    db.session.commit()
+
+
+def edit_project(app):
+    db.session.get(Project, 1).title = 'Edited'
+    db.session.commit()
+
+
+# (scenario, whether reads should stay on the replica afterwards)
+SCENARIOS = [
+    (idle_maintenance, True),
+    (enqueue_job, True),
+    (update_nothing, True),
+    (unchanged_flush, True),
+    (edit_project, False),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='Exit non-zero if a scenario routes wrongly.')
+    args = parser.parse_args()
+
+    app = make_app('development', TESTING=True)
+    seed(app)
+    db_router.sync(app)
+    stamp = app.extensions['db_router'].stamp
+
+    failures = []
+    print(f'{"scenario":<20} {"reads go to":<12} expected')
+    for scenario, on_replica in SCENARIOS:
+        # Forget the previous scenario's write
+        if os.path.exists(stamp.path):
+            os.remove(stamp.path)
+        with app.app_context():
+            scenario(app)
+        with app.test_request_context('/projects'):
+            chosen = 'replica' if db_router.choose() is not None else 'primary'
+        expected = 'replica' if on_replica else 'primary'
+        print(f'{scenario.__name__:<20} {chosen:<12} {expected}')
+        if chosen != expected:
+            failures.append(scenario.__name__)
+
+    if args.check and failures:
+        print(f"\nFAILED: {', '.join(failures)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(main())
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,67 @@
+"""Search latency: FTS5 index versus a naive LIKE scan.
+
+Usage::
+
+    python benchmarks/search.py [--posts 20000] [--repeat 20]
+"""
+import argparse
+import random
+import statistics
+import time
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app
+from sqlalchemy import insert
+
+from extensions import db
+from models import BlogPost
+import search
+
+QUERIES = ['python', 'distributed cache', 'kubernetes deploy', 'zebra']
+
+
+def seed_posts(count, words_per_post=300, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f'word{i}' for i in range(5000)] + ['python', 'cache', 'distributed', 'kubernetes', 'deploy']
+    rows = []
+    for i in range(count):
+        body = ' '.join(rng.choice(vocabulary) for _ in range(words_per_post))
+        rows.append({'title': f'Post {i}', 'slug': f'post-{i}', 'content': f'<p>{body}</p>', 'published': True})
+    db.session.execute(insert(BlogPost), rows)
+    search.rebuild()
+    db.session.commit()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        seed_posts(args.posts)
+        print(f'Seeded and indexed {args.posts} posts in {time.perf_counter() - start:.1f}s\n')
+
+        print(f'{"query":<20} {"fts ms":>8} {"like ms":>8} {"hits":>6}')
+        for query in QUERIES:
+            words = search.WORD_RE.findall(query)
+            expression = search.match_expression(query)
+            fts_ms = timed(lambda: search._fts_search(expression, 20, 0), args.repeat)
+            like_ms = timed(lambda: search._like_search(words, 20, 0), max(1, args.repeat // 4))
+            hits = len(search._fts_search(expression, 20, 0))
+            print(f'{query:<20} {fts_ms:>8.2f} {like_ms:>8.2f} {hits:>6}')
+
+
+if __name__ == '__main__':
+    main()
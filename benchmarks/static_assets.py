@@ -0,0 +1,60 @@
+"""Bytes transferred and requests per page view for local static assets.
+
+Usage::
+
+    python benchmarks/static_assets.py [path ...]
+
+For each page the local ``/static`` assets it references are fetched the
+way a browser would on a first visit (with and without compression) and
+on a repeat visit, where any asset not marked cacheable has to be
+revalidated with a conditional request.
+"""
+import re
+import sys
+
+import common  # noqa: F401  (puts the project root on sys.path)
+from common import make_app, seed
+
+ASSET_RE = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+
+
+def cacheable(response):
+    cache_control = response.cache_control
+    return bool(cache_control.immutable or (cache_control.max_age and not cache_control.no_cache))
+
+
+def page_view(client, path):
+    page = client.get(path, headers={'Accept-Encoding': 'gzip, br'})
+    assets = sorted(set(ASSET_RE.findall(page.get_data(as_text=True))))
+
+    identity_bytes = compressed_bytes = 0
+    revalidations = 0
+    fetched = 0
+    for url in assets:
+        response = client.get(url, headers={'Accept-Encoding': 'identity'})
+        if response.status_code != 200:
+            # Seeded rows point at upload files that do not exist
+            continue
+        fetched += 1
+        identity_bytes += len(response.data)
+        response = client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+        compressed_bytes += len(response.data)
+        if not cacheable(response):
+            revalidations += 1
+    return fetched, identity_bytes, compressed_bytes, revalidations
+
+
+def main():
+    paths = sys.argv[1:] or ['/', '/projects', '/blog']
+    app = make_app()
+    seed(app)
+    client = app.test_client()
+
+    print(f'{"page":<12} {"assets":>6} {"identity B":>11} {"encoded B":>10} {"repeat-view requests":>21}')
+    for path in paths:
+        count, identity_bytes, compressed_bytes, revalidations = page_view(client, path)
+        print(f'{path:<12} {count:>6} {identity_bytes:>11} {compressed_bytes:>10} {revalidations:>21}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,481 @@
+"""Benchmark suite: every route at several data sizes, saved as JSON.
+
+Usage::
+
+    python benchmarks/suite.py                                   # scales 10,1000,100000
+    python benchmarks/suite.py --scales 10,1000 --output before.json
+    python benchmarks/suite.py --compare before.json after.json
+
+Each scale gets its own temporary SQLite database and fresh processes: one
+seeds it with bulk inserts, another measures it, so peak RSS is not
+inflated by seeding or by an earlier scale. The measuring process
+
+1. drives every route in ``app.py`` through the Flask test client (public
+   pages, admin pages, the admin create/edit/delete POSTs and the NDJSON
+   export and import) and records
+   p50/p95/p99 latency, requests per second and SQL statements per request;
+2. starts ``flask --app wsgi serve`` and runs the concurrent load generator
+   from ``loadgen.py`` against the public pages.
+
+Results go to ``benchmarks/results/<time>-<commit>.json`` unless
+``--output`` is given; ``--compare`` prints the differences between two
+result files.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+SCALES = [10, 1000, 100000]
+# Experiences and tools are all rendered on the homepage, so they stay at a
+# realistic size while projects and posts grow
+PROFILE_ROWS = 100
+LOAD_PATHS = ['/', '/projects', '/project/1', '/blog', '/blog/post-0', '/search?q=python']
+# Tools and posts in each file posted to /admin/import
+IMPORT_RECORDS = 10
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process, or None where unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True,
+                               text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+# ---------------------------------------------------------------------------
+# Measuring (runs in a child process per scale)
+# ---------------------------------------------------------------------------
+
+class RouteRunner:
+    """Times requests through the test client and counts their SQL"""
+
+    def __init__(self, app, repeat, budget):
+        from common import QueryCounter
+        from extensions import db
+
+        self.app = app
+        self.repeat = repeat
+        self.budget = budget
+        with app.app_context():
+            self.counter = QueryCounter(db.engine)
+        self.results = {}
+
+    def measure(self, name, endpoint, call, setup=None, repeat=None, warmup=True):
+        """Run `call(setup(i))` up to `repeat` times (at least 3, within the time budget)"""
+        from common import summarize
+
+        setup = setup or (lambda i: i)
+        repeat = self.repeat if repeat is None else repeat
+        if warmup:
+            call(setup(-1))
+
+        latencies, statuses, statements = [], Counter(), 0
+        deadline = time.perf_counter() + self.budget
+        with self.counter:
+            for i in range(repeat):
+                argument = setup(i)
+                before = self.counter.count
+                start = time.perf_counter()
+                response = call(argument)
+                latencies.append((time.perf_counter() - start) * 1000)
+                statements += self.counter.count - before
+                statuses[response.status_code] += 1
+                if i >= 2 and time.perf_counter() > deadline:
+                    break
+
+        result = summarize(latencies)
+        result.update({
+            'endpoint': endpoint,
+            'requests': len(latencies),
+            'rps': round(len(latencies) / (sum(latencies) / 1000), 1) if latencies else None,
+            'sql_per_request': round(statements / len(latencies), 2) if latencies else None,
+            'status': {str(code): count for code, count in sorted(statuses.items())},
+        })
+        self.results[name] = result
+        print(f"  {name:<48} p50 {result['p50_ms'] or 0:>9.2f} ms  sql {result['sql_per_request'] or 0:>6.1f}",
+              file=sys.stderr)
+        return result
+
+
+def created_ids(app, model, column, prefix):
+    from extensions import db
+
+    with app.app_context():
+        return [row.id for row in db.session.query(model.id).filter(column.like(f'{prefix}%')).order_by(model.id)]
+
+
+def drive_routes(app, scale, args):
+    from common import login
+    from extensions import db
+    from models import Project, ProjectImage, BlogPost, Experience, Tool, SiteSettings
+
+    runner = RouteRunner(app, args.repeat, args.time_budget)
+    client = app.test_client()
+    get = client.get
+
+    last_project_page = max(1, -(-scale // app.config['PROJECTS_PER_PAGE']))
+    last_post_page = max(1, -(-scale // app.config['POSTS_PER_PAGE']))
+
+    # Public pages
+    for name, endpoint, path in [
+        ('GET /', 'index', '/'),
+        ('GET /projects', 'projects', '/projects'),
+        ('GET /projects?page=last', 'projects', f'/projects?page={last_project_page}'),
+        ('GET /project/<id>', 'project_detail', '/project/1'),
+        ('GET /blog', 'blog', '/blog'),
+        ('GET /blog?page=last', 'blog', f'/blog?page={last_post_page}'),
+        ('GET /blog/<slug>', 'blog_post', '/blog/post-0'),
+        ('GET /search', 'search', '/search?q=python'),
+        ('GET /static/<file>', 'static', '/static/css/style.css'),
+        ('GET /admin/login', 'admin_login', '/admin/login'),
+        ('GET /api/v1/projects', 'api.projects', '/api/v1/projects'),
+        ('GET /api/v1/projects/<id>', 'api.project', '/api/v1/projects/1'),
+        ('GET /api/v1/posts', 'api.posts', '/api/v1/posts'),
+        ('GET /api/v1/posts/<slug>', 'api.post', '/api/v1/posts/post-0'),
+        ('GET /api/v1/profile', 'api.profile', '/api/v1/profile'),
+        ('GET /sitemap.xml', 'sitemap', '/sitemap.xml'),
+        ('GET /feed.xml', 'atom_feed', '/feed.xml'),
+        ('GET /rss.xml', 'rss_feed', '/rss.xml'),
+    ]:
+        runner.measure(name, endpoint, lambda i, path=path: get(path))
+
+    # Admin pages
+    login(client, app)
+    for name, endpoint, path in [
+        ('GET /admin/dashboard', 'admin_dashboard', '/admin/dashboard'),
+        ('GET /admin/settings', 'admin_settings', '/admin/settings'),
+        ('GET /admin/projects', 'admin_projects', '/admin/projects'),
+        ('GET /admin/project/new', 'admin_project_form', '/admin/project/new'),
+        ('GET /admin/project/<id>/edit', 'admin_project_form', '/admin/project/1/edit'),
+        ('GET /admin/experiences', 'admin_experiences', '/admin/experiences'),
+        ('GET /admin/experience/new', 'admin_experience_form', '/admin/experience/new'),
+        ('GET /admin/experience/<id>/edit', 'admin_experience_form', '/admin/experience/1/edit'),
+        ('GET /admin/tools', 'admin_tools', '/admin/tools'),
+        ('GET /admin/tool/new', 'admin_tool_form', '/admin/tool/new'),
+        ('GET /admin/tool/<id>/edit', 'admin_tool_form', '/admin/tool/1/edit'),
+        ('GET /admin/posts', 'admin_posts', '/admin/posts'),
+        ('GET /admin/post/new', 'admin_post_form', '/admin/post/new'),
+        ('GET /admin/post/<id>/edit', 'admin_post_form', '/admin/post/1/edit'),
+    ]:
+        runner.measure(name, endpoint, lambda i, path=path: get(path))
+
+    # Admin writes: create rows, edit them, then delete them again so the
+    # data set is back to its seeded state for the load test
+    with app.app_context():
+        settings = SiteSettings.get_settings()
+        settings_form = {'site_title': settings.site_title, 'owner_name': settings.owner_name,
+                         'hero_text': settings.hero_text, 'bio': settings.bio,
+                         'contact_email': settings.contact_email or ''}
+    runner.measure('POST /admin/settings', 'admin_settings',
+                   lambda i: client.post('/admin/settings', data=settings_form))
+
+    forms = [
+        ('tool', 'admin_tool', Tool, Tool.name,
+         lambda i: {'name': f'Bench tool {i}', 'category': 'Language', 'proficiency': 'Expert', 'order': '0'}),
+        ('experience', 'admin_experience', Experience, Experience.title,
+         lambda i: {'title': f'Bench experience {i}', 'company': 'Bench', 'role': 'Engineer',
+                    'description': 'Benchmarking.', 'start_date': '2020-01-01', 'order': '0'}),
+        ('post', 'admin_post', BlogPost, BlogPost.title,
+         lambda i: {'title': f'Bench post {i}', 'content': '<p>Benchmark post body.</p>' * 20,
+                    'published': 'on', 'project_id': '1'}),
+        ('project', 'admin_project', Project, Project.title,
+         lambda i: {'title': f'Bench project {i}', 'description': '<p>Benchmark project.</p>' * 10,
+                    'category': 'Web App', 'start_date': '2020-01-01'}),
+    ]
+    for kind, prefix, model, column, make_form in forms:
+        new_label = make_form(0)[column.key].rsplit(' ', 1)[0]
+        runner.measure(f'POST /admin/{kind}/new', f'{prefix}_form',
+                       lambda i, kind=kind, make_form=make_form: client.post(f'/admin/{kind}/new', data=make_form(i)))
+        ids = created_ids(app, model, column, new_label)
+        runner.measure(f'POST /admin/{kind}/<id>/edit', f'{prefix}_form',
+                       lambda i, kind=kind, make_form=make_form, ids=ids:
+                       client.post(f'/admin/{kind}/{ids[i % len(ids)]}/edit', data=make_form(i % len(ids))))
+
+        if kind == 'project':
+            with app.app_context():
+                db.session.add_all([
+                    ProjectImage(project_id=ids[0], image_path=f'/static/uploads/bench_{n}.png', order=n)
+                    for n in range(args.repeat)
+                ])
+                db.session.commit()
+                image_ids = [row.id for row in db.session.query(ProjectImage.id).filter_by(project_id=ids[0])]
+            runner.measure('POST /admin/project/<id>/image/<id>/delete', 'admin_image_delete',
+                           lambda i: client.post(f'/admin/project/{ids[0]}/image/{image_ids[i]}/delete'),
+                           repeat=len(image_ids), warmup=False)
+
+        runner.measure(f'POST /admin/{kind}/<id>/delete', f'{prefix}_delete',
+                       lambda i, kind=kind, ids=ids: client.post(f'/admin/{kind}/{ids[i]}/delete'),
+                       repeat=len(ids), warmup=False)
+        leftover = created_ids(app, model, column, new_label)
+        for row_id in leftover:
+            client.post(f'/admin/{kind}/{row_id}/delete')
+
+    # Bulk export (the whole data set, streamed) and import; imported rows
+    # are deleted again afterwards
+    def export(i):
+        response = get('/admin/export')
+        response.get_data()  # consume the stream
+        return response
+
+    def import_file(i):
+        lines = [{'type': 'tool', 'name': f'Bench import {i}-{n}', 'category': 'Language'}
+                 for n in range(IMPORT_RECORDS)]
+        lines += [{'type': 'post', 'title': f'Bench import {i}-{n}', 'content': '<p>Imported post.</p>' * 20,
+                   'published': True} for n in range(IMPORT_RECORDS)]
+        body = '\n'.join(json.dumps(line) for line in lines).encode('utf-8')
+        return {'file': (io.BytesIO(body), 'import.ndjson')}
+
+    runner.measure('GET /admin/export', 'admin_export', export)
+    runner.measure('POST /admin/import', 'admin_import',
+                   lambda form: client.post('/admin/import', data=form, content_type='multipart/form-data'),
+                   setup=import_file)
+    for kind, model, column in [('tool', Tool, Tool.name), ('post', BlogPost, BlogPost.title)]:
+        for row_id in created_ids(app, model, column, 'Bench import'):
+            client.post(f'/admin/{kind}/{row_id}/delete')
+
+    # Authentication, each request on a fresh client
+    credentials = {'username': os.getenv('ADMIN_USERNAME', 'admin'),
+                   'password': os.getenv('ADMIN_PASSWORD', 'admin123')}
+    runner.measure('POST /admin/login', 'admin_login',
+                   lambda c: c.post('/admin/login', data=credentials),
+                   setup=lambda i: app.test_client())
+
+    def logged_in_client(i):
+        fresh = app.test_client()
+        login(fresh, app)
+        return fresh
+
+    runner.measure('GET /admin/logout', 'admin_logout', lambda c: c.get('/admin/logout'), setup=logged_in_client)
+
+    measured = {result['endpoint'] for result in runner.results.values()}
+    unmeasured = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - measured)
+    return runner.results, unmeasured
+
+
+def load_phase(args):
+    from common import summarize
+    from loadgen import free_port, start_server, stop_server, run_load, process_tree_rss
+
+    port = free_port()
+    workers = args.workers or os.cpu_count() or 1
+    server = start_server(port, workers, args.threads)
+    try:
+        run_load(port, LOAD_PATHS, args.connections, 1, args.client_processes)  # warm up
+        latencies, errors = run_load(port, LOAD_PATHS, args.connections, args.duration, args.client_processes)
+        memory = process_tree_rss(server.pid)
+    finally:
+        stop_server(server)
+
+    result = summarize(latencies)
+    result.update({
+        'paths': LOAD_PATHS,
+        'workers': workers,
+        'threads': args.threads,
+        'connections': args.connections,
+        'duration_s': args.duration,
+        'requests': len(latencies),
+        'rps': round(len(latencies) / args.duration, 1),
+        'errors': errors,
+        'server_rss_mb': round(memory[0], 1) if memory else None,
+        'server_peak_rss_mb': round(memory[1], 1) if memory else None,
+    })
+    return result
+
+
+def seed_phase(scale):
+    from common import make_app, bulk_seed
+
+    start = time.perf_counter()
+    bulk_seed(make_app('production'), scale, profile_rows=min(scale, PROFILE_ROWS))
+    return {'seed_seconds': round(time.perf_counter() - start, 2)}
+
+
+def measure_phase(scale, args):
+    from common import make_app
+
+    # Production settings, but the test client talks plain HTTP
+    app = make_app('production', SESSION_COOKIE_SECURE=False)
+    routes, unmeasured = drive_routes(app, scale, args)
+    result = {'routes': routes, 'unmeasured_endpoints': unmeasured, 'test_client_peak_rss_mb': peak_rss_mb()}
+    if not args.skip_load:
+        print('  load test ...', file=sys.stderr)
+        result['load'] = load_phase(args)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Orchestration
+# ---------------------------------------------------------------------------
+
+def child_args(args):
+    argv = ['--repeat', str(args.repeat), '--time-budget', str(args.time_budget),
+            '--duration', str(args.duration), '--connections', str(args.connections),
+            '--threads', str(args.threads), '--workers', str(args.workers),
+            '--client-processes', str(args.client_processes), '--cache', args.cache]
+    return argv + (['--skip-load'] if args.skip_load else [])
+
+
+def run_phase(phase, scale, args, env, workdir):
+    result_path = os.path.join(workdir, f'{phase}.json')
+    command = [sys.executable, os.path.abspath(__file__), '--phase', phase, '--scale', str(scale),
+               '--result', result_path] + child_args(args)
+    subprocess.run(command, env=env, check=True)
+    with open(result_path) as f:
+        return json.load(f)
+
+
+def run_scale(scale, args):
+    workdir = tempfile.mkdtemp(prefix=f'portfolio-bench-{scale}-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+        RESPONSE_CACHE_TYPE=args.cache,
+        RESPONSE_CACHE_DIR=os.path.join(workdir, 'cache'),
+        SETTINGS_STAMP_FILE=os.path.join(workdir, 'settings.stamp'),
+        CURSOR_PAGINATION='False',
+    )
+    try:
+        result = {'rows': {'projects': scale, 'project_images': scale * 2, 'posts': scale,
+                           'experiences': min(scale, PROFILE_ROWS), 'tools': min(scale, PROFILE_ROWS)}}
+        result.update(run_phase('seed', scale, args, env, workdir))
+        result.update(run_phase('measure', scale, args, env, workdir))
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_summary(results):
+    for scale, result in results['scales'].items():
+        print(f"\nscale {scale} (seeded in {result['seed_seconds']}s, "
+              f"test client peak RSS {result['test_client_peak_rss_mb']} MB)")
+        print(f'{"route":<48} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>8} {"sql":>6}')
+        for name, route in result['routes'].items():
+            print(f"{name:<48} {route['p50_ms']:>9.2f} {route['p95_ms']:>9.2f} {route['p99_ms']:>9.2f} "
+                  f"{route['rps']:>8.1f} {route['sql_per_request']:>6.1f}")
+        if result['unmeasured_endpoints']:
+            print(f"not measured: {', '.join(result['unmeasured_endpoints'])}")
+        load = result.get('load')
+        if load:
+            print(f"load: {load['rps']} req/s, p50 {load['p50_ms']} ms, p99 {load['p99_ms']} ms, "
+                  f"{load['errors']} errors, {load['workers']}x{load['threads']} server, "
+                  f"server RSS {load['server_rss_mb']} MB (peak {load['server_peak_rss_mb']} MB)")
+
+
+def change(old, new):
+    if old is None or new is None:
+        return '-'
+    if not old:
+        return f'{new:g}'
+    return f'{(new - old) / old * 100:+.0f}%'
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}")
+    for scale, new_result in new['scales'].items():
+        old_result = old['scales'].get(scale)
+        if old_result is None:
+            continue
+        print(f'\nscale {scale}')
+        print(f'{"route":<48} {"p50 ms":>19} {"change":>7} {"sql":>13}')
+        for name, route in new_result['routes'].items():
+            before = old_result['routes'].get(name)
+            if before is None:
+                continue
+            print(f"{name:<48} {before['p50_ms']:>8.2f} -> {route['p50_ms']:>7.2f} "
+                  f"{change(before['p50_ms'], route['p50_ms']):>7} "
+                  f"{before['sql_per_request']:>5.1f} -> {route['sql_per_request']:<5.1f}")
+        if old_result.get('load') and new_result.get('load'):
+            print(f"{'load req/s':<48} {old_result['load']['rps']:>8.1f} -> {new_result['load']['rps']:>7.1f} "
+                  f"{change(old_result['load']['rps'], new_result['load']['rps']):>7}")
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default=','.join(map(str, SCALES)),
+                        help='Comma-separated row counts for projects and posts.')
+    parser.add_argument('--repeat', type=int, default=50, help='Requests per route (test client).')
+    parser.add_argument('--time-budget', type=float, default=5, help='Seconds per route before stopping early.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per scale.')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=0, help='Server workers (0: one per CPU).')
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--client-processes', type=int, default=max(1, cpus // 2))
+    parser.add_argument('--cache', default='null', help='RESPONSE_CACHE_TYPE (default: off, to measure rendering).')
+    parser.add_argument('--skip-load', action='store_true', help='Only run the test client phase.')
+    parser.add_argument('--output', '-o', help='Result file (default: benchmarks/results/<time>-<commit>.json).')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='Compare two result files and exit.')
+    parser.add_argument('--phase', choices=['seed', 'measure'], help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.phase:
+        import common  # noqa: F401  (puts the project root on sys.path)
+        result = seed_phase(args.scale) if args.phase == 'seed' else measure_phase(args.scale, args)
+        with open(args.result, 'w') as f:
+            json.dump(result, f)
+        return
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': cpus,
+            'cache': args.cache,
+        },
+        'scales': {},
+    }
+    for scale in [int(n) for n in args.scales.split(',')]:
+        print(f'scale {scale}', file=sys.stderr)
+        results['scales'][str(scale)] = run_scale(scale, args)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{results['meta']['commit'] or 'unknown'}.json")
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print_summary(results)
+    print(f'\nResults written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,384 @@
+"""Bulk import and export of portfolio content.
+
+Content is exchanged as NDJSON, one record per line (a JSON array of the
+same records is accepted on import)::
+
+    {"type": "project", "ref": "p1", "title": "...", "description": "...",
+     "images": ["/static/uploads/<hash>.png", {"path": "shots/a.jpg", "alt_text": "..."}]}
+    {"type": "post", "title": "...", "content": "...", "project": "p1"}
+    {"type": "experience", "title": "...", "company": "...", "certificate": "certs/x.png"}
+    {"type": "tool", "name": "...", "category": "..."}
+
+A post's ``project`` is the ``ref`` of a project in the same file or the
+id of an existing one. Image paths are looked up in the accompanying zip
+archive first, then as already-stored uploads, then (CLI only) as files
+relative to the import file. An archive is a zip holding ``content.ndjson``
+(or ``content.json``) and the image files.
+
+``import_content()`` inserts everything in one transaction, flushing the
+ORM in batches of ``IMPORT_BATCH_SIZE`` so rows go out as multi-row
+INSERTs, and de-duplicates post slugs with ``BlogPost.unique_slugs()``.
+Any invalid record rolls the whole import back. ``export_records()``
+streams the same format back out, so an export can be imported elsewhere.
+"""
+import io
+import json
+import os
+import zipfile
+import zlib
+from datetime import date, datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import selectinload
+from werkzeug.datastructures import FileStorage
+
+from extensions import db, job_queue, response_cache
+from models import Project, ProjectImage, BlogPost, Experience, Tool
+from uploads import UPLOAD_URL_PREFIX, store_upload, release_upload, upload_url_to_path
+import search
+
+ARCHIVE_CONTENT_NAMES = ('content.ndjson', 'content.json')
+EXPORT_CHUNK = 500
+# Raised while reading a truncated or corrupted zip archive (OSError and
+# ValueError: offsets pointing outside the file)
+ARCHIVE_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, OSError, ValueError)
+
+# type -> (model, plain fields, date fields, datetime fields)
+RECORD_TYPES = {
+    'project': (Project, ('title', 'category', 'live_link', 'repo_link'),
+                ('start_date', 'end_date'), ('created_at',)),
+    'post': (BlogPost, ('title', 'published'), (), ('created_at',)),
+    'experience': (Experience, ('title', 'company', 'location', 'role', 'ongoing', 'description', 'order'),
+                   ('start_date', 'end_date'), ('created_at',)),
+    'tool': (Tool, ('name', 'category', 'details', 'proficiency', 'order'), (), ('created_at',)),
+}
+REQUIRED = {'project': 'title', 'post': 'title', 'experience': 'title', 'tool': 'name'}
+
+
+class BulkImportError(ValueError):
+    """An import record is invalid; nothing was imported"""
+
+    def __init__(self, message, record=None):
+        if record is not None:
+            message = f'record {record}: {message}'
+        super().__init__(message)
+
+
+# ===================== IMPORT =====================
+
+def read_records(stream):
+    """Parse NDJSON or a JSON array from a binary stream"""
+    try:
+        data = stream.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise BulkImportError('file is not UTF-8 encoded')
+    if data.lstrip().startswith('['):
+        try:
+            records = json.loads(data)
+        except ValueError as e:
+            raise BulkImportError(f'invalid JSON: {e}')
+        return list(records)
+    records = []
+    for number, line in enumerate(data.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except ValueError as e:
+            raise BulkImportError(f'line {number}: invalid JSON: {e}')
+    return records
+
+
+def open_import(path):
+    """Return (records, archive or None, base directory) for a file on disk"""
+    if zipfile.is_zipfile(path):
+        archive = _open_archive(path)
+        return _archive_records(archive), archive, None
+    with open(path, 'rb') as f:
+        return read_records(f), None, os.path.dirname(os.path.abspath(path))
+
+
+def open_upload(file):
+    """Return (records, archive or None) for an uploaded FileStorage"""
+    data = file.read()
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        archive = _open_archive(io.BytesIO(data))
+        return _archive_records(archive), archive
+    return read_records(io.BytesIO(data)), None
+
+
+def _open_archive(file):
+    try:
+        return zipfile.ZipFile(file)
+    except ARCHIVE_ERRORS as e:
+        raise BulkImportError(f'damaged zip archive: {e}')
+
+
+def _archive_records(archive):
+    for name in ARCHIVE_CONTENT_NAMES:
+        if name in archive.namelist():
+            try:
+                with archive.open(name) as f:
+                    return read_records(f)
+            except ARCHIVE_ERRORS as e:
+                raise BulkImportError(f'could not read {name} from the archive: {e}')
+    raise BulkImportError(f'archive contains none of {", ".join(ARCHIVE_CONTENT_NAMES)}')
+
+
+_TYPE_NAMES = {str: 'a string', bool: 'true or false', int: 'an integer'}
+
+
+def _check(value, expected, field, number):
+    """Reject `value` unless it is None or of type `expected`"""
+    # bool is an int subclass, but true/false is not a valid number
+    if value is None or (isinstance(value, expected) and not (expected is int and isinstance(value, bool))):
+        return value
+    raise BulkImportError(f'{field} must be {_TYPE_NAMES[expected]}, got {value!r}', number)
+
+
+def _flush(number):
+    """Flush pending rows, reporting database errors against record `number`"""
+    try:
+        db.session.flush()
+    except SQLAlchemyError as e:
+        raise BulkImportError(f'rejected by the database (batch ending here): {getattr(e, "orig", None) or e}',
+                              number)
+
+
+def _parse(value, parser, field, number):
+    if value in (None, ''):
+        return None
+    try:
+        return parser(value)
+    except (TypeError, ValueError):
+        raise BulkImportError(f'{field} must be an ISO date, got {value!r}', number)
+
+
+class _Importer:
+    def __init__(self, app, archive, base_dir):
+        self.app = app
+        self.archive = archive
+        self.base_dir = base_dir
+        self.members = set(archive.namelist()) if archive else set()
+        self.stored = []  # upload URLs written by this import
+
+    def build(self, number, record):
+        if not isinstance(record, dict):
+            raise BulkImportError('expected an object', number)
+        kind = record.get('type')
+        if kind not in RECORD_TYPES:
+            raise BulkImportError(f'unknown type {kind!r}', number)
+        if not record.get(REQUIRED[kind]):
+            raise BulkImportError(f'{REQUIRED[kind]} is required', number)
+
+        model, fields, date_fields, datetime_fields = RECORD_TYPES[kind]
+        row = model()
+        for field in fields:
+            if field in record:
+                expected = model.__table__.c[field].type.python_type
+                setattr(row, field, _check(record[field], expected, field, number))
+        for field in date_fields:
+            setattr(row, field, _parse(record.get(field), date.fromisoformat, field, number))
+        for field in datetime_fields:
+            if record.get(field):
+                setattr(row, field, _parse(record[field], datetime.fromisoformat, field, number))
+
+        if kind == 'project':
+            row.set_description(_check(record.get('description'), str, 'description', number))
+            images = record.get('images') or []
+            if not isinstance(images, list):
+                raise BulkImportError('images must be a list', number)
+            for order, image in enumerate(images):
+                if isinstance(image, str):
+                    image = {'path': image}
+                if not isinstance(image, dict):
+                    raise BulkImportError(f'images entries must be paths or objects, got {image!r}', number)
+                row.images.append(ProjectImage(
+                    image_path=self.resolve(image.get('path'), number),
+                    alt_text=_check(image.get('alt_text'), str, 'alt_text', number),
+                    order=_check(image.get('order', order), int, 'order', number),
+                ))
+        elif kind == 'post':
+            _check(record.get('slug'), str, 'slug', number)
+            row.set_content(_check(record.get('content'), str, 'content', number))
+        elif kind == 'experience' and record.get('certificate'):
+            row.certificate_image_path = self.resolve(record['certificate'], number)
+        return kind, row
+
+    def resolve(self, path, number):
+        """Upload URL for an image path, storing it when it is new"""
+        if not path or not isinstance(path, str):
+            raise BulkImportError('image path is missing', number)
+        allowed = self.app.config['ALLOWED_EXTENSIONS']
+        if path.rsplit('.', 1)[-1].lower() not in allowed:
+            raise BulkImportError(f'{path}: not an allowed image type', number)
+
+        member = path.lstrip('/')
+        if member in self.members:
+            try:
+                with self.archive.open(member) as stream:
+                    url = store_upload(FileStorage(stream=stream, filename=member), self.app.config['UPLOAD_FOLDER'])
+            except ARCHIVE_ERRORS as e:
+                raise BulkImportError(f'could not read {path} from the archive: {e}', number)
+            self.stored.append(url)
+            return url
+        if path.startswith(f'{UPLOAD_URL_PREFIX}/') and '..' not in path \
+                and os.path.isfile(upload_url_to_path(self.app, path)):
+            return path
+        if self.base_dir:
+            filepath = os.path.join(self.base_dir, path)
+            if os.path.isfile(filepath):
+                with open(filepath, 'rb') as stream:
+                    url = store_upload(FileStorage(stream=stream, filename=filepath), self.app.config['UPLOAD_FOLDER'])
+                self.stored.append(url)
+                return url
+        raise BulkImportError(f'image {path} not found', number)
+
+
+def import_content(app, records, archive=None, base_dir=None):
+    """Insert `records` in a single transaction and return counts per type.
+
+    Raises BulkImportError (after rolling back) if any record is invalid.
+    """
+    batch_size = app.config['IMPORT_BATCH_SIZE']
+    importer = _Importer(app, archive, base_dir)
+    created = {kind: [] for kind in RECORD_TYPES}
+    refs = {}
+    post_records = []  # (post, record, record number)
+
+    number = 0
+    try:
+        for number, record in enumerate(records, 1):
+            kind, row = importer.build(number, record)
+            created[kind].append(row)
+            if kind == 'post':
+                # Added once slugs and projects are known
+                post_records.append((row, record, number))
+                continue
+            if kind == 'project' and record.get('ref') is not None:
+                ref = str(record['ref'])
+                if ref in refs:
+                    raise BulkImportError(f'duplicate ref {ref!r}', number)
+                refs[ref] = row
+            db.session.add(row)
+            if len(db.session.new) >= batch_size:
+                _flush(number)
+        _flush(number)
+
+        slugs = BlogPost.unique_slugs([record.get('slug') or BlogPost.slugify(post.title)
+                                       for post, record, _ in post_records])
+        existing_ids = _existing_project_ids([record.get('project') for _, record, _ in post_records])
+        for (post, record, number), slug in zip(post_records, slugs):
+            ref = record.get('project')
+            post.slug = slug
+            if ref is None:
+                pass
+            elif str(ref) in refs:
+                post.project_id = refs[str(ref)].id
+            elif ref in existing_ids:
+                post.project_id = ref
+            else:
+                raise BulkImportError(f'project {ref!r} not found', number)
+            db.session.add(post)
+            if len(db.session.new) >= batch_size:
+                _flush(number)
+        _flush(number)
+
+        search.index_new(created['project'], created['post'])
+        image_ids = [image.id for project in created['project'] for image in project.images]
+        if image_ids:
+            job_queue.enqueue('images.derivatives', image_ids=image_ids)
+        elif importer.stored:
+            job_queue.enqueue('stats.storage')
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        for url in importer.stored:
+            release_upload(app, url)
+        raise
+
+    response_cache.purge('project', 'post', 'experience', 'tool')
+    return {kind: len(rows) for kind, rows in created.items()}
+
+
+def _existing_project_ids(refs):
+    ids = {ref for ref in refs if isinstance(ref, int) and not isinstance(ref, bool)}
+    if not ids:
+        return set()
+    return {project_id for (project_id,) in db.session.query(Project.id).filter(Project.id.in_(ids))}
+
+
+# ===================== EXPORT =====================
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _record(kind, row):
+    model, fields, date_fields, datetime_fields = RECORD_TYPES[kind]
+    record = {'type': kind}
+    for field in fields:
+        record[field] = getattr(row, field)
+    for field in date_fields + datetime_fields:
+        record[field] = _iso(getattr(row, field))
+    return record
+
+
+def _stream(statement):
+    """Rows of `statement`, fetched EXPORT_CHUNK at a time"""
+    return db.session.execute(statement.execution_options(yield_per=EXPORT_CHUNK)).scalars()
+
+
+def export_records():
+    """Yield every project, post, experience and tool as an import record"""
+    projects = select(Project).options(selectinload(Project.images)).order_by(Project.id)
+    for project in _stream(projects):
+        record = _record('project', project)
+        record['ref'] = project.id
+        record['description'] = project.description
+        record['images'] = [{'path': image.image_path, 'alt_text': image.alt_text, 'order': image.order}
+                            for image in sorted(project.images, key=lambda image: image.order or 0)]
+        yield record
+
+    for post in _stream(select(BlogPost).order_by(BlogPost.id)):
+        record = _record('post', post)
+        record['slug'] = post.slug
+        record['content'] = post.content
+        record['project'] = post.project_id
+        yield record
+
+    for experience in _stream(select(Experience).order_by(Experience.id)):
+        record = _record('experience', experience)
+        record['certificate'] = experience.certificate_image_path
+        yield record
+
+    for tool in _stream(select(Tool).order_by(Tool.id)):
+        yield _record('tool', tool)
+
+
+def export_ndjson():
+    """Yield the export as NDJSON lines (for streaming responses)"""
+    for record in export_records():
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+def export_archive(app, path):
+    """Write a zip with content.ndjson and every referenced upload; returns the record count"""
+    count = 0
+    files = set()
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        with archive.open(ARCHIVE_CONTENT_NAMES[0], 'w') as out:
+            for record in export_records():
+                out.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+                count += 1
+                paths = [image['path'] for image in record.get('images', [])]
+                if record.get('certificate'):
+                    paths.append(record['certificate'])
+                files.update(p for p in paths if p.startswith(f'{UPLOAD_URL_PREFIX}/'))
+        for url in sorted(files):
+            filepath = upload_url_to_path(app, url)
+            if os.path.isfile(filepath):
+                # Images are already compressed
+                archive.write(filepath, url.lstrip('/'), compress_type=zipfile.ZIP_STORED)
+    return count
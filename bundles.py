@@ -0,0 +1,584 @@
+"""Self-hosted, bundled and minified front-end assets.
+
+``flask build-assets`` replaces the CDN stylesheets and scripts with one
+CSS and one JS file per layout bundle (``BUNDLES``) under ``static/dist``:
+
+1. Bootstrap and the Google Fonts stylesheet are downloaded into
+   ``assets/vendor``, which is not part of the repository: the first build
+   on a machine needs network access, so run it as a deploy step.
+   ``--offline`` rebuilds from files already downloaded there. Of the
+   fonts only the ``FONT_SUBSETS`` unicode ranges are kept.
+2. Bootstrap rules whose classes or ``data-`` attributes appear in none of
+   the bundle's templates and scripts are dropped, along with the custom
+   properties and keyframes nothing left refers to. The rest is
+   concatenated with our own stylesheets and minified.
+3. For bundles with ``critical`` pages, the rules used by the first
+   ``CRITICAL_HTML_BYTES`` of those rendered pages are written separately.
+   They are inlined into ``<head>`` and the full stylesheet is loaded
+   without blocking rendering.
+
+Templates call ``asset_styles(name)`` and ``asset_scripts(name)``, which
+emit the tags for the built bundle, or the original CDN tags when nothing
+has been built or ``ASSET_BUNDLES`` is off.
+"""
+import fnmatch
+import json
+import os
+import re
+import shutil
+import urllib.request
+from urllib.parse import urlsplit
+
+from flask import current_app, url_for
+from markupsafe import Markup, escape
+
+from static_assets import file_hash
+
+BOOTSTRAP_VERSION = '5.3.0'
+VENDOR_FILES = {
+    'bootstrap.min.css': f'https://cdn.jsdelivr.net/npm/bootstrap@{BOOTSTRAP_VERSION}/dist/css/bootstrap.min.css',
+    'bootstrap.bundle.min.js': f'https://cdn.jsdelivr.net/npm/bootstrap@{BOOTSTRAP_VERSION}/dist/js/bootstrap.bundle.min.js',
+}
+FONTS_URL = ('https://fonts.googleapis.com/css2?family=Sora:wght@400;500;600;700'
+             '&family=Space+Mono:wght@400;700&display=swap')
+FONT_SUBSETS = ('latin',)
+PRELOAD_FONTS = ('Sora',)
+# Google Fonts only serves woff2 with unicode-range subsets to browsers it recognises
+FONTS_USER_AGENT = ('Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                    '(KHTML, like Gecko) Chrome/120.0 Safari/537.36')
+
+VENDOR_DIR = os.path.join('assets', 'vendor')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Sources are files in the static folder or 'vendor:<name>'; templates are
+# glob patterns (relative to the templates folder) scanned for used classes
+BUNDLES = {
+    'public': {
+        'css': ('vendor:bootstrap.min.css', 'vendor:fonts.css', 'css/style.css'),
+        'js': ('vendor:bootstrap.bundle.min.js', 'js/main.js'),
+        'templates': ('*.html',),
+        'exclude': ('admin/*',),
+        'critical': ('/', '/projects', '/blog'),
+    },
+    'admin': {
+        'css': ('vendor:bootstrap.min.css', 'vendor:fonts.css', 'css/style.css'),
+        'js': ('vendor:bootstrap.bundle.min.js', 'js/main.js'),
+        'templates': ('base.html', 'macros.html', 'admin/*.html'),
+        'exclude': ('admin/login.html',),
+        'critical': (),
+    },
+    'login': {
+        'css': ('vendor:bootstrap.min.css', 'vendor:fonts.css', 'css/admin.css'),
+        'js': ('vendor:bootstrap.bundle.min.js',),
+        'templates': ('admin/login.html',),
+        'exclude': (),
+        'critical': (),
+    },
+}
+
+# Classes Bootstrap's JavaScript adds at runtime for the components we use
+BOOTSTRAP_JS_CLASSES = {
+    'show', 'showing', 'hiding', 'fade', 'collapse', 'collapsing', 'collapsed', 'collapse-horizontal',
+    'active', 'disabled', 'carousel-item-next', 'carousel-item-prev', 'carousel-item-start',
+    'carousel-item-end', 'pointer-event', 'tooltip', 'tooltip-inner', 'tooltip-arrow', 'bs-tooltip-auto',
+    'bs-tooltip-top', 'bs-tooltip-end', 'bs-tooltip-bottom', 'bs-tooltip-start', 'modal-open',
+    'modal-backdrop', 'modal-static', 'dropdown-menu-end', 'was-validated',
+}
+# Roughly what arrives in the first round trips; rules used there are critical
+CRITICAL_HTML_BYTES = 14 * 1024
+
+
+class AssetBuildError(RuntimeError):
+    """Vendoring or bundling failed; the previous build is left in place"""
+
+
+# ===================== CSS =====================
+
+_TOKEN_RE = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[{}();]')
+_COMMENT_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_STRING_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_NESTING_AT_RULES = ('@media', '@supports', '@layer', '@container')
+
+
+def parse_css(css):
+    """Split a stylesheet into ``(prelude, body)`` items.
+
+    `body` is a list of items for @media and other nesting at-rules, the
+    declaration text for rules, @font-face and @keyframes, and None for
+    statements such as @import. @charset is dropped.
+    """
+    css = _COMMENT_RE.sub(lambda m: m.group(1) or '', css)
+    # Bundles are UTF-8 and @charset is only valid at the very start
+    return [item for item in _parse_block(css, 0)[0] if not item[0].startswith('@charset')]
+
+
+def _parse_block(css, pos):
+    items = []
+    start = pos
+    paren = 0
+    while True:
+        m = _TOKEN_RE.search(css, pos)
+        if m is None:
+            return items, len(css)
+        token, pos = m.group(), m.end()
+        if len(token) > 1:
+            continue  # string
+        if token == '(':
+            paren += 1
+        elif token == ')':
+            paren = max(0, paren - 1)
+        elif paren:
+            continue
+        elif token == ';':
+            prelude = css[start:m.start()].strip()
+            if prelude:
+                items.append((prelude, None))
+            start = pos
+        elif token == '{':
+            prelude = css[start:m.start()].strip()
+            if prelude.lower().startswith(_NESTING_AT_RULES):
+                children, pos = _parse_block(css, pos)
+                items.append((prelude, children))
+            else:
+                end = _block_end(css, pos)
+                items.append((prelude, css[pos:end].strip()))
+                pos = end + 1
+            start = pos
+        elif token == '}':
+            return items, pos
+
+
+def _block_end(css, pos):
+    """Index of the '}' closing the block that starts at `pos`"""
+    depth = 1
+    for m in _TOKEN_RE.finditer(css, pos):
+        token = m.group()
+        if token == '{':
+            depth += 1
+        elif token == '}':
+            depth -= 1
+            if depth == 0:
+                return m.start()
+    return len(css)
+
+
+def _split_top_level(text, separator):
+    """Split on `separator` outside strings and parentheses"""
+    parts, start, paren = [], 0, 0
+    for m in re.finditer(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[()' + re.escape(separator) + ']', text):
+        token = m.group()
+        if token == '(':
+            paren += 1
+        elif token == ')':
+            paren = max(0, paren - 1)
+        elif token == separator and not paren:
+            parts.append(text[start:m.start()])
+            start = m.end()
+    parts.append(text[start:])
+    return [part.strip() for part in parts if part.strip()]
+
+
+def minify(text):
+    """Collapse whitespace around CSS punctuation (strings are left alone)"""
+    out = []
+    for i, part in enumerate(_STRING_RE.split(text)):
+        if i % 2:
+            out.append(part)
+            continue
+        part = re.sub(r'\s+', ' ', part)
+        part = re.sub(r'\s*([{};,>])\s*', r'\1', part)
+        out.append(re.sub(r':\s+', ':', part))
+    return ''.join(out).strip()
+
+
+def serialize(items):
+    parts = []
+    for prelude, body in items:
+        if body is None:
+            parts.append(minify(prelude) + ';')
+        elif isinstance(body, list):
+            inner = serialize(body)
+            if inner:
+                parts.append(f'{minify(prelude)}{{{inner}}}')
+        else:
+            body = minify(body).rstrip(';')
+            if body:
+                parts.append(f'{minify(prelude)}{{{body}}}')
+    return ''.join(parts)
+
+
+# ===================== TREE SHAKING =====================
+
+_WORD_RE = re.compile(r'-{0,2}[A-Za-z_][\w-]*')
+_CLASS_RE = re.compile(r'\.((?:[\w-]|\\.)+)')
+_DATA_ATTRIBUTE_RE = re.compile(r'\[\s*(data-[\w-]+)')
+_NOT_RE = re.compile(r':not\([^()]*\)')
+_VAR_RE = re.compile(r'var\(\s*(--[\w-]+)')
+_KEYFRAMES_RE = re.compile(r'@(?:-\w+-)?keyframes\s+(\S+)')
+
+
+class Usage:
+    """Words found in templates and scripts; a word ending in '-' (as in
+    ``alert-{{ category }}``) keeps every class with that prefix"""
+
+    def __init__(self, texts, extra=()):
+        self.words = set(extra)
+        for text in texts:
+            self.words.update(_WORD_RE.findall(text))
+        self.prefixes = tuple(w for w in self.words if w.endswith('-') and len(w) > 2)
+
+    def has(self, name):
+        return name in self.words or name.startswith(self.prefixes)
+
+    def selector_used(self, selector):
+        selector = _NOT_RE.sub('', selector)
+        classes = [c.replace('\\', '') for c in _CLASS_RE.findall(selector)]
+        attributes = _DATA_ATTRIBUTE_RE.findall(selector)
+        return all(self.has(name) for name in classes + attributes)
+
+
+def purge(items, usage):
+    """Drop rules (and selectors of a list) that match nothing in `usage`"""
+    kept = []
+    for prelude, body in items:
+        if isinstance(body, list):
+            children = purge(body, usage)
+            if children:
+                kept.append((prelude, children))
+        elif body is None or prelude.startswith('@'):
+            kept.append((prelude, body))
+        else:
+            selectors = [s for s in _split_top_level(prelude, ',') if usage.selector_used(s)]
+            if selectors:
+                kept.append((','.join(selectors), body))
+    return kept
+
+
+def _bodies(items):
+    for prelude, body in items:
+        if isinstance(body, list):
+            yield from _bodies(body)
+        elif body is not None and not _KEYFRAMES_RE.match(prelude):
+            yield body
+
+
+def prune_unreferenced(items, context_items, usage):
+    """Remove custom properties and @keyframes of `items` nothing refers to.
+
+    References are looked for in `items`, `context_items` (stylesheets
+    bundled alongside) and the templates/scripts in `usage`.
+    """
+    definitions = {}
+    referenced = {w for w in usage.words if w.startswith('--')}
+    for body in _bodies(items + context_items):
+        for declaration in _split_top_level(body, ';'):
+            name, _, value = declaration.partition(':')
+            name = name.strip()
+            if name.startswith('--'):
+                definitions.setdefault(name, []).append(value)
+            else:
+                referenced.update(_VAR_RE.findall(value))
+    # Custom properties may be defined in terms of others
+    pending = list(referenced)
+    while pending:
+        for value in definitions.get(pending.pop(), ()):
+            for name in _VAR_RE.findall(value):
+                if name not in referenced:
+                    referenced.add(name)
+                    pending.append(name)
+
+    text = ' '.join(_bodies(items + context_items))
+    return _prune(items, referenced, text)
+
+
+def _prune(items, referenced, text):
+    kept = []
+    for prelude, body in items:
+        if isinstance(body, list):
+            children = _prune(body, referenced, text)
+            if children:
+                kept.append((prelude, children))
+        elif body is None:
+            kept.append((prelude, body))
+        elif _KEYFRAMES_RE.match(prelude):
+            name = _KEYFRAMES_RE.match(prelude).group(1)
+            if re.search(r'(?<![\w-])' + re.escape(name) + r'(?![\w-])', text):
+                kept.append((prelude, body))
+        else:
+            declarations = [d for d in _split_top_level(body, ';')
+                            if not d.startswith('--') or d.partition(':')[0].strip() in referenced]
+            if declarations:
+                kept.append((prelude, ';'.join(declarations)))
+    return kept
+
+
+# ===================== JAVASCRIPT =====================
+
+_JS_COMMENT_LINE_RE = re.compile(r'^\s*(//[^\n]*|/\*.*?\*/\s*)$', re.M | re.S)
+
+
+def minify_js(source, name):
+    """Conservative minification: drop whole-line comments, indentation and
+    blank lines (line breaks are kept, so semicolon insertion is unaffected).
+    Already minified files only lose their source map comment."""
+    if name.endswith('.min.js'):
+        return re.sub(r'^//# sourceMappingURL=.*$', '', source, flags=re.M).strip()
+    source = _JS_COMMENT_LINE_RE.sub('', source)
+    return '\n'.join(line.strip() for line in source.splitlines() if line.strip())
+
+
+# ===================== VENDORING =====================
+
+def _download(url, headers=None):
+    request = urllib.request.Request(url, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.read()
+    except OSError as e:
+        raise AssetBuildError(f'could not download {url}: {e}')
+
+
+def select_font_faces(css, subsets=FONT_SUBSETS):
+    """The ``/* <subset> */ @font-face {...}`` blocks of a Google Fonts
+    stylesheet whose subset is in `subsets` (all of them if unlabelled)"""
+    labelled = re.findall(r'/\*\s*([\w-]+)\s*\*/\s*(@font-face\s*\{[^}]*\})', css)
+    if not labelled:
+        return re.findall(r'@font-face\s*\{[^}]*\}', css)
+    return [block for subset, block in labelled if subset in subsets]
+
+
+def vendor(app, refresh=False):
+    """Download third-party assets into the vendor folder; returns the
+    number of files written"""
+    vendor_dir = os.path.join(app.root_path, VENDOR_DIR)
+    os.makedirs(os.path.join(vendor_dir, 'fonts'), exist_ok=True)
+    written = 0
+    for name, url in VENDOR_FILES.items():
+        path = os.path.join(vendor_dir, name)
+        if refresh or not os.path.isfile(path):
+            data = _download(url)
+            with open(path, 'wb') as f:
+                f.write(data)
+            written += 1
+
+    fonts_css = os.path.join(vendor_dir, 'fonts.css')
+    if refresh or not os.path.isfile(fonts_css):
+        css = _download(FONTS_URL, {'User-Agent': FONTS_USER_AGENT}).decode('utf-8')
+        faces = []
+        for block in select_font_faces(css):
+            def localize(m):
+                nonlocal written
+                url = m.group(1).strip('\'"')
+                # /s/<family>/<version>/<file>.woff2 -> <family>-<version>-<file>.woff2
+                name = '-'.join(urlsplit(url).path.strip('/').split('/')[1:])
+                target = os.path.join(vendor_dir, 'fonts', name)
+                if not os.path.isfile(target):
+                    data = _download(url)
+                    with open(target, 'wb') as f:
+                        f.write(data)
+                    written += 1
+                return f'url(fonts/{name})'
+            faces.append(re.sub(r'url\(([^)]+)\)', localize, block))
+        with open(fonts_css, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(faces) + '\n')
+        written += 1
+    return written
+
+
+# ===================== BUILD =====================
+
+def _read_source(app, source):
+    if source.startswith('vendor:'):
+        path = os.path.join(app.root_path, VENDOR_DIR, source[len('vendor:'):])
+    else:
+        path = os.path.join(app.static_folder, source)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        raise AssetBuildError(f'{source} not found (run without --offline to download vendor files)')
+
+
+def _template_texts(app, bundle):
+    loader = app.jinja_env.loader
+    texts = []
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        if any(fnmatch.fnmatch(name, p) for p in bundle['templates']) \
+                and not any(fnmatch.fnmatch(name, p) for p in bundle['exclude']):
+            texts.append(loader.get_source(app.jinja_env, name)[0])
+    return texts
+
+
+def _critical_texts(app, paths):
+    """Markup near the top of each rendered page (inline styles removed)"""
+    client = app.test_client()
+    texts = []
+    for path in paths:
+        response = client.get(path)
+        if response.status_code != 200:
+            continue
+        html = response.get_data(as_text=True)
+        html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.S)
+        body = html.find('<body')
+        texts.append(html[max(body, 0):max(body, 0) + CRITICAL_HTML_BYTES])
+    return texts
+
+
+def _copy_fonts(app, css, dist_dir):
+    """Copy the fonts `css` refers to into dist and point it at them"""
+    fonts = {}
+
+    def relocate(m):
+        name = os.path.basename(m.group(1).strip('\'"'))
+        source = os.path.join(app.root_path, VENDOR_DIR, 'fonts', name)
+        target = os.path.join(dist_dir, 'fonts', name)
+        if not os.path.isfile(source):
+            raise AssetBuildError(f'font {name} is missing from {VENDOR_DIR}/fonts')
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copyfile(source, target)
+        filename = f'{DIST_DIR}/fonts/{name}'
+        fonts[filename] = file_hash(target)
+        return f'url({app.static_url_path}/{filename}?v={fonts[filename]})'
+
+    return re.sub(r'url\(([^)]+)\)', relocate, css), fonts
+
+
+def build(app, names=None):
+    """Write every bundle (or those in `names`) and the manifest.
+
+    Returns {bundle: {file: bytes}}.
+    """
+    dist_dir = os.path.join(app.static_folder, DIST_DIR)
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest_path = os.path.join(dist_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.isfile(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest = json.load(f)
+
+    sizes = {}
+    for name, bundle in BUNDLES.items():
+        if names and name not in names:
+            continue
+        scripts = [(source, _read_source(app, source)) for source in bundle['js']]
+        own_scripts = [text for source, text in scripts if not source.startswith('vendor:')]
+        usage = Usage(_template_texts(app, bundle) + own_scripts, BOOTSTRAP_JS_CLASSES)
+
+        vendor_items, own_items = [], []
+        font_css = ''
+        for source in bundle['css']:
+            text = _read_source(app, source)
+            if source == 'vendor:fonts.css':
+                font_css = text
+            elif source.startswith('vendor:'):
+                vendor_items += parse_css(text)
+            else:
+                own_items += parse_css(text)
+        font_css, fonts = _copy_fonts(app, font_css, dist_dir)
+        font_items = parse_css(font_css)
+
+        vendor_items = prune_unreferenced(purge(vendor_items, usage), own_items, usage)
+        files = {
+            f'{name}.css': serialize(font_items + vendor_items + own_items),
+            f'{name}.js': ';\n'.join(minify_js(text, source) for source, text in scripts) + '\n',
+        }
+        if bundle['critical']:
+            critical_usage = Usage(_critical_texts(app, bundle['critical']))
+            critical = purge(vendor_items + own_items, critical_usage)
+            files[f'{name}.critical.css'] = serialize(font_items + prune_unreferenced(critical, [], critical_usage))
+
+        for filename, text in files.items():
+            with open(os.path.join(dist_dir, filename), 'w', encoding='utf-8') as f:
+                f.write(text)
+        preload = [font for font in fonts if any(
+            font in body and any(family in body for family in PRELOAD_FONTS) for _, body in font_items
+        )]
+        manifest[name] = {
+            'css': f'{DIST_DIR}/{name}.css',
+            'js': f'{DIST_DIR}/{name}.js',
+            'critical': f'{DIST_DIR}/{name}.critical.css' if bundle['critical'] else None,
+            'preload': sorted(preload),
+        }
+        sizes[name] = {filename: len(text.encode('utf-8')) for filename, text in files.items()}
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return sizes
+
+
+# ===================== TEMPLATE HELPERS =====================
+
+class AssetBundles:
+    """Loads the build manifest and provides ``asset_styles`` /
+    ``asset_scripts`` to templates"""
+
+    def init_app(self, app):
+        self.load(app)
+        app.jinja_env.globals['asset_styles'] = self.styles
+        app.jinja_env.globals['asset_scripts'] = self.scripts
+
+    def load(self, app):
+        """(Re)read the manifest and critical CSS written by `build()`"""
+        bundles = {}
+        manifest_path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+        if app.config.get('ASSET_BUNDLES') and os.path.isfile(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                bundles = json.load(f)
+            for bundle in bundles.values():
+                if bundle.get('critical'):
+                    with open(os.path.join(app.static_folder, bundle['critical']), encoding='utf-8') as f:
+                        # '</' cannot end the style element early in minified CSS
+                        bundle['critical_css'] = Markup(f.read().replace('</', '<\\/'))
+        app.extensions['asset_bundles'] = bundles
+
+    @staticmethod
+    def _built(name):
+        return current_app.extensions['asset_bundles'].get(name)
+
+    def styles(self, name):
+        bundle = self._built(name)
+        if bundle is None:
+            return Markup('\n    '.join(_fallback_styles(name)))
+        href = url_for('static', filename=bundle['css'])
+        tags = [f'<link rel="preload" href="{escape(url_for("static", filename=font))}" as="font" '
+                f'type="font/woff2" crossorigin>' for font in bundle['preload']]
+        if bundle.get('critical_css'):
+            tags += [
+                f'<style>{bundle["critical_css"]}</style>',
+                f'<link rel="preload" href="{escape(href)}" as="style" '
+                f'onload="this.onload=null;this.rel=\'stylesheet\'">',
+                f'<noscript><link rel="stylesheet" href="{escape(href)}"></noscript>',
+            ]
+        else:
+            tags.append(f'<link rel="stylesheet" href="{escape(href)}">')
+        return Markup('\n    '.join(tags))
+
+    def scripts(self, name):
+        bundle = self._built(name)
+        if bundle is None:
+            return Markup('\n    '.join(
+                f'<script src="{escape(_source_url(source))}"></script>' for source in BUNDLES[name]['js']
+            ))
+        return Markup(f'<script src="{escape(url_for("static", filename=bundle["js"]))}" defer></script>')
+
+
+def _source_url(source):
+    if source.startswith('vendor:'):
+        return VENDOR_FILES[source[len('vendor:'):]]
+    return url_for('static', filename=source)
+
+
+def _fallback_styles(name):
+    """The CDN tags used before anything is built"""
+    tags = []
+    for source in BUNDLES[name]['css']:
+        if source == 'vendor:fonts.css':
+            tags += [
+                '<link rel="preconnect" href="https://fonts.googleapis.com">',
+                '<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>',
+                f'<link href="{escape(FONTS_URL)}" rel="stylesheet">',
+            ]
+        else:
+            tags.append(f'<link rel="stylesheet" href="{escape(_source_url(source))}">')
+    return tags
@@ -0,0 +1,467 @@
+"""Settings, page and fragment caches shared by the app.
+
+State lives in ``app.extensions`` so several app instances (e.g. tests or
+benchmarks) in one process never see each other's data. Cross-process
+invalidation uses ``FileStamp``: writers touch a small file after
+committing and every worker compares its identity on read, which costs a
+single ``stat()`` instead of a database round-trip.
+"""
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple, OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from types import MappingProxyType
+
+from flask import current_app, request, session, make_response
+from markupsafe import Markup
+from sqlalchemy import select, func
+
+import compression
+
+
+class FileStamp:
+    """Cross-process change marker backed by a file in the instance folder"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        """Return an opaque token that changes whenever `touch()` is called"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns)
+
+    def touch(self):
+        # Replace rather than rewrite so the inode changes even on
+        # filesystems with coarse mtime resolution.
+        tmp_path = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(str(time.time_ns()))
+        os.replace(tmp_path, self.path)
+
+
+_snapshot_types = {}
+
+
+def snapshot(instance):
+    """Return a detached, immutable copy of a model instance.
+
+    Column values are copied into a namedtuple; dict/list values (JSON
+    columns) are wrapped read-only, so templates can use the snapshot
+    exactly like the ORM object but nothing can be written back.
+    """
+    model = type(instance)
+    columns = tuple(c.key for c in model.__table__.columns)
+    snapshot_type = _snapshot_types.get(model)
+    if snapshot_type is None:
+        snapshot_type = namedtuple(f'{model.__name__}Snapshot', columns)
+        _snapshot_types[model] = snapshot_type
+
+    values = []
+    for name in columns:
+        value = getattr(instance, name)
+        if isinstance(value, dict):
+            value = MappingProxyType(dict(value))
+        elif isinstance(value, list):
+            value = tuple(value)
+        values.append(value)
+    return snapshot_type(*values)
+
+
+class _SettingsState:
+    def __init__(self, stamp):
+        self.stamp = stamp
+        self.snapshot = None
+        self.version = None
+        self.lock = threading.Lock()
+
+
+class SettingsCache:
+    """Caches a snapshot of the SiteSettings singleton per process.
+
+    Call `get()` on read paths and `invalidate()` after committing a change
+    to the settings row.
+    """
+
+    def init_app(self, app):
+        os.makedirs(app.instance_path, exist_ok=True)
+        stamp_path = app.config.get('SETTINGS_STAMP_FILE') or os.path.join(app.instance_path, 'settings.stamp')
+        app.extensions['settings_cache'] = _SettingsState(FileStamp(stamp_path))
+
+    def _state(self):
+        return current_app.extensions['settings_cache']
+
+    def get(self):
+        """Return the cached settings snapshot, reloading it if stale"""
+        from models import SiteSettings
+
+        state = self._state()
+        version = state.stamp.read()
+        if state.snapshot is not None and state.version == version:
+            return state.snapshot
+
+        with state.lock:
+            if state.snapshot is None or state.version != version:
+                state.snapshot = snapshot(SiteSettings.get_settings())
+                state.version = version
+            return state.snapshot
+
+    def invalidate(self):
+        """Drop the cached snapshot here and in every other worker"""
+        state = self._state()
+        with state.lock:
+            state.snapshot = None
+            state.stamp.touch()
+
+
+# ===================== RESPONSE CACHE =====================
+
+# `encoded` maps content codings to compressed copies of `body`, filled on
+# first request for each so a page version is compressed at most once
+CachedPage = namedtuple('CachedPage', 'body mimetype etag last_modified tokens expires encoded')
+
+
+class NullBackend:
+    """Backend that never stores anything (caching disabled)"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, entry):
+        pass
+
+    def clear(self):
+        pass
+
+
+class MemoryBackend:
+    """Thread-safe LRU of cached pages for a single process"""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry.expires < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileBackend:
+    """Pickled pages on disk, shared by every worker on the host.
+
+    At most `max_entries` pages are kept: a hit refreshes the file's mtime,
+    and once the directory grows past the bound the least recently used
+    tenth is removed.
+    """
+
+    def __init__(self, directory, max_entries=512):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, TypeError):
+            # TypeError: written by a version with different CachedPage fields
+            return None
+        if entry.expires < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def set(self, key, entry):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        names = [n for n in os.listdir(self.directory) if not n.endswith('.tmp')]
+        if len(names) <= self.max_entries:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                entries.append((os.stat(path).st_mtime_ns, path))
+            except OSError:
+                pass  # removed by another worker
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries * 9 // 10]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+def _last_modified_columns():
+    from models import Project, BlogPost, SiteSettings, Experience, Tool
+    # Experience and Tool have no updated_at; edits to them are still
+    # reflected through the purge stamps.
+    return {
+        'project': Project.updated_at,
+        'post': BlogPost.updated_at,
+        'settings': SiteSettings.updated_at,
+        'experience': Experience.created_at,
+        'tool': Tool.created_at,
+    }
+
+
+class _ResponseCacheState:
+    def __init__(self, backend, stamp_dir, ttl):
+        self.backend = backend
+        self.stamp_dir = stamp_dir
+        self.ttl = ttl
+        self.stamps = {}
+
+    def stamp(self, entity):
+        stamp = self.stamps.get(entity)
+        if stamp is None:
+            stamp = self.stamps[entity] = FileStamp(os.path.join(self.stamp_dir, f'{entity}.stamp'))
+        return stamp
+
+
+class ResponseCache:
+    """Full-page cache for public GET routes.
+
+    Views declare which entities they render, and the query args they
+    read, with ``@cached('project', ..., args=('page',))``;
+    admin handlers call ``purge('project')`` after committing. Each cached
+    page remembers the purge stamps of its entities, so a purge in any
+    worker makes the page stale everywhere. Responses carry an ETag and a
+    Last-Modified date (latest ``updated_at`` or purge time of the
+    entities), and conditional requests are answered with 304. HTML is
+    minified before it is stored and compressed variants are kept with the
+    page (see ``compression``).
+
+    Backends are selected with ``RESPONSE_CACHE_TYPE``: ``memory`` (LRU
+    per worker), ``filesystem`` (shared on-disk store) or ``null``.
+    """
+
+    def init_app(self, app):
+        cache_type = app.config.get('RESPONSE_CACHE_TYPE', 'memory')
+        cache_dir = app.config.get('RESPONSE_CACHE_DIR') or os.path.join(app.instance_path, 'cache')
+        stamp_dir = os.path.join(cache_dir, 'stamps')
+        os.makedirs(stamp_dir, exist_ok=True)
+
+        if cache_type == 'memory':
+            backend = MemoryBackend(app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+        elif cache_type == 'filesystem':
+            backend = FileBackend(os.path.join(cache_dir, 'pages'), app.config.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+        elif cache_type == 'null':
+            backend = NullBackend()
+        else:
+            raise ValueError(f'Unknown RESPONSE_CACHE_TYPE: {cache_type!r}')
+
+        app.extensions['response_cache'] = _ResponseCacheState(
+            backend, stamp_dir, app.config.get('RESPONSE_CACHE_TTL', 300)
+        )
+
+    def _state(self):
+        return current_app.extensions['response_cache']
+
+    def purge(self, *entities):
+        """Invalidate every cached page that depends on any of `entities`"""
+        state = self._state()
+        for entity in entities:
+            state.stamp(entity).touch()
+
+    def tokens(self, *entities):
+        """Current purge stamps of `entities`; they change on every purge"""
+        state = self._state()
+        return tuple(state.stamp(e).read() for e in entities)
+
+    def clear(self):
+        self._state().backend.clear()
+
+    @staticmethod
+    def _bypass(state):
+        """Pages rendered for a logged-in admin or with pending flash messages
+        differ from the anonymous page and must not be shared."""
+        if isinstance(state.backend, NullBackend) or request.method != 'GET':
+            return True
+        if '_user_id' in session or '_flashes' in session:
+            return True
+        return current_app.config.get('REMEMBER_COOKIE_NAME', 'remember_token') in request.cookies
+
+    @staticmethod
+    def _key(args):
+        """Cache key for this request; query args other than `args` are
+        ignored so made-up parameters cannot fill the cache."""
+        query = '&'.join(f'{k}={v}' for k in args for v in request.args.getlist(k))
+        return f'{request.path}?{query}'
+
+    def _last_modified(self, entities, tokens):
+        from extensions import db
+
+        columns = _last_modified_columns()
+        query = select(*(select(func.max(columns[e])).scalar_subquery() for e in entities))
+        candidates = [value for value in db.session.execute(query).one() if value is not None]
+        candidates = [value.replace(tzinfo=timezone.utc) for value in candidates]
+        candidates += [
+            datetime.fromtimestamp(token[1] / 1e9, tz=timezone.utc) for token in tokens if token is not None
+        ]
+        return max(candidates) if candidates else None
+
+    @staticmethod
+    def _respond(state, key, entry):
+        known = len(entry.encoded)
+        response = compression.cached_response(entry.body, entry.mimetype, entry.etag, entry.encoded)
+        if len(entry.encoded) != known:
+            # Store the new compressed copy with the page
+            state.backend.set(key, entry)
+        if entry.last_modified is not None:
+            response.last_modified = entry.last_modified
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        return response.make_conditional(request)
+
+    def cached(self, *entities, args=()):
+        """Decorator caching a view's 200 responses until `entities` change.
+
+        `args` names the query args the view reads; a request with any other
+        args is served (and cached) as if they were absent.
+        """
+        key_args = args
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                state = self._state()
+                if self._bypass(state):
+                    return view(*args, **kwargs)
+
+                key = self._key(key_args)
+                tokens = tuple(state.stamp(e).read() for e in entities)
+                entry = state.backend.get(key)
+                if entry is not None and entry.tokens == tokens:
+                    return self._respond(state, key, entry)
+
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.direct_passthrough:
+                    return response
+
+                body = compression.minify(response.get_data(), response.mimetype)
+                entry = CachedPage(
+                    body=body,
+                    mimetype=response.mimetype,
+                    etag=hashlib.sha1(body).hexdigest(),
+                    last_modified=self._last_modified(entities, tokens),
+                    tokens=tokens,
+                    expires=time.time() + state.ttl,
+                    encoded={},
+                )
+                state.backend.set(key, entry)
+                return self._respond(state, key, entry)
+            return wrapper
+        return decorator
+
+
+# ===================== FRAGMENT CACHE =====================
+
+CachedFragment = namedtuple('CachedFragment', 'body tokens expires')
+
+
+class Deferred:
+    """A list that is only loaded when a template first uses it.
+
+    Passing query results wrapped in ``Deferred`` means a fragment served
+    from the cache never runs its query.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._items = None
+
+    def _load(self):
+        if self._items is None:
+            self._items = list(self._loader())
+        return self._items
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __bool__(self):
+        return bool(self._load())
+
+    def __getitem__(self, index):
+        return self._load()[index]
+
+
+class FragmentCache:
+    """Rendered template fragments, kept in the response cache's backend.
+
+    ``{% cache 'name', 'experience', 'tool' %}...{% endcache %}`` (see
+    templating.py) stores the block under `name` with the purge stamps of
+    the listed entities, so ``response_cache.purge('tool')`` makes it stale
+    in every worker just like a cached page. Fragments must not depend on
+    the visitor; they are reused for logged-in admins too.
+    """
+
+    def init_app(self, app):
+        app.extensions['fragment_cache'] = app.config.get('FRAGMENT_CACHE_TTL', 3600)
+
+    def render(self, name, entities, render):
+        """Return the cached fragment, or `render()` it and store the result"""
+        state = current_app.extensions['response_cache']
+        key = f'fragment:{name}'
+        tokens = tuple(state.stamp(e).read() for e in entities)
+        entry = state.backend.get(key)
+        if entry is not None and entry.tokens == tokens:
+            return Markup(entry.body)
+
+        body = str(render())
+        ttl = current_app.extensions['fragment_cache']
+        state.backend.set(key, CachedFragment(body, tokens, time.time() + ttl))
+        return Markup(body)
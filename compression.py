@@ -0,0 +1,173 @@
+"""Minification and compression of dynamic responses.
+
+Rendered HTML loses the indentation and comments the templates carry
+(``<pre>``, ``<textarea>`` and ``<script>`` are left exactly as they
+are), then text responses of at least ``COMPRESS_MIN_SIZE`` bytes
+are compressed with brotli (when the ``brotli`` package is installed) or
+gzip, whichever the client's ``Accept-Encoding`` prefers.
+
+``ResponseCompression`` does this in an ``after_request`` hook for every
+view. Pages served from the response cache are minified once when they are
+stored and keep their compressed variants next to the body, so compression
+is paid once per content version; the hook leaves those responses alone.
+A compressed body is a different representation, so its strong ETag gets
+the encoding as a suffix (``"<etag>-gz"``, ``"<etag>-br"``).
+"""
+import gzip
+import re
+import zlib
+
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is used instead
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'text/html', 'text/plain', 'text/css', 'text/xml', 'application/json', 'application/javascript',
+    'application/xml', 'application/atom+xml', 'application/rss+xml', 'image/svg+xml',
+}
+ETAG_SUFFIXES = {'gzip': 'gz', 'br': 'br'}
+
+# One pass over the UTF-8 bytes: preserved elements are copied, comments
+# (except conditional ones) dropped and whitespace runs spanning a line
+# break replaced by a single newline
+MINIFY_RE = re.compile(
+    rb'(<(pre|textarea|script)\b.*?</\2\s*>)|<!--(?!\[if|<!).*?-->(?:[ \t\r\f]*\n\s*)?|[ \t\r\f]*\n\s*',
+    re.S | re.I,
+)
+
+
+def _minify_match(match):
+    if match.group(1) is not None:
+        return match.group(1)
+    return b'' if match.group(0).startswith(b'<!--') else b'\n'
+
+
+def minify_html(html):
+    """Drop comments and indentation from UTF-8 encoded `html`.
+
+    A newline renders exactly like the whitespace run it replaces, so
+    inline layout is unchanged.
+    """
+    return MINIFY_RE.sub(_minify_match, html).strip()
+
+
+def minify(body, mimetype):
+    """`body` bytes minified if HTML minification applies to `mimetype`"""
+    if mimetype != 'text/html' or not current_app.config['MINIFY_HTML']:
+        return body
+    return minify_html(body)
+
+
+def negotiate(mimetype, size):
+    """Content coding to use for a `size` byte `mimetype` body, or None"""
+    config = current_app.config
+    if not config['COMPRESS_RESPONSES'] or mimetype not in COMPRESSIBLE_MIMETYPES \
+            or size < config['COMPRESS_MIN_SIZE']:
+        return None
+    accepted = request.accept_encodings
+    for encoding in ('br', 'gzip'):
+        if accepted[encoding] and (encoding != 'br' or brotli is not None):
+            return encoding
+    return None
+
+
+def compress(body, encoding):
+    config = current_app.config
+    if encoding == 'br':
+        return brotli.compress(body, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(body, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte strings as it is consumed"""
+    config = current_app.config
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+        process, flush = compressor.process, compressor.finish
+    else:
+        # wbits 31: gzip container
+        compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+        process, flush = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def cached_response(body, mimetype, etag, variants):
+    """Response for a stored `body` in the coding this request prefers.
+
+    Compressed copies are kept in `variants` (coding -> bytes), so each is
+    computed once for as long as the caller keeps `body`.
+    """
+    encoding = negotiate(mimetype, len(body))
+    if encoding:
+        if encoding not in variants:
+            variants[encoding] = compress(body, encoding)
+        body = variants[encoding]
+    response = current_app.response_class(body, mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if current_app.config['COMPRESS_RESPONSES']:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(variant_etag(etag, encoding))
+    return skip(response)
+
+
+def variant_etag(etag, encoding):
+    return f'{etag}-{ETAG_SUFFIXES[encoding]}' if encoding else etag
+
+
+def matching_etag(etag):
+    """The variant of `etag` named in If-None-Match, or None"""
+    for tag in (etag, *(variant_etag(etag, e) for e in ETAG_SUFFIXES)):
+        if tag in request.if_none_match:
+            return tag
+    return None
+
+
+def skip(response):
+    """Mark `response` as already minified and compressed"""
+    response.compressed = True
+    return response
+
+
+class ResponseCompression:
+    """``after_request`` hook minifying and compressing dynamic responses.
+
+    Controlled by ``MINIFY_HTML``, ``COMPRESS_RESPONSES``,
+    ``COMPRESS_MIN_SIZE``, ``COMPRESS_LEVEL`` (gzip, 1-9) and
+    ``COMPRESS_BROTLI_QUALITY`` (0-11).
+    """
+
+    def init_app(self, app):
+        app.after_request(self.process)
+
+    @staticmethod
+    def process(response):
+        # Static files are precompressed and streamed; cached pages were
+        # handled when they were stored
+        if response.direct_passthrough or response.is_streamed or getattr(response, 'compressed', False) \
+                or 'Content-Encoding' in response.headers or response.status_code in (204, 206, 304) \
+                or 300 <= response.status_code < 400:
+            return response
+        mimetype = response.mimetype
+        if mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+
+        body = minify(response.get_data(), mimetype)
+        encoding = negotiate(mimetype, len(body))
+        if encoding:
+            body = compress(body, encoding)
+            response.headers['Content-Encoding'] = encoding
+            etag, weak = response.get_etag()
+            if etag and not weak:
+                response.set_etag(variant_etag(etag, encoding))
+        response.set_data(body)
+        if current_app.config['COMPRESS_RESPONSES']:
+            response.vary.add('Accept-Encoding')
+        return response
@@ -11,19 +11,145 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///portfolio.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Create tables, run migrations and seed the admin user when the app starts.
+    # Disable to run `flask init-db` as a separate deploy step instead.
+    AUTO_INIT_DB = os.getenv('AUTO_INIT_DB', 'True').lower() == 'true'
+    
     # Upload settings
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', os.path.join(os.path.dirname(__file__), 'static', 'uploads'))
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
     
+    # Responsive image derivatives (requires Pillow); formats the installed
+    # Pillow cannot encode are skipped
+    IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1280)
+    IMAGE_DERIVATIVE_FORMATS = ('avif', 'webp')
+    IMAGE_DERIVATIVE_QUALITY = int(os.getenv('IMAGE_DERIVATIVE_QUALITY', 80))
+    
+    # Background jobs (jobs.py): threads per process running them (0 leaves
+    # them to `flask run-jobs`), seconds between polls, retries before a job
+    # is marked failed, seconds before a 'running' job is assumed orphaned,
+    # and days finished jobs are kept
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 5))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 600))
+    JOB_RETENTION_DAYS = int(os.getenv('JOB_RETENTION_DAYS', 7))
+    
+    # Seconds a logged-in admin's identity is served from memory instead of
+    # the database (0 disables); password changes and logouts drop it at once
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))
+    
+    # Number of reverse proxies in front of the app whose X-Forwarded-For is
+    # trusted for the client address (0: use the connecting address). Leave
+    # at 0 unless a proxy sets the header, or clients can forge it
+    PROXY_FIX_X_FOR = int(os.getenv('PROXY_FIX_X_FOR', 0))
+    
+    # Login throttling (auth.py): token buckets per client address, plus a
+    # warning when failed logins across all clients exceed the global rate.
+    # Storage is 'memory' (per worker), 'sqlite' (shared by the workers on a
+    # host, LOGIN_RATE_LIMIT_DB defaults to <instance>/login_throttle.db) or
+    # 'null' to disable
+    LOGIN_RATE_LIMIT_STORAGE = os.getenv('LOGIN_RATE_LIMIT_STORAGE', 'memory')
+    LOGIN_RATE_LIMIT_DB = os.getenv('LOGIN_RATE_LIMIT_DB')
+    LOGIN_ATTEMPTS_BURST = int(os.getenv('LOGIN_ATTEMPTS_BURST', 5))
+    LOGIN_ATTEMPTS_PER_MINUTE = float(os.getenv('LOGIN_ATTEMPTS_PER_MINUTE', 5))
+    LOGIN_ATTEMPTS_GLOBAL_PER_MINUTE = float(os.getenv('LOGIN_ATTEMPTS_GLOBAL_PER_MINUTE', 60))
+    
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
     SESSION_COOKIE_SECURE = os.getenv('SESSION_COOKIE_SECURE', 'False').lower() == 'true'
     SESSION_COOKIE_HTTPONLY = os.getenv('SESSION_COOKIE_HTTPONLY', 'True').lower() == 'true'
     SESSION_COOKIE_SAMESITE = os.getenv('SESSION_COOKIE_SAMESITE', 'Lax')
     
+    # File touched after /admin/settings saves so every worker reloads its cached
+    # SiteSettings snapshot (defaults to <instance>/settings.stamp)
+    SETTINGS_STAMP_FILE = os.getenv('SETTINGS_STAMP_FILE')
+    
+    # Use the bundles written by `flask build-assets` (self-hosted Bootstrap and
+    # fonts, inlined critical CSS) when they exist; off serves the CDN tags
+    ASSET_BUNDLES = os.getenv('ASSET_BUNDLES', 'True').lower() == 'true'
+    
+    # Write .gz/.br copies of static assets at startup (see `flask build-static`)
+    STATIC_PRECOMPRESS = os.getenv('STATIC_PRECOMPRESS', 'True').lower() == 'true'
+    
+    # Full-page cache for public routes: 'memory' (per worker), 'filesystem'
+    # (shared by all workers on the host) or 'null' to disable
+    RESPONSE_CACHE_TYPE = os.getenv('RESPONSE_CACHE_TYPE', 'memory')
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+    # Pages kept per worker ('memory') or on disk ('filesystem')
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 512))
+    RESPONSE_CACHE_DIR = os.getenv('RESPONSE_CACHE_DIR')  # defaults to <instance>/cache
+    # {% cache %} template fragments share the response cache's store
+    FRAGMENT_CACHE_TTL = int(os.getenv('FRAGMENT_CACHE_TTL', 3600))
+    
+    # Strip template indentation and comments from rendered HTML, and gzip
+    # (or brotli, when installed) dynamic responses of at least
+    # COMPRESS_MIN_SIZE bytes; cached pages keep their compressed copies
+    MINIFY_HTML = os.getenv('MINIFY_HTML', 'True').lower() == 'true'
+    COMPRESS_RESPONSES = os.getenv('COMPRESS_RESPONSES', 'True').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 500))
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 5))
+    
+    # Store compiled templates in TEMPLATE_CACHE_DIR (defaults to <instance>/jinja)
+    # and load them all at startup
+    TEMPLATE_BYTECODE_CACHE = os.getenv('TEMPLATE_BYTECODE_CACHE', 'True').lower() == 'true'
+    TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR')
+    
     # Pagination
     ITEMS_PER_PAGE = int(os.getenv('ITEMS_PER_PAGE', 10))
+    PROJECTS_PER_PAGE = 12
+    POSTS_PER_PAGE = 10
+    SEARCH_RESULTS_PER_PAGE = 20
+    
+    # Newest posts and projects in /feed.xml and /rss.xml; sitemaps with more
+    # URLs than SITEMAP_STREAM_THRESHOLD are streamed instead of cached
+    FEED_ITEMS = int(os.getenv('FEED_ITEMS', 20))
+    SITEMAP_STREAM_THRESHOLD = int(os.getenv('SITEMAP_STREAM_THRESHOLD', 10000))
+    # Cursor-based (keyset) pagination for list pages: constant cost per page,
+    # previous/next links only. An explicit ?page=N still uses offset paging.
+    CURSOR_PAGINATION = os.getenv('CURSOR_PAGINATION', 'False').lower() == 'true'
+    
+    # Rows inserted per flush by `flask import-content` and /admin/import
+    IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 500))
+    
+    # Access-Control-Allow-Origin for /api/v1 (empty disables CORS headers)
+    API_CORS_ORIGIN = os.getenv('API_CORS_ORIGIN', '*')
+    
+    # Output folder for `flask export` (static copy of the public site)
+    EXPORT_FOLDER = os.getenv('EXPORT_FOLDER', os.path.join(os.path.dirname(__file__), 'build'))
+    # Public address of the exported site, used for the absolute links in
+    # the exported sitemap and feeds
+    EXPORT_BASE_URL = os.getenv('EXPORT_BASE_URL', 'http://localhost')
+    
+    # SQLite connection pragmas: WAL lets readers run alongside a writer, and
+    # writers wait up to SQLITE_BUSY_TIMEOUT ms for the lock instead of failing
+    SQLITE_JOURNAL_MODE = os.getenv('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+    
+    # Read replicas for the public pages (comma-separated URLs); empty sends
+    # every query to SQLALCHEMY_DATABASE_URI. After a commit, reads stay on
+    # the primary for REPLICA_STICKY_SECONDS; a failing replica is skipped
+    # for REPLICA_RETRY_SECONDS
+    DATABASE_REPLICA_URLS = os.getenv('DATABASE_REPLICA_URLS', '')
+    REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+    REPLICA_RETRY_SECONDS = int(os.getenv('REPLICA_RETRY_SECONDS', 30))
+    
+    # `flask serve` (production server); 0 workers means one per CPU
+    SERVER_BIND = os.getenv('SERVER_BIND', '127.0.0.1:8000')
+    SERVER_WORKERS = int(os.getenv('WEB_CONCURRENCY', 0))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', 4))
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', 30))
+    
+    # Per-request timing: Server-Timing headers and a Prometheus /metrics
+    # endpoint, reachable from METRICS_ALLOWED_IPS (empty allows anyone)
+    INSTRUMENTATION = os.getenv('INSTRUMENTATION', 'False').lower() == 'true'
+    METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1')
+    # With INSTRUMENTATION on, save cProfile stats of requests slower than this
+    # many ms to PROFILE_DIR (defaults to <instance>/profiles); 0 disables
+    PROFILE_SLOW_REQUESTS_MS = int(os.getenv('PROFILE_SLOW_REQUESTS_MS', 0))
+    PROFILE_DIR = os.getenv('PROFILE_DIR')
 
 
 class DevelopmentConfig(Config):
@@ -37,12 +163,23 @@ class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
     SESSION_COOKIE_SECURE = True
+    
+    # One pooled connection per server thread, a few spare for the job
+    # runner; pre-ping and recycle drop connections the server has closed
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', Config.SERVER_THREADS)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', Config.JOB_WORKERS + 2)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': True,
+    }
 
 
 class TestingConfig(Config):
     """Testing Configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    RESPONSE_CACHE_TYPE = 'null'
 
 
 config_by_name = {
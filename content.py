@@ -0,0 +1,77 @@
+"""Write-time processing of post and project text.
+
+Posts and project descriptions are written in Markdown (inline HTML still
+works, as before). When one is saved the source is converted to HTML,
+sanitized with nh3 so only formatting markup survives, and reduced to a
+plain-text excerpt and a reading time. The results are stored next to the
+source, so pages only output stored strings.
+"""
+import re
+import threading
+from collections import namedtuple
+from html import unescape
+
+import markdown
+import nh3
+
+RenderedContent = namedtuple('RenderedContent', 'html excerpt reading_time')
+
+MARKDOWN_EXTENSIONS = ['fenced_code', 'tables', 'sane_lists']
+
+ALLOWED_TAGS = nh3.ALLOWED_TAGS | {'tfoot'}
+ALLOWED_ATTRIBUTES = {
+    **nh3.ALLOWED_ATTRIBUTES,
+    'a': {'href', 'hreflang', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height', 'loading'},
+    'abbr': {'title'},
+    # Syntax highlighting classes on fenced code blocks
+    'code': {'class'},
+    'pre': {'class'},
+    'span': {'class'},
+}
+
+WORDS_PER_MINUTE = 200
+TAG_RE = re.compile(r'<[^>]+>')
+SPACE_RE = re.compile(r'\s+')
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+# Building a Markdown instance costs about as much as converting a short
+# document, so each thread keeps one (instances are not thread-safe)
+_local = threading.local()
+
+
+def _markdown():
+    md = getattr(_local, 'markdown', None)
+    if md is None:
+        md = _local.markdown = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+    return md.reset()
+
+
+def to_html(source):
+    """Markdown (with inline HTML) to sanitized HTML"""
+    html = _markdown().convert(source or '')
+    return nh3.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, link_rel='noopener noreferrer')
+
+
+def to_text(html):
+    return SPACE_RE.sub(' ', unescape(TAG_RE.sub(' ', html or ''))).strip()
+
+
+def excerpt(text, length):
+    """Cut `text` at a word boundary, marking the cut with an ellipsis"""
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(' ', 1)[0].rstrip(' ,.;:')
+    return f'{cut}…'
+
+
+def reading_time(text):
+    """Minutes to read `text`, at least one"""
+    return max(1, round(len(WORD_RE.findall(text)) / WORDS_PER_MINUTE))
+
+
+def render(source, excerpt_length):
+    html = to_html(source)
+    text = to_text(html)
+    return RenderedContent(html, excerpt(text, excerpt_length), reading_time(text))
@@ -0,0 +1,43 @@
+"""Engine setup that Flask-SQLAlchemy's config keys do not cover.
+
+SQLite connections are switched to WAL journaling, so readers in other
+worker processes no longer block on a writer, and get a busy timeout so
+concurrent writers wait for the lock instead of failing with "database is
+locked". Pool sizing for server databases lives in
+``ProductionConfig.SQLALCHEMY_ENGINE_OPTIONS``.
+"""
+from sqlalchemy import event
+
+from extensions import db
+
+
+def _sqlite_pragmas(journal_mode, busy_timeout):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if journal_mode:
+            cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            if journal_mode.upper() == 'WAL':
+                # Durable at each checkpoint rather than each commit; safe with WAL
+                cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.close()
+    return on_connect
+
+
+def configure_engines(app):
+    """Attach connect-time settings to the app's engines (call before first use)"""
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != 'sqlite':
+                continue
+            in_memory = engine.url.database in (None, '', ':memory:')
+            journal_mode = None if in_memory else app.config['SQLITE_JOURNAL_MODE']
+            event.listen(engine, 'connect', _sqlite_pragmas(journal_mode, app.config['SQLITE_BUSY_TIMEOUT']))
+
+
+def dispose_engines(app, close=False):
+    """Drop pooled connections inherited from a parent process after fork
+    (or, with `close`, close them in the parent before forking)"""
+    with app.app_context():
+        for engine in [*db.engines.values(), *app.extensions['db_router'].replicas]:
+            engine.dispose(close=close)
@@ -0,0 +1,263 @@
+"""Static export of the public site.
+
+``export_site()`` renders every public page through the Flask test client
+(so the normal views and templates are used) and writes a tree that any
+static file server can serve:
+
+    index.html
+    projects/index.html, projects/page/<n>/index.html
+    project/<id>/index.html
+    blog/index.html, blog/page/<n>/index.html
+    blog/<slug>/index.html
+    sitemap.xml, feed.xml, rss.xml
+    404.html
+    static/...
+
+Search needs the app: proxy ``/search`` to it along with ``/admin``.
+Absolute URLs in the sitemap and feeds use ``EXPORT_BASE_URL``.
+
+Each page is described by a signature of the rows it renders. The
+signatures are stored in a manifest next to the output, and later exports
+only re-render pages whose signature changed. Templates and static files
+are part of a global build signature; changing them forces a full rebuild.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+
+from sqlalchemy.orm import selectinload, joinedload
+
+from extensions import db
+from models import SiteSettings, Project, BlogPost, Experience, Tool
+
+MANIFEST_NAME = '.export-manifest.json'
+
+# Pagination links are rendered as query strings, which static servers
+# ignore; rewrite them to the path-based pages written by the exporter.
+PAGE_LINK_RE = re.compile(r'href="/(projects|blog)\?page=(\d+)"')
+# List pages are always rendered with page numbers: an explicit ?page=
+# turns CURSOR_PAGINATION off, and cursor links cannot be mapped to files
+LIST_URLS = ('/projects', '/blog')
+
+
+def _row(obj):
+    """Column values of a model instance, for signatures"""
+    if obj is None:
+        return None
+    return tuple(getattr(obj, c.key) for c in type(obj).__table__.columns)
+
+
+def _signature(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+def _project_card(project):
+    return (_row(project), tuple(_row(image) for image in project.images))
+
+
+def _hash_tree(root, digest, exclude=None):
+    for dirpath, dirnames, filenames in os.walk(root):
+        if exclude and os.path.abspath(dirpath).startswith(exclude):
+            continue
+        dirnames.sort()
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            digest.update(f'{os.path.relpath(path, root)}:{st.st_size}:{st.st_mtime_ns}'.encode('utf-8'))
+
+
+def build_signature(app):
+    """Signature of everything besides the data that affects rendering.
+
+    Uploads are excluded: pages only reference them through their rows.
+    """
+    digest = hashlib.sha1(app.config['EXPORT_BASE_URL'].encode('utf-8'))
+    _hash_tree(os.path.join(app.root_path, 'templates'), digest)
+    _hash_tree(app.static_folder, digest, exclude=os.path.abspath(app.config['UPLOAD_FOLDER']))
+    return digest.hexdigest()
+
+
+def output_path(url):
+    """Map a public URL to a file in the export tree"""
+    if url == '/':
+        return 'index.html'
+    match = re.fullmatch(r'/(projects|blog)\?page=(\d+)', url)
+    if match:
+        return f'{match.group(1)}/page/{match.group(2)}/index.html'
+    if url.endswith('.xml'):
+        return url.lstrip('/')
+    return f'{url.strip("/")}/index.html'
+
+
+def render_url(url):
+    """URL to request for the page written for `url`"""
+    return f'{url}?page=1' if url in LIST_URLS else url
+
+
+def collect_pages(app):
+    """Return {url: signature} for every public page"""
+    pages = {}
+
+    settings = SiteSettings.query.first()
+    featured = Project.query.options(selectinload(Project.images)).limit(6).all()
+    experiences = Experience.query.order_by(Experience.order.asc(), Experience.start_date.desc().nulls_last()).all()
+    tools = Tool.query.order_by(Tool.order.asc(), Tool.name.asc()).all()
+    pages['/'] = _signature(
+        _row(settings),
+        [_project_card(p) for p in featured],
+        [_row(e) for e in experiences],
+        [_row(t) for t in tools],
+    )
+
+    # Project grid pages
+    per_page = app.config['PROJECTS_PER_PAGE']
+    projects = Project.query.options(selectinload(Project.images), selectinload(Project.blog_posts)).all()
+    total_pages = max(1, math.ceil(len(projects) / per_page))
+    for page in range(1, total_pages + 1):
+        chunk = projects[(page - 1) * per_page:page * per_page]
+        signature = _signature(total_pages, [_project_card(p) for p in chunk])
+        pages[f'/projects?page={page}'] = signature
+        if page == 1:
+            pages['/projects'] = signature
+
+    for project in projects:
+        pages[f'/project/{project.id}'] = _signature(
+            _project_card(project), [_row(post) for post in project.blog_posts]
+        )
+
+    # Blog pages (published posts only; drafts are never exported)
+    per_page = app.config['POSTS_PER_PAGE']
+    posts = BlogPost.query.options(joinedload(BlogPost.related_project)).filter_by(
+        published=True
+    ).order_by(BlogPost.created_at.desc()).all()
+    total_pages = max(1, math.ceil(len(posts) / per_page))
+    for page in range(1, total_pages + 1):
+        chunk = posts[(page - 1) * per_page:page * per_page]
+        signature = _signature(total_pages, [(_row(p), _row(p.related_project)) for p in chunk])
+        pages[f'/blog?page={page}'] = signature
+        if page == 1:
+            pages['/blog'] = signature
+
+    for post in posts:
+        pages[f'/blog/{post.slug}'] = _signature(_row(post), _row(post.related_project))
+
+    # Sitemap and feeds (see feeds.py)
+    pages['/sitemap.xml'] = _signature(
+        [(p.id, p.updated_at) for p in projects], [(p.slug, p.updated_at) for p in posts]
+    )
+    limit = app.config['FEED_ITEMS']
+    newest_projects = sorted(projects, key=lambda p: p.created_at, reverse=True)[:limit]
+    feed = _signature(_row(settings), [_row(p) for p in posts[:limit]], [_row(p) for p in newest_projects])
+    pages['/feed.xml'] = pages['/rss.xml'] = feed
+
+    return pages
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remove_page(output_dir, relpath):
+    path = os.path.join(output_dir, relpath)
+    if os.path.exists(path):
+        os.remove(path)
+    # Drop directories left empty (e.g. project/<id>/)
+    directory = os.path.dirname(path)
+    while directory != output_dir and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+
+def sync_static(source, destination):
+    """Mirror the static folder, copying only new or modified files.
+
+    Returns the number of files copied.
+    """
+    copied = 0
+    seen = set()
+    for dirpath, dirnames, filenames in os.walk(source):
+        rel_dir = os.path.relpath(dirpath, source)
+        os.makedirs(os.path.join(destination, rel_dir), exist_ok=True)
+        for name in filenames:
+            rel = os.path.normpath(os.path.join(rel_dir, name))
+            seen.add(rel)
+            src = os.path.join(source, rel)
+            dst = os.path.join(destination, rel)
+            src_stat = os.stat(src)
+            try:
+                dst_stat = os.stat(dst)
+                if dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            shutil.copy2(src, dst)
+            copied += 1
+
+    # Remove files deleted from the source (e.g. removed uploads)
+    for dirpath, dirnames, filenames in os.walk(destination):
+        for name in filenames:
+            rel = os.path.normpath(os.path.relpath(os.path.join(dirpath, name), destination))
+            if rel not in seen:
+                os.remove(os.path.join(dirpath, name))
+    return copied
+
+
+def export_site(app, output_dir, full=False):
+    """Render the public site into `output_dir`.
+
+    Returns a dict with the number of pages rendered, skipped and removed
+    and static files copied.
+    """
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+
+    manifest = {'build': None, 'pages': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    build = build_signature(app)
+    exported = set(manifest['pages'])
+    # Signatures of the previous export, unless everything must be re-rendered
+    previous = manifest['pages'] if not full and manifest.get('build') == build else {}
+
+    with app.app_context():
+        pages = collect_pages(app)
+        db.session.remove()
+
+    stats = {'rendered': 0, 'skipped': 0, 'removed': 0, 'static': 0}
+    client = app.test_client()
+    base_url = app.config['EXPORT_BASE_URL']
+
+    for url, signature in pages.items():
+        relpath = output_path(url)
+        if previous.get(url) == signature and os.path.exists(os.path.join(output_dir, relpath)):
+            stats['skipped'] += 1
+            continue
+        response = client.get(render_url(url), base_url=base_url)
+        if response.status_code != 200:
+            raise RuntimeError(f'Exporting {url} failed with status {response.status_code}')
+        html = PAGE_LINK_RE.sub(r'href="/\1/page/\2/"', response.get_data(as_text=True))
+        _write(os.path.join(output_dir, relpath), html.encode('utf-8'))
+        stats['rendered'] += 1
+
+    for url in exported - set(pages):
+        _remove_page(output_dir, output_path(url))
+        stats['removed'] += 1
+
+    if not previous or not os.path.exists(os.path.join(output_dir, '404.html')):
+        response = client.get('/__export_not_found__', base_url=base_url)
+        _write(os.path.join(output_dir, '404.html'), response.get_data())
+
+    stats['static'] = sync_static(app.static_folder, os.path.join(output_dir, 'static'))
+
+    _write(manifest_path, json.dumps({'build': build, 'pages': pages}, indent=2).encode('utf-8'))
+    return stats
@@ -1,5 +1,31 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 
-db = SQLAlchemy()
+from auth import UserCache, LoginThrottle
+from bundles import AssetBundles
+from cache import SettingsCache, ResponseCache, FragmentCache
+from compression import ResponseCompression
+from feeds import FeedCache
+from replicas import RoutingSession, DatabaseRouter
+from images import ImagePipeline
+from jobs import JobQueue
+from stats import DashboardStats
+from static_assets import StaticAssets
+from instrumentation import Instrumentation
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+db_router = DatabaseRouter()
 login_manager = LoginManager()
+user_cache = UserCache()
+login_throttle = LoginThrottle()
+settings_cache = SettingsCache()
+response_cache = ResponseCache()
+fragment_cache = FragmentCache()
+feed_cache = FeedCache()
+response_compression = ResponseCompression()
+image_pipeline = ImagePipeline()
+job_queue = JobQueue()
+dashboard_stats = DashboardStats()
+static_assets = StaticAssets()
+asset_bundles = AssetBundles()
+instrumentation = Instrumentation()
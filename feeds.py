@@ -0,0 +1,317 @@
+"""Sitemap and feeds: ``/sitemap.xml``, ``/feed.xml`` (Atom), ``/rss.xml``.
+
+Documents are kept per worker as serialized bytes, together with their
+compressed copies, and revalidated on each request with one query (the
+newest ``updated_at`` of projects and posts) plus the response cache's
+purge stamps, which every admin handler touches. The ETag and
+Last-Modified headers come from the same values, so feed readers polling
+with ``If-None-Match`` / ``If-Modified-Since`` get 304 without the
+document being built.
+
+The sitemap is stored in sections (static pages, projects, posts) that are
+rebuilt independently, so editing a post does not re-serialize every
+project. Past ``SITEMAP_STREAM_THRESHOLD`` URLs it is not stored at all
+but streamed from a batched query (compressed as it goes), keeping memory
+flat however many posts there are. Feeds hold the newest ``FEED_ITEMS``
+posts and projects and only read the columns they show.
+"""
+import hashlib
+import threading
+from collections import namedtuple
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from xml.sax.saxutils import escape, quoteattr
+
+from flask import current_app, g, request, stream_with_context, url_for
+from sqlalchemy import func, select
+
+import compression
+
+SITEMAP_MIMETYPE = 'application/xml'
+ATOM_MIMETYPE = 'application/atom+xml'
+RSS_MIMETYPE = 'application/rss+xml'
+STREAM_BATCH_SIZE = 1000
+
+SITEMAP_HEAD = (b'<?xml version="1.0" encoding="UTF-8"?>\n'
+                b'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+SITEMAP_TAIL = b'</urlset>\n'
+
+FeedDocument = namedtuple('FeedDocument', 'key body etag encoded')
+
+
+def _utc(value):
+    return value.replace(tzinfo=timezone.utc)
+
+
+def _stamp_time(token):
+    return datetime.fromtimestamp(token[1] / 1e9, tz=timezone.utc)
+
+
+def _w3c(value):
+    return _utc(value).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _url(loc, lastmod=None):
+    lastmod = f'<lastmod>{_w3c(lastmod)}</lastmod>' if lastmod else ''
+    return f'<url><loc>{escape(loc)}</loc>{lastmod}</url>\n'.encode('utf-8')
+
+
+# ===================== QUERIES =====================
+
+def _newest():
+    """Newest updated_at of projects and of posts (one round trip)"""
+    from extensions import db
+    from models import Project, BlogPost
+
+    return tuple(db.session.execute(select(
+        select(func.max(Project.updated_at)).scalar_subquery(),
+        select(func.max(BlogPost.updated_at)).scalar_subquery(),
+    )).one())
+
+
+def _url_count():
+    from extensions import db
+    from models import Project, BlogPost
+
+    return sum(db.session.execute(select(
+        select(func.count(Project.id)).scalar_subquery(),
+        select(func.count(BlogPost.id)).where(BlogPost.published.is_(True)).scalar_subquery(),
+    )).one())
+
+
+def _sitemap_rows(entity, stream=False):
+    """(url, updated_at) for every project or published post"""
+    from extensions import db
+    from models import Project, BlogPost
+
+    if entity == 'project':
+        query = select(Project.id, Project.updated_at).order_by(Project.id)
+        to_url = lambda row: url_for('project_detail', project_id=row[0], _external=True)  # noqa: E731
+    else:
+        query = select(BlogPost.slug, BlogPost.updated_at).where(BlogPost.published.is_(True)).order_by(BlogPost.id)
+        to_url = lambda row: url_for('blog_post', slug=row[0], _external=True)  # noqa: E731
+    if stream:
+        query = query.execution_options(yield_per=STREAM_BATCH_SIZE)
+    for row in db.session.execute(query):
+        yield to_url(row), row[1]
+
+
+def _feed_entries(limit):
+    """Newest `limit` published posts and projects as dicts, newest first"""
+    from extensions import db
+    from models import Project, BlogPost
+
+    posts = db.session.execute(
+        select(BlogPost.slug, BlogPost.title, BlogPost.excerpt, BlogPost.created_at, BlogPost.updated_at)
+        .where(BlogPost.published.is_(True)).order_by(BlogPost.created_at.desc()).limit(limit)
+    ).all()
+    projects = db.session.execute(
+        select(Project.id, Project.title, Project.excerpt, Project.created_at, Project.updated_at)
+        .order_by(Project.created_at.desc()).limit(limit)
+    ).all()
+    entries = [
+        {'title': p.title, 'summary': p.excerpt, 'published': p.created_at, 'updated': p.updated_at or p.created_at,
+         'url': url_for('blog_post', slug=p.slug, _external=True)} for p in posts
+    ] + [
+        {'title': p.title, 'summary': p.excerpt, 'published': p.created_at, 'updated': p.updated_at or p.created_at,
+         'url': url_for('project_detail', project_id=p.id, _external=True)} for p in projects
+    ]
+    entries.sort(key=lambda e: e['published'], reverse=True)
+    return entries[:limit]
+
+
+# ===================== SERIALIZATION =====================
+
+def _static_section():
+    return b''.join(_url(url_for(endpoint, _external=True)) for endpoint in ('index', 'projects', 'blog'))
+
+
+def _atom(settings, entries, updated):
+    self_url = url_for('atom_feed', _external=True)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom">\n',
+        f'<title>{escape(settings.site_title or "")}</title>\n',
+        f'<subtitle>{escape(settings.hero_text or "")}</subtitle>\n',
+        f'<link href={quoteattr(request.url_root)}/>\n',
+        f'<link rel="self" href={quoteattr(self_url)}/>\n',
+        f'<id>{escape(request.url_root)}</id>\n',
+        f'<updated>{_w3c(updated)}</updated>\n',
+        f'<author><name>{escape(settings.owner_name or "")}</name></author>\n',
+    ]
+    for entry in entries:
+        parts.append(
+            f'<entry><title>{escape(entry["title"] or "")}</title>'
+            f'<link href={quoteattr(entry["url"])}/><id>{escape(entry["url"])}</id>'
+            f'<published>{_w3c(entry["published"])}</published><updated>{_w3c(entry["updated"])}</updated>'
+            f'<summary>{escape(entry["summary"] or "")}</summary></entry>\n'
+        )
+    parts.append('</feed>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+def _rss(settings, entries, updated):
+    self_url = url_for('rss_feed', _external=True)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">\n<channel>\n',
+        f'<title>{escape(settings.site_title or "")}</title>\n',
+        f'<link>{escape(request.url_root)}</link>\n',
+        f'<description>{escape(settings.hero_text or "")}</description>\n',
+        f'<atom:link href={quoteattr(self_url)} rel="self" type="{RSS_MIMETYPE}"/>\n',
+        f'<lastBuildDate>{format_datetime(_utc(updated))}</lastBuildDate>\n',
+    ]
+    for entry in entries:
+        parts.append(
+            f'<item><title>{escape(entry["title"] or "")}</title><link>{escape(entry["url"])}</link>'
+            f'<guid isPermaLink="true">{escape(entry["url"])}</guid>'
+            f'<pubDate>{format_datetime(_utc(entry["published"]))}</pubDate>'
+            f'<description>{escape(entry["summary"] or "")}</description></item>\n'
+        )
+    parts.append('</channel>\n</rss>\n')
+    return ''.join(parts).encode('utf-8')
+
+
+# ===================== CACHE =====================
+
+class _FeedState:
+    def __init__(self):
+        self.documents = {}  # name -> FeedDocument
+        self.sections = {}  # (url root, entity) -> (key, bytes)
+        self.lock = threading.Lock()
+
+
+class FeedCache:
+    """Serialized sitemap and feeds, rebuilt when content changes.
+
+    Controlled by ``FEED_ITEMS`` and ``SITEMAP_STREAM_THRESHOLD``.
+    """
+
+    def init_app(self, app):
+        app.extensions['feeds'] = _FeedState()
+
+    def _state(self):
+        return current_app.extensions['feeds']
+
+    def clear(self):
+        state = self._state()
+        with state.lock:
+            state.documents.clear()
+            state.sections.clear()
+
+    @staticmethod
+    def _validators(name, *entities):
+        """(cache key, ETag, Last-Modified) for document `name` showing `entities`"""
+        from extensions import response_cache
+
+        tokens = response_cache.tokens(*entities)
+        newest = _newest()
+        key = (name, request.url_root, tokens, newest)
+        candidates = [_utc(value) for value in newest if value is not None]
+        candidates += [_stamp_time(token) for token in tokens if token is not None]
+        return key, hashlib.sha1(repr(key).encode('utf-8')).hexdigest(), max(candidates, default=None)
+
+    @staticmethod
+    def _finish(response, last_modified):
+        if last_modified is not None:
+            response.last_modified = last_modified
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+    def _not_modified(self, etag, last_modified):
+        response = current_app.response_class(status=304)
+        response.set_etag(compression.matching_etag(etag) or etag)
+        response.vary.add('Accept-Encoding')
+        return self._finish(response, last_modified)
+
+    def _serve(self, name, mimetype, key, etag, last_modified, build):
+        """Stored document `name` if its key matches, otherwise `build()` it"""
+        state = self._state()
+        document = state.documents.get(name)
+        if document is None or document.key != key:
+            document = FeedDocument(key, build(), etag, {})
+            with state.lock:
+                state.documents[name] = document
+        response = compression.cached_response(document.body, mimetype, document.etag, document.encoded)
+        return self._finish(response, last_modified)
+
+    def _section(self, entity, newest):
+        """Sitemap URLs of `entity`, re-serialized only when it changed"""
+        from extensions import response_cache
+
+        state = self._state()
+        cache_key = (request.url_root, entity)
+        key = response_cache.tokens(entity), newest
+        cached = state.sections.get(cache_key)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        body = b''.join(_url(url, updated) for url, updated in _sitemap_rows(entity))
+        with state.lock:
+            state.sections[cache_key] = (key, body)
+        return body
+
+    def sitemap(self):
+        key, etag, last_modified = self._validators('sitemap', 'project', 'post')
+        if compression.matching_etag(etag):
+            return self._not_modified(etag, last_modified)
+
+        state = self._state()
+        document = state.documents.get('sitemap')
+        stored = document is not None and document.key == key
+        if not stored and _url_count() > current_app.config['SITEMAP_STREAM_THRESHOLD']:
+            return self._stream_sitemap(etag, last_modified)
+
+        def build():
+            newest_project, newest_post = key[3]
+            return b''.join((SITEMAP_HEAD, _static_section(), self._section('project', newest_project),
+                             self._section('post', newest_post), SITEMAP_TAIL))
+        return self._serve('sitemap', SITEMAP_MIMETYPE, key, etag, last_modified, build)
+
+    def _stream_sitemap(self, etag, last_modified):
+        # The generator outlives the view; keep its reads on the same replica
+        replica = g.get('db_replica')
+
+        def generate():
+            if replica is not None:
+                g.db_replica = replica
+            yield SITEMAP_HEAD + _static_section()
+            for entity in ('project', 'post'):
+                batch = []
+                for url, updated in _sitemap_rows(entity, stream=True):
+                    batch.append(_url(url, updated))
+                    if len(batch) == STREAM_BATCH_SIZE:
+                        yield b''.join(batch)
+                        batch = []
+                yield b''.join(batch)
+            yield SITEMAP_TAIL
+
+        chunks = generate()
+        # Large enough to be worth compressing by definition
+        encoding = compression.negotiate(SITEMAP_MIMETYPE, current_app.config['COMPRESS_MIN_SIZE'])
+        if encoding:
+            chunks = compression.compress_stream(chunks, encoding)
+        response = current_app.response_class(stream_with_context(chunks), mimetype=SITEMAP_MIMETYPE)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if current_app.config['COMPRESS_RESPONSES']:
+            response.vary.add('Accept-Encoding')
+        response.set_etag(compression.variant_etag(etag, encoding))
+        return self._finish(response, last_modified)
+
+    def _feed(self, name, mimetype, serialize):
+        from extensions import settings_cache
+
+        key, etag, last_modified = self._validators(name, 'project', 'post', 'settings')
+        if compression.matching_etag(etag):
+            return self._not_modified(etag, last_modified)
+
+        def build():
+            entries = _feed_entries(current_app.config['FEED_ITEMS'])
+            return serialize(settings_cache.get(), entries, last_modified or datetime.now(timezone.utc))
+        return self._serve(name, mimetype, key, etag, last_modified, build)
+
+    def atom(self):
+        return self._feed('atom', ATOM_MIMETYPE, _atom)
+
+    def rss(self):
+        return self._feed('rss', RSS_MIMETYPE, _rss)
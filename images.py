@@ -0,0 +1,129 @@
+"""Responsive derivatives for uploaded project images.
+
+After an upload is committed, the admin handler enqueues an
+``images.derivatives`` job with the new ``ProjectImage`` ids. The job
+runner calls ``image_pipeline.process`` for each, which writes resized
+WebP/AVIF copies next to the uploads and records them in
+``ProjectImage.variants``, which templates turn into ``srcset``
+attributes. Until that finishes (or when Pillow is not installed) the
+original file is served as before.
+"""
+import logging
+import os
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional; without it no derivatives are made
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Animated GIFs would lose their animation, so they are left as-is
+SKIPPED_EXTENSIONS = {'gif'}
+
+PIL_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF', 'jpeg': 'JPEG'}
+
+
+def supported_formats(formats):
+    """Filter `formats` down to the ones the installed Pillow can encode"""
+    if Image is None:
+        return []
+    supported = []
+    for fmt in formats:
+        if fmt == 'jpeg':
+            supported.append(fmt)
+            continue
+        try:
+            if features.check(fmt):
+                supported.append(fmt)
+        except ValueError:
+            # Unknown feature name on older Pillow versions
+            pass
+    return supported
+
+
+def generate_derivatives(source_path, output_dir, url_prefix, widths, formats, quality=80):
+    """Write resized copies of `source_path` and describe them.
+
+    Returns a list of ``{'width', 'format', 'path'}`` dicts, smallest first.
+    Widths larger than the original are skipped, but the original width is
+    always included so every format has at least one candidate.
+    """
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    variants = []
+
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA' if 'transparency' in original.info else 'RGB')
+
+        targets = sorted({w for w in widths if w < original.width} | {original.width})
+        for width in targets:
+            height = max(1, round(original.height * width / original.width))
+            resized = original if width == original.width else original.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                image = resized.convert('RGB') if fmt == 'jpeg' and resized.mode == 'RGBA' else resized
+                filename = f'{stem}_{width}w.{fmt}'
+                image.save(os.path.join(output_dir, filename), PIL_FORMATS[fmt], quality=quality)
+                variants.append({'width': width, 'format': fmt, 'path': f'{url_prefix}/{filename}'})
+    return variants
+
+
+class ImagePipeline:
+    """Generates derivatives; called from the job runner and the CLI"""
+
+    def init_app(self, app):
+        app.extensions['image_pipeline'] = {
+            'formats': supported_formats(app.config['IMAGE_DERIVATIVE_FORMATS']),
+        }
+
+    def available(self, app):
+        """Whether the installed Pillow can write any derivative format"""
+        return bool(app.extensions['image_pipeline']['formats'])
+
+    def process(self, app, image_id):
+        """Generate and record derivatives for one ProjectImage"""
+        from extensions import db, response_cache
+        from models import ProjectImage
+        from uploads import upload_url_to_path
+
+        state = app.extensions['image_pipeline']
+        with app.app_context():
+            image = db.session.get(ProjectImage, image_id)
+            if image is None:
+                return
+            extension = image.image_path.rsplit('.', 1)[-1].lower()
+            if extension in SKIPPED_EXTENSIONS:
+                return
+            # Uploads are content-addressed, so a duplicate of an already
+            # processed file can reuse its derivatives
+            processed = ProjectImage.query.filter(
+                ProjectImage.image_path == image.image_path,
+                ProjectImage.id != image.id,
+                ProjectImage.variants.isnot(None),
+            ).all()
+            existing = next((other.variants for other in processed if other.variants), None)
+            if existing:
+                image.variants = existing
+                db.session.commit()
+                response_cache.purge('project')
+                return
+            try:
+                variants = generate_derivatives(
+                    upload_url_to_path(app, image.image_path),
+                    os.path.join(app.config['UPLOAD_FOLDER'], 'derived'),
+                    '/static/uploads/derived',
+                    app.config['IMAGE_DERIVATIVE_WIDTHS'],
+                    state['formats'],
+                    app.config['IMAGE_DERIVATIVE_QUALITY'],
+                )
+            except FileNotFoundError:
+                logger.warning('Upload %s is missing, no derivatives generated', image.image_path)
+                return
+            except Exception:
+                logger.exception('Generating derivatives for %s failed', image.image_path)
+                return
+            image.variants = variants
+            db.session.commit()
+            response_cache.purge('project')
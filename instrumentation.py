@@ -0,0 +1,207 @@
+"""Opt-in per-request timing (``INSTRUMENTATION``).
+
+For every request this records wall time, template render time (Flask's
+template signals) and the number and duration of SQL statements (engine
+cursor events), then
+
+* adds a ``Server-Timing`` header, so the breakdown shows up in the
+  browser's network panel;
+* aggregates it per endpoint for ``/metrics``, in the Prometheus text
+  format. Counters live in each worker process, so with several workers
+  every scrape sees one worker's numbers;
+* when ``PROFILE_SLOW_REQUESTS_MS`` is set, runs each request under
+  cProfile and writes ``.prof`` files for the ones slower than that to
+  ``PROFILE_DIR`` (``python -m pstats <file>`` or snakeviz to read them).
+
+Nothing is registered when ``INSTRUMENTATION`` is off.
+"""
+import cProfile
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from flask import Response, abort, before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RequestStats:
+    __slots__ = ('start', 'sql_count', 'sql_time', 'render_time', 'render_started', 'profiler')
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.render_time = 0.0
+        self.render_started = []
+        self.profiler = None
+
+
+def _current_stats():
+    return g.get('request_stats') if has_request_context() else None
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """Per-endpoint counters and request duration histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.durations = {}
+        self.sql_queries = defaultdict(int)
+        self.sql_seconds = defaultdict(float)
+        self.render_seconds = defaultdict(float)
+
+    def observe(self, endpoint, method, status, duration, stats):
+        with self._lock:
+            self.requests[(endpoint, method, status)] += 1
+            histogram = self.durations.setdefault(endpoint, [0] * len(DURATION_BUCKETS) + [0.0, 0])
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += duration
+            histogram[-1] += 1
+            self.sql_queries[endpoint] += stats.sql_count
+            self.sql_seconds[endpoint] += stats.sql_time
+            self.render_seconds[endpoint] += stats.render_time
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP portfolio_requests_total Requests handled.',
+                '# TYPE portfolio_requests_total counter',
+            ]
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                lines.append(f'portfolio_requests_total{{endpoint="{_label(endpoint)}",method="{method}",'
+                             f'status="{status}"}} {count}')
+
+            lines += [
+                '# HELP portfolio_request_duration_seconds Wall time from before_request to after_request.',
+                '# TYPE portfolio_request_duration_seconds histogram',
+            ]
+            for endpoint, histogram in sorted(self.durations.items()):
+                label = _label(endpoint)
+                for bound, count in zip(DURATION_BUCKETS, histogram):
+                    lines.append(f'portfolio_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} {count}')
+                lines.append(f'portfolio_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {histogram[-1]}')
+                lines.append(f'portfolio_request_duration_seconds_sum{{endpoint="{label}"}} {histogram[-2]:.6f}')
+                lines.append(f'portfolio_request_duration_seconds_count{{endpoint="{label}"}} {histogram[-1]}')
+
+            for name, help_text, values, fmt in (
+                ('portfolio_sql_queries_total', 'SQL statements executed.', self.sql_queries, '{}'),
+                ('portfolio_sql_duration_seconds_total', 'Time spent executing SQL.', self.sql_seconds, '{:.6f}'),
+                ('portfolio_template_render_seconds_total', 'Time spent rendering templates.', self.render_seconds, '{:.6f}'),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                for endpoint, value in sorted(values.items()):
+                    lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {fmt.format(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats() is not None:
+        context._instrumentation_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    start = getattr(context, '_instrumentation_start', None)
+    if stats is not None and start is not None:
+        stats.sql_count += 1
+        stats.sql_time += time.perf_counter() - start
+
+
+def _before_render(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is not None:
+        stats.render_started.append(time.perf_counter())
+
+
+def _rendered(sender, template, context, **extra):
+    stats = _current_stats()
+    if stats is not None and stats.render_started:
+        elapsed = time.perf_counter() - stats.render_started.pop()
+        # Only count the outermost render so nested ones are not added twice
+        if not stats.render_started:
+            stats.render_time += elapsed
+
+
+class Instrumentation:
+    """Request timing, /metrics and slow-request profiling"""
+
+    def init_app(self, app):
+        from extensions import db
+
+        if not app.config.get('INSTRUMENTATION'):
+            return
+
+        metrics = Metrics()
+        threshold = app.config.get('PROFILE_SLOW_REQUESTS_MS') or 0
+        profile_dir = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        if threshold:
+            os.makedirs(profile_dir, exist_ok=True)
+        allowed = {ip.strip() for ip in (app.config.get('METRICS_ALLOWED_IPS') or '').split(',') if ip.strip()}
+        app.extensions['instrumentation'] = metrics
+
+        with app.app_context():
+            engines = list(db.engines.values())
+        # Read replicas (replicas.py) serve the public pages' queries
+        router = app.extensions.get('db_router')
+        if router is not None:
+            engines += router.replicas
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_rendered, app)
+
+        @app.before_request
+        def start_request_timer():
+            stats = g.request_stats = RequestStats()
+            if threshold:
+                profiler = cProfile.Profile()
+                try:
+                    profiler.enable()
+                except ValueError:
+                    # Python 3.12+ allows one active profiler per process;
+                    # another thread is already being profiled
+                    return
+                stats.profiler = profiler
+
+        @app.after_request
+        def record_request(response):
+            stats = g.pop('request_stats', None)
+            if stats is None:
+                return response
+            duration = time.perf_counter() - stats.start
+            if stats.profiler is not None:
+                stats.profiler.disable()
+                if duration * 1000 >= threshold:
+                    self._dump_profile(stats.profiler, profile_dir, duration)
+
+            endpoint = request.endpoint or 'unmatched'
+            metrics.observe(endpoint, request.method, response.status_code, duration, stats)
+            response.headers.add('Server-Timing', ', '.join([
+                f'app;dur={duration * 1000:.1f}',
+                f'db;dur={stats.sql_time * 1000:.1f};desc="{stats.sql_count} queries"',
+                f'render;dur={stats.render_time * 1000:.1f}',
+            ]))
+            return response
+
+        @app.route('/metrics')
+        def metrics_endpoint():
+            if allowed and request.remote_addr not in allowed:
+                abort(404)
+            return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    def _dump_profile(self, profiler, profile_dir, duration):
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', request.path.strip('/')) or 'index'
+        filename = f'{int(time.time() * 1000)}-{name[:80]}-{duration * 1000:.0f}ms.prof'
+        profiler.dump_stats(os.path.join(profile_dir, filename))
@@ -0,0 +1,290 @@
+"""Background jobs persisted in the database.
+
+Admin handlers call ``job_queue.enqueue(name, **payload)`` for side
+effects the response does not have to wait for: image derivatives,
+deleting upload files nothing references any more, and search index
+updates (which purge the cached pages they affect once done). A job is a
+``Job`` row added to the current session, so it is committed, or rolled
+back, together with the change that caused it and survives restarts until
+a worker has run it.
+
+Each serving process starts a dispatcher thread on its first request, so
+Gunicorn workers start their own after forking. The dispatcher claims due
+jobs with a conditional UPDATE (several processes can share the table)
+and runs them on ``JOB_WORKERS`` threads. A commit that enqueued jobs
+wakes it at once; otherwise it polls every ``JOB_POLL_INTERVAL`` seconds.
+Failures are retried with exponential backoff up to ``JOB_MAX_ATTEMPTS``
+times, and jobs left ``running`` by a process that died are requeued after
+``JOB_STALE_AFTER`` seconds. With ``JOB_WORKERS = 0`` nothing runs in the
+web processes and ``flask run-jobs`` drains the queue instead.
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, update
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+# Finished jobs used for the dashboard latency figures
+LATENCY_SAMPLE = 100
+# How often the dispatcher requeues stale jobs and prunes old ones
+MAINTENANCE_INTERVAL = 60
+
+
+def job(name):
+    """Register a job handler, called with the app and the job's payload."""
+    def decorator(fn):
+        HANDLERS[name] = fn
+        return fn
+    return decorator
+
+
+def _wake_after_commit(session):
+    if session.info.pop('jobs_enqueued', False) and has_app_context():
+        state = current_app.extensions.get('job_queue')
+        if state is not None:
+            state['wake'].set()
+
+
+class JobQueue:
+    """Database-backed queue with a per-process dispatcher thread"""
+
+    def init_app(self, app):
+        from extensions import db
+
+        app.extensions['job_queue'] = {
+            'pid': None,
+            'lock': threading.Lock(),
+            'wake': threading.Event(),
+            'last_maintenance': 0,
+        }
+        if not event.contains(db.session, 'after_commit', _wake_after_commit):
+            event.listen(db.session, 'after_commit', _wake_after_commit)
+
+        if app.config['JOB_WORKERS']:
+            @app.before_request
+            def start_job_dispatcher():
+                self.start(app)
+
+    def enqueue(self, name, **payload):
+        """Add a job to the current session; it runs after the session commits"""
+        from extensions import db
+        from models import Job
+
+        if name not in HANDLERS:
+            raise KeyError(f'No job handler registered for {name!r}')
+        job = Job(name=name, payload=payload)
+        db.session.add(job)
+        db.session.info['jobs_enqueued'] = True
+        return job
+
+    # ===================== DISPATCHER =====================
+
+    def start(self, app):
+        """Start this process's dispatcher unless it is already running"""
+        state = app.extensions['job_queue']
+        if state['pid'] == os.getpid():
+            return
+        with state['lock']:
+            if state['pid'] == os.getpid():
+                return
+            workers = app.config['JOB_WORKERS']
+            # Fresh objects: ones inherited through fork belong to the parent's threads
+            state['wake'] = threading.Event()
+            state['slots'] = threading.Semaphore(workers)
+            state['executor'] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='jobs')
+            threading.Thread(target=self._dispatch, args=(app,), name='job-dispatcher', daemon=True).start()
+            state['pid'] = os.getpid()
+
+    def _dispatch(self, app):
+        state = app.extensions['job_queue']
+        while True:
+            try:
+                with app.app_context():
+                    if time.monotonic() - state['last_maintenance'] >= MAINTENANCE_INTERVAL:
+                        self.maintain(app)
+                        state['last_maintenance'] = time.monotonic()
+                    while state['slots'].acquire(blocking=False):
+                        job_id = self.claim()
+                        if job_id is None:
+                            state['slots'].release()
+                            break
+                        state['executor'].submit(self._run_in_pool, app, job_id)
+            except Exception:
+                logger.exception('Job dispatcher failed')
+            state['wake'].wait(app.config['JOB_POLL_INTERVAL'])
+            state['wake'].clear()
+
+    def _run_in_pool(self, app, job_id):
+        state = app.extensions['job_queue']
+        try:
+            with app.app_context():
+                self.execute(app, job_id)
+        finally:
+            state['slots'].release()
+            # A slot is free; pick up whatever is waiting
+            state['wake'].set()
+
+    def claim(self):
+        """Mark the next due job as running and return its id (None if idle)"""
+        from extensions import db
+        from models import Job
+
+        while True:
+            now = datetime.utcnow()
+            job_id = db.session.query(Job.id).filter(Job.status == 'queued', Job.run_at <= now).order_by(
+                Job.run_at, Job.id
+            ).limit(1).scalar()
+            if job_id is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == 'queued').values(
+                    status='running', started_at=now, attempts=Job.attempts + 1
+                )
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return job_id
+            # Another process claimed it first
+
+    def execute(self, app, job_id):
+        """Run a claimed job and record the outcome"""
+        from extensions import db
+        from models import Job
+
+        job = db.session.get(Job, job_id)
+        name, payload = job.name, dict(job.payload or {})
+        error = None
+        try:
+            handler = HANDLERS.get(name)
+            if handler is None:
+                raise LookupError(f'No job handler registered for {name!r}')
+            handler(app, **payload)
+        except Exception as e:
+            logger.exception('Job %s (%s) failed', job_id, name)
+            db.session.rollback()
+            error = f'{type(e).__name__}: {e}'
+
+        job = db.session.get(Job, job_id)
+        now = datetime.utcnow()
+        if error is None:
+            job.status, job.error, job.finished_at = 'done', None, now
+        elif job.attempts >= app.config['JOB_MAX_ATTEMPTS']:
+            job.status, job.error, job.finished_at = 'failed', error, now
+        else:
+            job.status, job.error = 'queued', error
+            job.run_at = now + timedelta(seconds=2 ** job.attempts)
+        db.session.commit()
+        return error is None
+
+    def maintain(self, app):
+        """Requeue jobs orphaned by a dead process and delete old finished ones"""
+        from extensions import db
+        from models import Job
+
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=app.config['JOB_STALE_AFTER'])
+        requeued = db.session.execute(
+            update(Job).where(Job.status == 'running', Job.started_at < stale).values(status='queued', run_at=now)
+        ).rowcount
+        if requeued:
+            logger.warning('Requeued %d stale jobs', requeued)
+        retention = now - timedelta(days=app.config['JOB_RETENTION_DAYS'])
+        Job.query.filter(Job.status == 'done', Job.finished_at < retention).delete(synchronize_session=False)
+        db.session.commit()
+
+    def run_pending(self, app):
+        """Run every due job in this thread; returns (succeeded, failed)"""
+        self.maintain(app)
+        succeeded = failed = 0
+        while (job_id := self.claim()) is not None:
+            if self.execute(app, job_id):
+                succeeded += 1
+            else:
+                failed += 1
+        return succeeded, failed
+
+    # ===================== STATS =====================
+
+    def stats(self):
+        """Queue depth per status and latency of recently finished jobs"""
+        from extensions import db
+        from models import Job
+
+        counts = dict.fromkeys(('queued', 'running', 'done', 'failed'), 0)
+        oldest_queued = None
+        rows = db.session.query(Job.status, func.count(Job.id), func.min(Job.created_at)).group_by(Job.status)
+        for status, count, oldest in rows:
+            counts[status] = count
+            if status == 'queued':
+                oldest_queued = oldest
+
+        recent = db.session.query(Job.created_at, Job.started_at, Job.finished_at).filter(
+            Job.finished_at.isnot(None)
+        ).order_by(Job.finished_at.desc()).limit(LATENCY_SAMPLE).all()
+        waits = [(started - created).total_seconds() for created, started, _ in recent if started and created]
+        runs = [(finished - started).total_seconds() for _, started, finished in recent if started]
+        failures = Job.query.filter(Job.status == 'failed').order_by(Job.finished_at.desc()).limit(5).all()
+
+        return {
+            'counts': counts,
+            'oldest_queued_seconds': (datetime.utcnow() - oldest_queued).total_seconds() if oldest_queued else None,
+            'avg_wait_seconds': sum(waits) / len(waits) if waits else None,
+            'max_wait_seconds': max(waits) if waits else None,
+            'avg_run_seconds': sum(runs) / len(runs) if runs else None,
+            'recent_failures': failures,
+        }
+
+
+# ===================== HANDLERS =====================
+
+@job('images.derivatives')
+def _image_derivatives(app, image_ids):
+    from extensions import image_pipeline, dashboard_stats
+
+    if image_pipeline.available(app):
+        for image_id in image_ids:
+            image_pipeline.process(app, image_id)
+    dashboard_stats.refresh_storage(app)
+
+
+@job('uploads.release')
+def _release_uploads(app, files):
+    """Delete upload files (``[url, variants]`` pairs) nothing references any more"""
+    from extensions import dashboard_stats
+    from uploads import release_upload
+
+    for url, variants in files:
+        release_upload(app, url, variants)
+    dashboard_stats.refresh_storage(app)
+
+
+@job('search.index')
+def _update_search_index(app, kind, item_id):
+    """Bring one project/post in the search index up to date, then purge cached pages"""
+    from extensions import db, response_cache
+    from models import Project, BlogPost
+    import search
+
+    if kind == 'project':
+        project = db.session.get(Project, item_id)
+        if project is None:
+            search.remove_project(item_id)
+        else:
+            search.index_project(project)
+    else:
+        post = db.session.get(BlogPost, item_id)
+        if post is None:
+            search.remove_post(item_id)
+        else:
+            search.index_post(post)
+    db.session.commit()
+    response_cache.purge(kind)
@@ -0,0 +1,121 @@
+"""Versioned schema migrations.
+
+``db.create_all()`` only creates missing tables; it never alters existing
+ones. Changes to existing tables are registered here with ``@migration``
+and applied once, in version order, by ``run_migrations()``. Applied
+versions are recorded in the ``schema_migration`` table.
+
+Migrations must be idempotent: on a fresh database ``create_all()`` has
+already built the latest schema, so e.g. adding a column should be a
+no-op when the column is present.
+"""
+from sqlalchemy import inspect, text
+
+import content
+from extensions import db
+import search
+import stats
+from models import SchemaMigration, Experience, ProjectImage, Project, BlogPost, Tool
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Register a migration function taking a SQLAlchemy connection."""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return decorator
+
+
+def add_column(conn, column):
+    """Add a model column to its table if it does not exist yet"""
+    table = column.table.name
+    existing = [c['name'] for c in inspect(conn).get_columns(table)]
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column.name} {column_type}'))
+
+
+def create_indexes(conn, model):
+    """Create the indexes declared on a model that do not exist yet"""
+    for index in model.__table__.indexes:
+        index.create(conn, checkfirst=True)
+
+
+def pending_migrations():
+    """Return registered migrations that have not been applied yet"""
+    applied = {row.version for row in db.session.query(SchemaMigration.version)}
+    return [m for m in sorted(MIGRATIONS, key=lambda m: m[0]) if m[0] not in applied]
+
+
+def run_migrations():
+    """Apply all pending migrations, each in its own transaction.
+
+    Returns the list of applied versions.
+    """
+    applied = []
+    for version, description, upgrade in pending_migrations():
+        upgrade(db.session.connection())
+        db.session.add(SchemaMigration(version=version, description=description))
+        db.session.commit()
+        applied.append(version)
+    return applied
+
+
+# ===================== MIGRATIONS =====================
+
+@migration(1, 'Add experience.certificate_image_path')
+def _experience_certificate_image(conn):
+    add_column(conn, Experience.__table__.c.certificate_image_path)
+
+
+@migration(2, 'Add project_image.variants')
+def _project_image_variants(conn):
+    add_column(conn, ProjectImage.__table__.c.variants)
+
+
+@migration(3, 'Create full-text search index (SQLite FTS5)')
+def _search_index(conn):
+    search.create_index(conn)
+
+
+@migration(4, 'Add composite indexes for keyset pagination')
+def _keyset_indexes(conn):
+    for model in (Project, BlogPost, Experience, Tool):
+        create_indexes(conn, model)
+
+
+@migration(5, 'Add pre-rendered HTML, excerpt and reading time columns')
+def _rendered_content(conn):
+    for column in (Project.__table__.c.description_html, Project.__table__.c.excerpt,
+                   BlogPost.__table__.c.content_html, BlogPost.__table__.c.excerpt,
+                   BlogPost.__table__.c.reading_time):
+        add_column(conn, column)
+
+    rows = conn.execute(text('SELECT id, description FROM project WHERE description_html IS NULL')).all()
+    for row in rows:
+        rendered = content.render(row.description, Project.EXCERPT_LENGTH)
+        conn.execute(text('UPDATE project SET description_html = :html, excerpt = :excerpt WHERE id = :id'),
+                     {'html': rendered.html, 'excerpt': rendered.excerpt, 'id': row.id})
+
+    rows = conn.execute(text('SELECT id, content FROM blog_post WHERE content_html IS NULL')).all()
+    for row in rows:
+        rendered = content.render(row.content, BlogPost.EXCERPT_LENGTH)
+        conn.execute(text('UPDATE blog_post SET content_html = :html, excerpt = :excerpt, '
+                          'reading_time = :reading_time WHERE id = :id'),
+                     {'html': rendered.html, 'excerpt': rendered.excerpt,
+                      'reading_time': rendered.reading_time, 'id': row.id})
+
+
+@migration(6, 'Fill dashboard counters')
+def _dashboard_counters(conn):
+    # upload_bytes starts at 0 and is measured by the next stats.storage job
+    stats.recount(conn)
+
+
+@migration(7, 'Add updated_at indexes for API ETags')
+def _updated_at_indexes(conn):
+    for model in (Project, BlogPost):
+        create_indexes(conn, model)
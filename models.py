@@ -1,8 +1,14 @@
+import re
+
 from extensions import db
 from datetime import datetime
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import defer, load_only
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import UserMixin
 
+import content
+
 
 class User(db.Model, UserMixin):
     """Admin User Model"""
@@ -17,6 +23,38 @@ class User(db.Model, UserMixin):
         return check_password_hash(self.password_hash, password)
 
 
+class SchemaMigration(db.Model):
+    """Applied schema migration versions (see migrations.py)"""
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(255))
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class Job(db.Model):
+    """Background job (see jobs.py)"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, default=dict)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow)  # not before (retry backoff)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run_at_id', 'status', 'run_at', 'id'),
+    )
+
+
+class Stat(db.Model):
+    """Maintained dashboard counter (see stats.py)"""
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class SiteSettings(db.Model):
     """Site Settings - Singleton for portfolio metadata"""
     id = db.Column(db.Integer, primary_key=True)
@@ -43,9 +81,14 @@ class SiteSettings(db.Model):
 
 class Project(db.Model):
     """Project Model"""
+    EXCERPT_LENGTH = 100
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
+    # Derived from description by set_description() when the project is saved
+    description_html = db.Column(db.Text)
+    excerpt = db.Column(db.String(300))
     category = db.Column(db.String(100))
     live_link = db.Column(db.String(255))
     repo_link = db.Column(db.String(255))
@@ -54,9 +97,22 @@ class Project(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    __table_args__ = (
+        db.Index('ix_project_created_at_id', 'created_at', 'id'),
+        # MAX(updated_at) for API ETags
+        db.Index('ix_project_updated_at', 'updated_at'),
+    )
+    
     # Relationships
     images = db.relationship('ProjectImage', backref='project', lazy=True, cascade='all, delete-orphan')
     blog_posts = db.relationship('BlogPost', backref='related_project', lazy=True)
+    
+    def set_description(self, source):
+        """Store the Markdown source with its sanitized HTML and excerpt"""
+        rendered = content.render(source, self.EXCERPT_LENGTH)
+        self.description = source
+        self.description_html = rendered.html
+        self.excerpt = rendered.excerpt
 
 
 class ProjectImage(db.Model):
@@ -66,27 +122,92 @@ class ProjectImage(db.Model):
     image_path = db.Column(db.String(255), nullable=False)
     alt_text = db.Column(db.String(255))
     order = db.Column(db.Integer, default=0)
+    # Resized copies: [{"width": 640, "format": "webp", "path": "/static/uploads/derived/..."}]
+    variants = db.Column(db.JSON, default=list)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def srcset(self, fmt):
+        """srcset attribute value for the derivatives in one format"""
+        return ', '.join(f"{v['path']} {v['width']}w" for v in self.variants or [] if v['format'] == fmt)
+    
+    def variant_formats(self):
+        """Derivative formats available for this image, best first"""
+        formats = {v['format'] for v in self.variants or []}
+        return [fmt for fmt in ('avif', 'webp', 'jpeg') if fmt in formats]
 
 
 class BlogPost(db.Model):
     """Blog Post Model"""
+    EXCERPT_LENGTH = 200
+    
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     slug = db.Column(db.String(255), unique=True)
     content = db.Column(db.Text)
+    # Derived from content by set_content() when the post is saved
+    content_html = db.Column(db.Text)
+    excerpt = db.Column(db.String(300))
+    reading_time = db.Column(db.Integer)  # minutes
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'), nullable=True)
     published = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    def generate_slug(self):
-        """Generate URL-friendly slug from title"""
-        import re
-        slug = self.title.lower()
+    __table_args__ = (
+        db.Index('ix_blog_post_created_at_id', 'created_at', 'id'),
+        db.Index('ix_blog_post_published_created_at_id', 'published', 'created_at', 'id'),
+        db.Index('ix_blog_post_updated_at', 'updated_at'),
+    )
+    
+    # Bases looked up per query in unique_slugs()
+    SLUG_LOOKUP_CHUNK = 200
+    
+    @staticmethod
+    def slugify(title):
+        """URL-friendly slug for a title"""
+        slug = (title or '').lower()
         slug = re.sub(r'[^\w\s-]', '', slug)
         slug = re.sub(r'[-\s]+', '-', slug)
         return slug.strip('-')
+    
+    def generate_slug(self):
+        """Generate URL-friendly slug from title"""
+        return self.slugify(self.title)
+    
+    @classmethod
+    def unique_slugs(cls, bases):
+        """Return a free slug for each base, in order.
+        
+        Taken bases get the first free ``-1``, ``-2``... suffix, and
+        duplicates within `bases` are numbered too. Existing slugs are
+        fetched with one query per SLUG_LOOKUP_CHUNK distinct bases: the
+        base itself or anything in the ``base-`` range (``'.'`` sorts right
+        after ``'-'``), so the unique slug index is used.
+        """
+        distinct = list(dict.fromkeys(bases))
+        taken = set()
+        for start in range(0, len(distinct), cls.SLUG_LOOKUP_CHUNK):
+            chunk = distinct[start:start + cls.SLUG_LOOKUP_CHUNK]
+            ranges = [and_(cls.slug > f'{base}-', cls.slug < f'{base}.') for base in chunk]
+            taken.update(slug for (slug,) in db.session.query(cls.slug).filter(or_(cls.slug.in_(chunk), *ranges)))
+        
+        slugs = []
+        for base in bases:
+            slug, counter = base, 1
+            while slug in taken:
+                slug = f'{base}-{counter}'
+                counter += 1
+            taken.add(slug)
+            slugs.append(slug)
+        return slugs
+    
+    def set_content(self, source):
+        """Store the Markdown source with its sanitized HTML, excerpt and reading time"""
+        rendered = content.render(source, self.EXCERPT_LENGTH)
+        self.content = source
+        self.content_html = rendered.html
+        self.excerpt = rendered.excerpt
+        self.reading_time = rendered.reading_time
 
 
 class Experience(db.Model):
@@ -103,6 +224,10 @@ class Experience(db.Model):
     certificate_image_path = db.Column(db.String(255))
     order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_experience_start_date_id', 'start_date', 'id'),
+    )
 
 
 class Tool(db.Model):
@@ -114,3 +239,17 @@ class Tool(db.Model):
     proficiency = db.Column(db.String(64))
     order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_tool_order_name_id', 'order', 'name', 'id'),
+    )
+
+
+# Loader options for pages that list rows. Lists only show the stored
+# excerpt, so the Markdown source and rendered HTML (which can be hundreds
+# of KB per row) are left in the database.
+PROJECT_LIST_DEFERRED = (defer(Project.description), defer(Project.description_html))
+POST_LIST_DEFERRED = (defer(BlogPost.content), defer(BlogPost.content_html))
+# Related rows shown as a link only
+PROJECT_LINK_COLUMNS = load_only(Project.id, Project.title)
+POST_LINK_COLUMNS = load_only(BlogPost.id, BlogPost.title, BlogPost.slug, BlogPost.project_id, BlogPost.published)
@@ -0,0 +1,160 @@
+"""Keyset (cursor) pagination.
+
+``.paginate()`` issues ``OFFSET n`` plus a ``COUNT(*)``, so deep pages get
+slower as tables grow. ``keyset_paginate()`` instead filters on the sort
+key of the last row seen (``WHERE (created_at, id) < (:ts, :id)``) and
+uses a supporting index, so every page costs the same. The price is that
+there are no page numbers, only previous/next links carrying an opaque
+cursor.
+
+A sort key is a list of ``Key`` entries; the last one must be unique
+(normally the primary key) so the order is total.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_
+
+Key = namedtuple('Key', 'column descending nulls_last')
+Key.__new__.__defaults__ = (False, False)
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 'dt' in value:
+            return datetime.fromisoformat(value['dt'])
+        if 'd' in value:
+            return date.fromisoformat(value['d'])
+    return value
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return f"{direction}.{base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')}"
+
+
+def _valid(key, value):
+    """Whether a decoded cursor value fits the key column's type"""
+    column = key.column.expression
+    if value is None:
+        return column.nullable
+    expected = column.type.python_type
+    if expected in (datetime, date):
+        return type(value) is expected
+    if expected is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def decode_cursor(cursor, keys):
+    """Return (direction, values) or None for a missing/malformed cursor"""
+    try:
+        direction, payload = cursor.split('.', 1)
+        payload += '=' * (-len(payload) % 4)
+        values = [_decode_value(v) for v in json.loads(base64.urlsafe_b64decode(payload))]
+    except (AttributeError, ValueError, TypeError):
+        return None
+    if direction not in ('n', 'p') or len(values) != len(keys):
+        return None
+    if not all(_valid(key, value) for key, value in zip(keys, values)):
+        return None
+    return direction, values
+
+
+def _equal(key, value):
+    return key.column.is_(None) if value is None else key.column == value
+
+
+def _after(key, value, reverse):
+    """Condition for rows strictly after `value` in this key's order"""
+    descending = key.descending != reverse
+    # With NULLS LAST, NULL sorts after every value (NULLS FIRST when reversed)
+    nulls_after = key.nulls_last != reverse
+    if value is None:
+        return None if nulls_after else key.column.isnot(None)
+    condition = key.column < value if descending else key.column > value
+    if key.nulls_last and nulls_after:
+        condition = or_(condition, key.column.is_(None))
+    return condition
+
+
+def _order_by(keys, reverse):
+    clauses = []
+    for key in keys:
+        descending = key.descending != reverse
+        clause = key.column.desc() if descending else key.column.asc()
+        if key.nulls_last:
+            clause = clause.nulls_first() if reverse else clause.nulls_last()
+        clauses.append(clause)
+    return clauses
+
+
+def _seek(keys, values, reverse):
+    """Lexicographic "row after values" condition over the keys"""
+    alternatives = []
+    for i, key in enumerate(keys):
+        after = _after(key, values[i], reverse)
+        if after is None:
+            continue
+        alternatives.append(and_(*[_equal(keys[j], values[j]) for j in range(i)], after))
+    return or_(*alternatives)
+
+
+class KeysetPage:
+    """One page of results plus cursors for the neighbouring pages.
+
+    Exposes ``items``, ``has_next`` and ``has_prev`` like Flask-SQLAlchemy's
+    Pagination so list templates only need to swap their page links.
+    """
+    is_keyset = True
+
+    def __init__(self, items, keys, has_next, has_prev):
+        self.items = items
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self._keys = keys
+
+    def _values(self, item):
+        return [getattr(item, key.column.key) for key in self._keys]
+
+    @property
+    def next_cursor(self):
+        if not self.has_next or not self.items:
+            return None
+        return encode_cursor('n', self._values(self.items[-1]))
+
+    @property
+    def prev_cursor(self):
+        if not self.has_prev or not self.items:
+            return None
+        return encode_cursor('p', self._values(self.items[0]))
+
+
+def keyset_paginate(query, keys, per_page, cursor=None):
+    """Return a KeysetPage of `query` ordered by `keys`, starting at `cursor`"""
+    decoded = decode_cursor(cursor, keys) if cursor else None
+    query = query.order_by(None)
+
+    if decoded is None:
+        rows = query.order_by(*_order_by(keys, False)).limit(per_page + 1).all()
+        return KeysetPage(rows[:per_page], keys, has_next=len(rows) > per_page, has_prev=False)
+
+    direction, values = decoded
+    reverse = direction == 'p'
+    rows = query.filter(_seek(keys, values, reverse)).order_by(*_order_by(keys, reverse)).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+        return KeysetPage(rows, keys, has_next=True, has_prev=more)
+    return KeysetPage(rows, keys, has_next=more, has_prev=True)
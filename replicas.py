@@ -0,0 +1,233 @@
+"""Read/write routing between the primary database and read replicas.
+
+``DATABASE_REPLICA_URLS`` lists replicas of ``SQLALCHEMY_DATABASE_URI``
+(comma-separated; e.g. PostgreSQL streaming replicas, or for local testing
+SQLite copies kept current with ``flask sync-replicas``). Views decorated
+with ``@db_router.replica_reads`` run their SELECTs on one replica, picked
+at random per request among the healthy ones. Everything else goes to the
+primary: other views, background jobs, any statement that writes, and any
+read in a transaction that has already written.
+
+Replicas lag, so after a request or background job commits
+
+* the requesting client's session cookie carries a deadline
+  ``REPLICA_STICKY_SECONDS`` ahead, until which its reads stay on the
+  primary (an admin sees their own edit on the next page, whichever
+  worker or host serves it);
+* a ``FileStamp`` is touched and every worker on the host reads from the
+  primary for the same period, so the page and settings caches that were
+  just purged are not refilled from a replica that has not caught up.
+
+Only commits that changed rows count, so an UPDATE matching nothing does
+not move reads to the primary; neither do changes to tables listed in
+``UNTRACKED_TABLES``, which no replica-routed page reads (the job queue
+updates its own rows every minute in every process).
+
+A replica whose connection or query fails is skipped for
+``REPLICA_RETRY_SECONDS`` and the request is run again on the primary.
+"""
+import logging
+import os
+import random
+import sqlite3
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+
+from cache import FileStamp
+
+logger = logging.getLogger(__name__)
+
+STICKY_SESSION_KEY = '_db_primary_until'
+# Tables whose changes do not move reads to the primary
+UNTRACKED_TABLES = frozenset({'job'})
+
+
+class RoutingSession(Session):
+    """``db.session`` class sending reads to the request's replica, if any"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        primary = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None:
+            return primary
+        if self._flushing or (clause is not None and not getattr(clause, 'is_select', False)):
+            # Later reads in this transaction must see what it writes
+            self.info['primary'] = True
+            return primary
+        if self.info.get('primary') or not has_request_context():
+            return primary
+        return g.get('db_replica') or primary
+
+
+def _after_flush(db_session, flush_context):
+    # Still the pre-flush collections and attribute history here
+    for instance in (*db_session.new, *db_session.deleted, *db_session.dirty):
+        if instance.__table__.name in UNTRACKED_TABLES:
+            continue
+        if instance in db_session.dirty and not db_session.is_modified(instance):
+            continue
+        db_session.info['changed'] = True
+        return
+
+
+def _on_execute(orm_execute_state):
+    """Note bulk UPDATE/DELETE/INSERT statements that changed rows"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return None
+    result = orm_execute_state.invoke_statement()
+    table = getattr(orm_execute_state.statement, 'table', None)
+    # ORM bulk INSERT/UPDATE by primary key return results without a
+    # rowcount, and drivers report -1 when they do not know; both count
+    if getattr(result, 'rowcount', -1) != 0 and getattr(table, 'name', None) not in UNTRACKED_TABLES:
+        orm_execute_state.session.info['changed'] = True
+    return result
+
+
+def _after_commit(db_session):
+    db_session.info.pop('primary', None)
+    # Background jobs purge page caches too, so their commits move every
+    # worker to the primary like a request's do
+    if db_session.info.pop('changed', False) and has_app_context():
+        state = current_app.extensions.get('db_router')
+        if state is not None and state.replicas:
+            state.stamp.touch()
+            if has_request_context():
+                g.db_replica = None
+                g.db_committed = True
+
+
+def _after_rollback(db_session):
+    db_session.info.pop('primary', None)
+    db_session.info.pop('changed', None)
+
+
+def _replica_url(app, url):
+    """`url` with a relative SQLite path resolved like Flask-SQLAlchemy does"""
+    url = make_url(url)
+    if url.drivername.startswith('sqlite') and url.database not in (None, '', ':memory:') \
+            and not url.database.startswith('file:') and not os.path.isabs(url.database):
+        url = url.set(database=os.path.join(app.instance_path, url.database))
+    return url
+
+
+class _RouterState:
+    def __init__(self, replicas, stamp, sticky, retry):
+        self.replicas = replicas
+        self.stamp = stamp
+        self.sticky = sticky
+        self.retry = retry
+        self.down_until = {}  # engine -> time.monotonic() it may be tried again
+
+
+class DatabaseRouter:
+    """Replica engines and the per-request choice between them"""
+
+    def init_app(self, app):
+        from extensions import db
+        from database import _sqlite_pragmas
+
+        urls = [u.strip() for u in (app.config['DATABASE_REPLICA_URLS'] or '').split(',') if u.strip()]
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}, pool_pre_ping=True)
+        replicas = []
+        for url in urls:
+            engine = create_engine(_replica_url(app, url), **options)
+            if engine.dialect.name == 'sqlite':
+                # Journal mode belongs to whoever maintains the copy
+                event.listen(engine, 'connect', _sqlite_pragmas(None, app.config['SQLITE_BUSY_TIMEOUT']))
+            replicas.append(engine)
+
+        os.makedirs(app.instance_path, exist_ok=True)
+        app.extensions['db_router'] = _RouterState(
+            replicas, FileStamp(os.path.join(app.instance_path, 'db_write.stamp')),
+            app.config['REPLICA_STICKY_SECONDS'], app.config['REPLICA_RETRY_SECONDS'],
+        )
+        if not event.contains(db.session, 'after_commit', _after_commit):
+            event.listen(db.session, 'after_commit', _after_commit)
+            event.listen(db.session, 'after_rollback', _after_rollback)
+            event.listen(db.session, 'after_flush', _after_flush)
+            event.listen(db.session, 'do_orm_execute', _on_execute)
+
+        if replicas:
+            @app.after_request
+            def stick_to_primary(response):
+                if g.pop('db_committed', False):
+                    session[STICKY_SESSION_KEY] = time.time() + app.config['REPLICA_STICKY_SECONDS']
+                return response
+
+    def _state(self):
+        return current_app.extensions['db_router']
+
+    def choose(self):
+        """Replica for this request's reads, or None to use the primary"""
+        state = self._state()
+        if not state.replicas:
+            return None
+        now = time.time()
+        if session.get(STICKY_SESSION_KEY, 0) > now:
+            return None
+        written = state.stamp.read()
+        if written is not None and now - written[1] / 1e9 < state.sticky:
+            return None
+        healthy = [e for e in state.replicas if state.down_until.get(e, 0) <= time.monotonic()]
+        return random.choice(healthy) if healthy else None
+
+    def mark_down(self, engine, error):
+        state = self._state()
+        logger.warning('Replica %s failed, using the primary for %ds: %s',
+                       engine.url.render_as_string(hide_password=True), state.retry, error)
+        state.down_until[engine] = time.monotonic() + state.retry
+        engine.dispose()
+
+    def replica_reads(self, view):
+        """Decorator: run a read-only view's queries on a replica"""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from extensions import db
+
+            engine = self.choose()
+            if engine is None:
+                return view(*args, **kwargs)
+            g.db_replica = engine
+            try:
+                return view(*args, **kwargs)
+            except DBAPIError as error:
+                if g.get('db_replica') is not engine or db.session.info.get('primary'):
+                    raise
+                self.mark_down(engine, error)
+                db.session.rollback()
+                g.db_replica = None
+                return view(*args, **kwargs)
+            finally:
+                g.pop('db_replica', None)
+        return wrapper
+
+    def sync(self, app):
+        """Copy a SQLite primary over every SQLite replica (local testing).
+
+        Returns the paths written.
+        """
+        from extensions import db
+
+        with app.app_context():
+            primary = db.engine.url.database
+            if db.engine.dialect.name != 'sqlite' or primary in (None, '', ':memory:'):
+                raise ValueError('sync needs a file-based SQLite primary')
+            written = []
+            for engine in self._state().replicas:
+                if engine.dialect.name != 'sqlite':
+                    continue
+                engine.dispose()
+                source = sqlite3.connect(primary)
+                target = sqlite3.connect(engine.url.database)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                    source.close()
+                written.append(engine.url.database)
+            return written
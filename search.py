@@ -0,0 +1,209 @@
+"""Full-text search over projects and published blog posts.
+
+On SQLite the text lives in an FTS5 table, ``search_index`` (created by
+migration 3). Admin handlers commit their change and enqueue a
+``search.index`` job (jobs.py), which calls ``index_project`` /
+``index_post`` / ``remove_*`` in its own transaction and then purges the
+cached pages, so for a moment after a save searches still see the old
+text. Bulk imports call ``index_new`` in the import's transaction.
+Results are ranked with BM25 and come with highlighted snippets.
+
+Other databases, or SQLite builds without FTS5, fall back to a ``LIKE``
+scan over the model tables.
+"""
+import re
+import weakref
+from collections import namedtuple
+
+from markupsafe import Markup, escape
+from sqlalchemy import text, or_, inspect
+from sqlalchemy.exc import OperationalError
+
+from extensions import db
+from models import Project, BlogPost, PROJECT_LIST_DEFERRED, POST_LIST_DEFERRED
+
+SearchResult = namedtuple('SearchResult', 'kind id slug title snippet category')
+
+# Private-use markers around matches; the snippet is escaped and the
+# markers are then turned into <mark> tags.
+MARK_OPEN, MARK_CLOSE = '\ue000', '\ue001'
+SNIPPET_TOKENS = 24
+
+CREATE_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "kind UNINDEXED, item_id UNINDEXED, slug UNINDEXED, "
+    "title, body, category, tokenize='porter unicode61')"
+)
+
+TAG_RE = re.compile(r'<[^>]+>')
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def plain_text(html):
+    """Strip tags so markup is not indexed"""
+    return Markup(TAG_RE.sub(' ', html or '')).unescape()
+
+
+# Engine -> whether the FTS table exists, so the check is done once
+_fts_tables = weakref.WeakKeyDictionary()
+
+
+def fts_available(conn=None):
+    conn = conn or db.session.connection()
+    if conn.dialect.name != 'sqlite':
+        return False
+    available = _fts_tables.get(conn.engine)
+    if available is None:
+        available = _fts_tables[conn.engine] = inspect(conn).has_table('search_index')
+    return available
+
+
+def create_index(conn):
+    """Create and fill the FTS table; returns False if FTS5 is unavailable"""
+    if conn.dialect.name != 'sqlite':
+        return False
+    try:
+        conn.execute(text(CREATE_TABLE_SQL))
+    except OperationalError:
+        # SQLite compiled without FTS5
+        return False
+    _fts_tables[conn.engine] = True
+    rebuild(conn)
+    return True
+
+
+INSERT_SQL = text("INSERT INTO search_index (kind, item_id, slug, title, body, category) "
+                  "VALUES (:kind, :item_id, :slug, :title, :body, :category)")
+
+
+def _entry(kind, item_id, slug, title, body, category):
+    return {'kind': kind, 'item_id': item_id, 'slug': slug, 'title': title or '',
+            'body': plain_text(body), 'category': category or ''}
+
+
+def _insert(conn, kind, item_id, slug, title, body, category):
+    conn.execute(INSERT_SQL, _entry(kind, item_id, slug, title, body, category))
+
+
+def _delete(conn, kind, item_id):
+    conn.execute(text("DELETE FROM search_index WHERE kind = :kind AND item_id = :item_id"),
+                 {'kind': kind, 'item_id': item_id})
+
+
+def rebuild(conn=None):
+    """Re-index every project and published post"""
+    conn = conn or db.session.connection()
+    conn.execute(text("DELETE FROM search_index"))
+    for row in conn.execute(text("SELECT id, title, description, category FROM project")):
+        _insert(conn, 'project', row.id, None, row.title, row.description, row.category)
+    for row in conn.execute(text("SELECT id, slug, title, content FROM blog_post WHERE published")):
+        _insert(conn, 'post', row.id, row.slug, row.title, row.content, None)
+
+
+def index_project(project):
+    """Add or refresh a project in the index; the caller commits"""
+    conn = db.session.connection()
+    if not fts_available(conn):
+        return
+    _delete(conn, 'project', project.id)
+    _insert(conn, 'project', project.id, None, project.title, project.description, project.category)
+
+
+def index_post(post):
+    """Add or refresh a post; drafts are removed from the index"""
+    conn = db.session.connection()
+    if not fts_available(conn):
+        return
+    _delete(conn, 'post', post.id)
+    if post.published:
+        _insert(conn, 'post', post.id, post.slug, post.title, post.content, None)
+
+
+def index_new(projects=(), posts=()):
+    """Add rows that are not indexed yet in one executemany (bulk import).
+    
+    Skips the per-row DELETE of index_project()/index_post(), which scans
+    the whole FTS table since ``item_id`` is not indexed.
+    """
+    conn = db.session.connection()
+    if not fts_available(conn):
+        return
+    entries = [_entry('project', p.id, None, p.title, p.description, p.category) for p in projects]
+    entries += [_entry('post', p.id, p.slug, p.title, p.content, None) for p in posts if p.published]
+    if entries:
+        conn.execute(INSERT_SQL, entries)
+
+
+def remove_project(project_id):
+    conn = db.session.connection()
+    if fts_available(conn):
+        _delete(conn, 'project', project_id)
+
+
+def remove_post(post_id):
+    conn = db.session.connection()
+    if fts_available(conn):
+        _delete(conn, 'post', post_id)
+
+
+def match_expression(query):
+    """Turn free text into a safe FTS5 query: every word must match, the
+    last one as a prefix so results show up while typing."""
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlight(value):
+    value = str(escape(value or ''))
+    return Markup(value.replace(MARK_OPEN, '<mark>').replace(MARK_CLOSE, '</mark>'))
+
+
+def _fts_search(expression, limit, offset):
+    rows = db.session.execute(text(
+        "SELECT kind, item_id, slug, category, "
+        f"highlight(search_index, 3, '{MARK_OPEN}', '{MARK_CLOSE}') AS title, "
+        f"snippet(search_index, 4, '{MARK_OPEN}', '{MARK_CLOSE}', '…', {SNIPPET_TOKENS}) AS snippet "
+        "FROM search_index WHERE search_index MATCH :expression "
+        "ORDER BY bm25(search_index, 0.0, 0.0, 0.0, 10.0, 1.0, 4.0) "
+        "LIMIT :limit OFFSET :offset"
+    ), {'expression': expression, 'limit': limit, 'offset': offset})
+    return [
+        SearchResult(row.kind, row.item_id, row.slug, _highlight(row.title),
+                     _highlight(row.snippet), row.category or None)
+        for row in rows
+    ]
+
+
+def _like_search(words, limit, offset):
+    """Fallback without FTS5: unranked substring match, projects first"""
+    def matches(*columns):
+        return [or_(*(column.ilike(f'%{word}%') for column in columns)) for word in words]
+
+    projects = Project.query.options(*PROJECT_LIST_DEFERRED).filter(
+        *matches(Project.title, Project.description, Project.category)
+    ).order_by(Project.created_at.desc()).all()
+    posts = BlogPost.query.options(*POST_LIST_DEFERRED).filter(
+        BlogPost.published.is_(True), *matches(BlogPost.title, BlogPost.content)
+    ).order_by(BlogPost.created_at.desc()).all()
+    results = [
+        SearchResult('project', p.id, None, escape(p.title), escape(p.excerpt or ''), p.category)
+        for p in projects
+    ] + [
+        SearchResult('post', p.id, p.slug, escape(p.title), escape(p.excerpt or ''), None)
+        for p in posts
+    ]
+    return results[offset:offset + limit]
+
+
+def search(query, limit=20, offset=0):
+    """Return ranked SearchResults for a free-text query"""
+    expression = match_expression(query or '')
+    if expression is None:
+        return []
+    if fts_available():
+        return _fts_search(expression, limit, offset)
+    return _like_search(WORD_RE.findall(query), limit, offset)
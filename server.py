@@ -0,0 +1,63 @@
+"""Production server launcher used by ``flask serve``.
+
+Runs the app under Gunicorn with threaded (``gthread``) workers: one
+process per worker for CPU-bound rendering, several threads per process
+so requests waiting on SQLite or disk do not hold up the others. The app
+is loaded once in the master before forking (``preload_app``), so the
+database is initialized a single time and workers share its memory
+copy-on-write; each worker then drops the pooled connections it inherited.
+
+Gunicorn does not run on Windows, where Waitress (one process, many
+threads) is used instead.
+"""
+import os
+
+from database import dispose_engines
+
+
+def default_workers():
+    """One worker per CPU; threads cover waiting on I/O"""
+    return os.cpu_count() or 1
+
+
+def gunicorn_options(app, bind, workers, threads, timeout):
+    def post_fork(server, worker):
+        dispose_engines(app)
+
+    return {
+        'bind': bind,
+        'workers': workers,
+        'worker_class': 'gthread',
+        'threads': threads,
+        'timeout': timeout,
+        'preload_app': True,
+        'post_fork': post_fork,
+    }
+
+
+def run(app, bind, workers, threads, timeout=30):
+    """Serve `app` until interrupted"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+
+    if BaseApplication is not None:
+        class Server(BaseApplication):
+            def load_config(self):
+                for key, value in gunicorn_options(app, bind, workers, threads, timeout).items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return app
+
+        Server().run()
+        return
+
+    try:
+        import waitress
+    except ImportError:
+        raise RuntimeError('No production server installed; pip install gunicorn (or waitress on Windows)')
+    if workers > 1:
+        app.logger.warning('Waitress runs a single process; ignoring workers=%d', workers)
+    waitress.serve(app, listen=bind, threads=threads)
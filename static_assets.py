@@ -0,0 +1,159 @@
+"""Fingerprinted, precompressed static files.
+
+At startup every file in the static folder (except uploads) is hashed and
+``url_for('static', filename=...)`` automatically gains a ``v=<hash>``
+argument, so templates keep using plain ``url_for`` while the URL changes
+whenever the file does. Versioned URLs, and content-addressed uploads, are
+served with ``Cache-Control: immutable`` for a year; everything else is
+revalidated as before.
+
+Text assets get ``.gz`` (and ``.br`` when the ``brotli`` package is
+installed) siblings, written by ``flask build-static`` or at startup when
+``STATIC_PRECOMPRESS`` is enabled, and served when ``Accept-Encoding``
+allows it.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import current_app, request, send_file
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; only gzip siblings are written
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.xml'}
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Uploads and their derivatives are named after their SHA-256 digest
+CONTENT_ADDRESSED_RE = re.compile(r'^uploads/(derived/)?[0-9a-f]{64}[._]')
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _walk_assets(static_folder, upload_folder):
+    """Yield (relative path, absolute path) for fingerprinted assets"""
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        if os.path.commonpath([os.path.abspath(dirpath), upload_folder]) == upload_folder:
+            dirnames[:] = []
+            continue
+        for name in filenames:
+            if name.endswith(('.gz', '.br', '.tmp')):
+                continue
+            path = os.path.join(dirpath, name)
+            yield os.path.relpath(path, static_folder).replace(os.sep, '/'), path
+
+
+def precompress(path, level=9):
+    """Write .gz/.br siblings for `path` if missing or stale.
+
+    Returns the number of files written.
+    """
+    if os.path.splitext(path)[1] not in COMPRESSIBLE_EXTENSIONS:
+        return 0
+    mtime = os.stat(path).st_mtime_ns
+    encoders = [('.gz', lambda data: gzip.compress(data, compresslevel=level, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+
+    written = 0
+    data = None
+    for suffix, encode in encoders:
+        target = path + suffix
+        if os.path.exists(target) and os.stat(target).st_mtime_ns >= mtime:
+            continue
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        # Workers may be serving the old sibling; swap it in whole
+        tmp_path = f'{target}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(encode(data))
+        os.replace(tmp_path, target)
+        written += 1
+    return written
+
+
+def _fresh(path, source_mtime):
+    """Whether a compressed sibling exists and is not older than its
+    source (``precompress`` leaves stale ones when it is not run)"""
+    try:
+        return os.stat(path).st_mtime_ns >= source_mtime
+    except OSError:
+        return False
+
+
+class StaticAssets:
+    """Replaces Flask's static view with a fingerprint-aware one"""
+
+    def init_app(self, app):
+        self.scan(app)
+
+        if app.config.get('STATIC_PRECOMPRESS'):
+            self.build(app)
+
+        @app.url_defaults
+        def add_fingerprint(endpoint, values):
+            if endpoint == 'static' and 'v' not in values:
+                version = app.extensions['static_assets'].get(values.get('filename'))
+                if version:
+                    values['v'] = version
+
+        app.view_functions['static'] = self.send_static
+
+    def scan(self, app):
+        """Hash every asset (again, e.g. after `flask build-assets` wrote new ones)"""
+        upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        manifest = {rel: file_hash(path) for rel, path in _walk_assets(app.static_folder, upload_folder)}
+        app.extensions['static_assets'] = manifest
+
+    def build(self, app):
+        """Write compressed siblings for every fingerprinted asset"""
+        upload_folder = os.path.abspath(app.config['UPLOAD_FOLDER'])
+        return sum(precompress(path) for rel, path in _walk_assets(app.static_folder, upload_folder))
+
+    def send_static(self, filename):
+        app = current_app
+        path = safe_join(app.static_folder, filename)
+        if path is None or not os.path.isfile(path):
+            raise NotFound()
+
+        version = app.extensions['static_assets'].get(filename)
+        immutable = (version is not None and request.args.get('v') == version) \
+            or CONTENT_ADDRESSED_RE.match(filename) is not None
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        encoding = None
+        if os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS:
+            accepted = request.accept_encodings
+            source_mtime = os.stat(path).st_mtime_ns
+            for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if accepted[candidate] and _fresh(path + suffix, source_mtime):
+                    encoding, path = candidate, path + suffix
+                    break
+
+        response = send_file(path, mimetype=mimetype, conditional=True, max_age=None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if os.path.splitext(filename)[1] in COMPRESSIBLE_EXTENSIONS:
+            response.vary.add('Accept-Encoding')
+
+        if immutable:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
@@ -0,0 +1,152 @@
+"""Dashboard counters kept in the ``stat`` table.
+
+Row counts are adjusted in the same transaction as the rows they count:
+an ``after_flush`` listener looks at what the flush inserted, deleted or
+(for a post's ``published`` flag) changed and issues one
+``UPDATE stat SET value = value + :delta`` per counter touched. The
+dashboard then reads a handful of rows instead of counting tables.
+
+``upload_bytes`` is the size of the upload folder, including derivatives.
+It is re-measured by the ``stats.storage`` job after uploads are stored or
+released, since files change outside the database.
+
+Writes that bypass the ORM (Core bulk inserts, raw SQL) do not update the
+counters; ``recount()`` (``flask recount-stats``, migration 6) rebuilds
+them from the tables.
+"""
+import os
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select, update
+
+from jobs import job
+
+COUNTERS = ('projects', 'posts_published', 'posts_draft', 'images', 'experiences', 'tools', 'upload_bytes')
+
+
+def _counter(obj):
+    """Counter a row belongs to, or None for uncounted models"""
+    from models import Project, ProjectImage, BlogPost, Experience, Tool
+
+    if isinstance(obj, BlogPost):
+        return 'posts_draft' if obj.published is False else 'posts_published'
+    return {
+        Project: 'projects',
+        ProjectImage: 'images',
+        Experience: 'experiences',
+        Tool: 'tools',
+    }.get(type(obj))
+
+
+def _count_changes(session, flush_context):
+    from models import BlogPost, Stat
+
+    deltas = Counter()
+    for obj in session.new:
+        name = _counter(obj)
+        if name:
+            deltas[name] += 1
+    for obj in session.deleted:
+        name = _counter(obj)
+        if name:
+            # A deleted post counts where it was before any unflushed edit
+            if isinstance(obj, BlogPost):
+                history = inspect(obj).attrs.published.history
+                if history.deleted:
+                    name = 'posts_draft' if history.deleted[0] is False else 'posts_published'
+            deltas[name] -= 1
+    for obj in session.dirty:
+        if isinstance(obj, BlogPost) and obj not in session.deleted:
+            history = inspect(obj).attrs.published.history
+            if history.added and history.deleted and bool(history.added[0]) != bool(history.deleted[0]):
+                moved_to = 'posts_published' if history.added[0] else 'posts_draft'
+                deltas[moved_to] += 1
+                deltas['posts_draft' if moved_to == 'posts_published' else 'posts_published'] -= 1
+
+    conn = session.connection()
+    for name, delta in deltas.items():
+        if delta:
+            conn.execute(update(Stat).where(Stat.name == name).values(
+                value=Stat.value + delta, updated_at=datetime.utcnow()
+            ))
+
+
+def upload_folder_size(folder):
+    """Bytes used by every file under `folder`"""
+    total = 0
+    for root, _, files in os.walk(folder):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def recount(conn, upload_folder=None):
+    """Rebuild every counter from the tables (and the upload folder)"""
+    from models import Project, ProjectImage, BlogPost, Experience, Tool, Stat
+
+    published = BlogPost.published.isnot(False)
+    values = conn.execute(select(
+        select(func.count()).select_from(Project).scalar_subquery(),
+        select(func.count()).select_from(BlogPost).where(published).scalar_subquery(),
+        select(func.count()).select_from(BlogPost).where(~published).scalar_subquery(),
+        select(func.count()).select_from(ProjectImage).scalar_subquery(),
+        select(func.count()).select_from(Experience).scalar_subquery(),
+        select(func.count()).select_from(Tool).scalar_subquery(),
+    )).one()
+    values = dict(zip(COUNTERS, values))
+    if upload_folder is not None:
+        values['upload_bytes'] = upload_folder_size(upload_folder)
+
+    existing = set(conn.execute(select(Stat.name)).scalars())
+    now = datetime.utcnow()
+    for name, value in values.items():
+        if name in existing:
+            conn.execute(update(Stat).where(Stat.name == name).values(value=value, updated_at=now))
+        else:
+            conn.execute(Stat.__table__.insert().values(name=name, value=value, updated_at=now))
+    for name in set(COUNTERS) - set(values) - existing:
+        conn.execute(Stat.__table__.insert().values(name=name, value=0, updated_at=now))
+
+
+class DashboardStats:
+    """Counters maintained on flush and read in one query"""
+
+    def init_app(self, app):
+        from extensions import db
+
+        if not event.contains(db.session, 'after_flush', _count_changes):
+            event.listen(db.session, 'after_flush', _count_changes)
+
+    def get(self):
+        """Counter values plus figures derived from them"""
+        from extensions import db
+        from models import Stat
+
+        stats = dict.fromkeys(COUNTERS, 0)
+        stats.update(db.session.execute(select(Stat.name, Stat.value)).all())
+        stats['posts'] = stats['posts_published'] + stats['posts_draft']
+        stats['images_per_project'] = stats['images'] / stats['projects'] if stats['projects'] else 0
+        return stats
+
+    def refresh_storage(self, app):
+        """Re-measure the upload folder (walks the disk; run from a job)"""
+        from extensions import db
+        from models import Stat
+
+        size = upload_folder_size(app.config['UPLOAD_FOLDER'])
+        db.session.execute(update(Stat).where(Stat.name == 'upload_bytes').values(
+            value=size, updated_at=datetime.utcnow()
+        ))
+        db.session.commit()
+        return size
+
+
+@job('stats.storage')
+def _refresh_storage(app):
+    from extensions import dashboard_stats
+
+    dashboard_stats.refresh_storage(app)
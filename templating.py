@@ -0,0 +1,49 @@
+"""Jinja setup: compiled-template cache and the ``{% cache %}`` tag.
+
+With ``TEMPLATE_BYTECODE_CACHE`` compiled templates are stored in
+``<instance>/jinja`` and every template is loaded at startup, so workers
+(forked after the app is built, see server.py) start with them in memory
+and only the first process after a deploy pays for compiling.
+
+``{% cache 'name', 'entity', ... %}...{% endcache %}`` renders its body
+once and then serves it from ``fragment_cache`` until one of the listed
+entities is purged.
+"""
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [args[0], nodes.List(args[1:])])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, name, entities, caller):
+        from extensions import fragment_cache
+        return fragment_cache.render(name, entities, caller)
+
+
+def init_templates(app):
+    """Configure the Jinja environment (call before anything renders)"""
+    options = dict(app.jinja_options)
+    options['extensions'] = list(options.get('extensions', ())) + [FragmentCacheExtension]
+    if app.config.get('TEMPLATE_BYTECODE_CACHE'):
+        directory = app.config.get('TEMPLATE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja')
+        os.makedirs(directory, exist_ok=True)
+        options['bytecode_cache'] = FileSystemBytecodeCache(directory)
+    app.jinja_options = options
+
+
+def preload_templates(app):
+    """Compile (or load from the bytecode cache) every template up front"""
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
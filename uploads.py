@@ -0,0 +1,104 @@
+"""Content-addressed storage for uploaded files.
+
+Uploads are streamed to disk in chunks while being hashed and stored as
+``<sha256>.<ext>``, so re-uploading the same file reuses the existing blob
+and two uploads can never overwrite each other. A blob is shared by every
+``ProjectImage.image_path`` / ``Experience.certificate_image_path`` that
+points at it and is only deleted by ``release_upload()`` once no row
+references it any more. Because the URL changes whenever the content does,
+uploaded files can be cached by browsers forever.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+from werkzeug.utils import secure_filename
+
+from extensions import db
+from models import ProjectImage, Experience
+
+CHUNK_SIZE = 64 * 1024
+UPLOAD_URL_PREFIX = '/static/uploads'
+
+
+def upload_url_to_path(app, url):
+    """Map a '/static/uploads/...' URL to a filesystem path"""
+    return os.path.join(app.root_path, url.lstrip('/'))
+
+
+def store_upload(file, upload_folder):
+    """Stream a werkzeug FileStorage into the store and return its URL"""
+    extension = secure_filename(file.filename).rsplit('.', 1)[-1].lower()
+    hasher = hashlib.sha256()
+
+    fd, tmp_path = tempfile.mkstemp(dir=upload_folder, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+
+        filename = f'{hasher.hexdigest()}.{extension}'
+        filepath = os.path.join(upload_folder, filename)
+        if os.path.exists(filepath):
+            # Same content already stored; keep the existing blob
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return f'{UPLOAD_URL_PREFIX}/{filename}'
+
+
+def reference_count(url):
+    """Number of rows that point at an uploaded file"""
+    images = db.session.query(ProjectImage.id).filter(ProjectImage.image_path == url).count()
+    certificates = db.session.query(Experience.id).filter(Experience.certificate_image_path == url).count()
+    return images + certificates
+
+
+def _remove(filepath):
+    try:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+    except OSError:
+        pass
+
+
+def release_upload(app, url, variants=None):
+    """Delete an upload (and its derivatives) if nothing references it.
+
+    Call after the referencing row has been deleted or changed and the
+    session committed. Returns True when the file was removed.
+
+    An upload of the same content may find the blob on disk and commit a
+    row pointing at it between the first check and the delete. So the file
+    is first renamed to a tombstone (an upload from then on stores a fresh
+    copy), and the count is taken again in a new transaction; if a row
+    refers to the blob by now, the tombstone is put back.
+    """
+    if not url or reference_count(url):
+        return False
+    path = upload_url_to_path(app, url)
+    tombstone = f'{path}.{os.getpid()}.{threading.get_ident()}.deleted'
+    try:
+        os.rename(path, tombstone)
+    except FileNotFoundError:
+        tombstone = None
+    db.session.commit()  # end the read transaction so the count is current
+    if reference_count(url):
+        if tombstone is not None:
+            # Same name, same content: safe even if it was stored again
+            os.replace(tombstone, path)
+        return False
+    if tombstone is not None:
+        _remove(tombstone)
+    for variant in variants or []:
+        _remove(upload_url_to_path(app, variant['path']))
+    return True
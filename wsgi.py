@@ -0,0 +1,16 @@
+"""WSGI entry point for production.
+
+    flask --app wsgi serve           # Gunicorn (Waitress on Windows), see server.py
+    gunicorn --preload wsgi:app      # or any WSGI server that loads the app once
+
+Building the app initializes the database and runs pending migrations.
+Load it once in the master process (``--preload``, uWSGI without
+``lazy-apps``) rather than in every worker, or the workers migrate the same
+database at the same time.
+"""
+from app import create_app
+from database import dispose_engines
+
+app = create_app('production')
+# Workers forked from this process open their own connections
+dispose_engines(app, close=True)